@@ -1,12 +1,32 @@
-from flask import Flask, render_template, jsonify, send_from_directory, request
+from flask import Flask, Response, render_template, jsonify, send_file, request, stream_with_context, g, has_request_context
 from flask_cors import CORS
-from pymongo import MongoClient
-from datetime import datetime, timedelta
+from pymongo import MongoClient, ASCENDING, DESCENDING, UpdateOne, ReturnDocument, monitoring
+from datetime import datetime, timedelta, timezone
 import os
 import re
+import json
+import base64
+import math
+import gzip
+import zlib
+import csv
+import time
+import threading
+import queue
+import struct
+import hashlib
+import bisect
+import cProfile
+import pstats
+import io
+import numpy as np
+import shutil
+from collections import OrderedDict
+from contextlib import contextmanager
 from dotenv import load_dotenv
 from bson.objectid import ObjectId
 from bson.errors import InvalidId
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
 from functools import wraps
 import logging
 from flask_jwt_extended import (
@@ -15,106 +35,3184 @@ from flask_jwt_extended import (
 )
 from werkzeug.security import generate_password_hash, check_password_hash
 import uuid
+import click
+
+try:
+    import brotli  # Optional: enables serving .br precompressed data files
+except ImportError:
+    brotli = None
+
+try:
+    import orjson  # Optional: faster encoding of large JSON responses
+except ImportError:
+    orjson = None
 
 # ---------------------- Setup and Configuration ---------------------- #
 
-# Load environment variables from .env
-load_dotenv()
+# Load environment variables from .env
+load_dotenv()
+
+# Initialize Flask app
+app = Flask(__name__)
+
+# Configure Logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# CORS Configuration
+CORS(app, resources={
+    r"/api/*": {
+        "origins": "*",  # Adjust this as per your frontend domain
+        "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+        "allow_headers": ["Content-Type", "Authorization"]
+    },
+    r"/wildvision/*": {
+        "origins": "*",
+        "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+        "allow_headers": ["Content-Type", "Authorization"]
+    }
+})
+
+# JWT Configuration
+app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY')  # Set this in your .env
+app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=1)  # Token expires in 1 hour
+jwt = JWTManager(app)
+
+# MongoDB command instrumentation, recorded into the metrics defined in the Metrics section
+class MongoCommandListener(monitoring.CommandListener):
+    """
+    Records the duration of every MongoDB command by collection and command name.
+    """
+    def __init__(self):
+        self._collections = {}
+
+    def started(self, event):
+        # getMore names its collection in a separate field, the other commands
+        # carry it as the value of the command name
+        target = event.command.get('collection' if event.command_name == 'getMore' else event.command_name)
+        self._collections[(event.connection_id, event.request_id)] = target if isinstance(target, str) else '-'
+
+    def succeeded(self, event):
+        self._record(event, failed=False)
+
+    def failed(self, event):
+        self._record(event, failed=True)
+
+    def _record(self, event, failed):
+        collection = self._collections.pop((event.connection_id, event.request_id), '-')
+        labels = (('collection', collection), ('command', event.command_name))
+        seconds = event.duration_micros / 1e6
+        observe_metric('wildvision_mongo_command_duration_seconds', labels, seconds)
+        if failed:
+            observe_metric('wildvision_mongo_command_failures_total', labels)
+        add_request_timing('mongo', seconds)
+
+# MongoDB Configuration (MONGO_URI is checked by create_app and on first use)
+MONGO_URI = os.getenv('MONGO_URI')
+MONGO_DB_NAME = os.getenv('MONGO_DB_NAME', 'wildvision')
+# Connection pool, timeout and read preference settings; unset ones keep the pymongo defaults
+MONGO_CLIENT_OPTIONS = {
+    option: int(os.environ[variable])
+    for option, variable in [
+        ('maxPoolSize', 'MONGO_MAX_POOL_SIZE'),
+        ('minPoolSize', 'MONGO_MIN_POOL_SIZE'),
+        ('maxIdleTimeMS', 'MONGO_MAX_IDLE_TIME_MS'),
+        ('waitQueueTimeoutMS', 'MONGO_WAIT_QUEUE_TIMEOUT_MS'),
+        ('connectTimeoutMS', 'MONGO_CONNECT_TIMEOUT_MS'),
+        ('serverSelectionTimeoutMS', 'MONGO_SERVER_SELECTION_TIMEOUT_MS'),
+        ('socketTimeoutMS', 'MONGO_SOCKET_TIMEOUT_MS')
+    ]
+    if os.getenv(variable)
+}
+if os.getenv('MONGO_READ_PREFERENCE'):
+    MONGO_CLIENT_OPTIONS['readPreference'] = os.getenv('MONGO_READ_PREFERENCE')
+
+# The client is created on first use in each process: a MongoClient must not be
+# shared across fork(), and workers forked by a preloading server get their own
+_mongo = {'pid': None, 'client': None}
+_mongo_lock = threading.Lock()
+
+def check_mongo_config():
+    """
+    Raises ValueError if no MongoDB URI is configured.
+    """
+    if not MONGO_URI:
+        logger.error("MONGO_URI not found in environment variables.")
+        raise ValueError("MONGO_URI not found in environment variables.")
+
+def get_mongo_client():
+    """
+    Returns this process's MongoClient, creating it on first use.
+    """
+    pid = os.getpid()
+    if _mongo['pid'] != pid:
+        with _mongo_lock:
+            if _mongo['pid'] != pid:
+                check_mongo_config()
+                _mongo['client'] = MongoClient(
+                    MONGO_URI,
+                    appname='wildvision',
+                    event_listeners=[MongoCommandListener()],
+                    **MONGO_CLIENT_OPTIONS
+                )
+                _mongo['pid'] = pid
+    return _mongo['client']
+
+def close_mongo_client():
+    """
+    Closes this process's MongoClient, if it has one. A preloading server calls this in
+    the master before forking, so the connections and monitor threads opened by the
+    warm-up are not left open alongside the workers' own clients.
+    """
+    with _mongo_lock:
+        client = _mongo['client'] if _mongo['pid'] == os.getpid() else None
+        _mongo['pid'], _mongo['client'] = None, None
+    if client is not None:
+        client.close()
+
+class LazyCollection:
+    """
+    Stands in for a collection of the application database, resolved through the
+    current process's client, so collections can be referenced at import time.
+    """
+    def __init__(self, name):
+        self.name = name
+        self._resolved = (None, None)
+
+    def __getattr__(self, attr):
+        pid, collection = self._resolved
+        if pid != os.getpid() or collection is None:
+            collection = get_mongo_client()[MONGO_DB_NAME][self.name]
+            self._resolved = (os.getpid(), collection)
+        return getattr(collection, attr)
+
+observations_collection = LazyCollection('observations')
+users_collection = LazyCollection('users')
+spots_collection = LazyCollection('spots')  # Added collection for spots
+counters_collection = LazyCollection('counters')
+tombstones_collection = LazyCollection('observation_tombstones')
+rollups_collection = LazyCollection('observation_rollups')
+
+# Directory paths
+DIR = os.getenv('DATA_DIR', '/var/data/static')  # Ensure this path exists and is correctly configured
+ANIMAL_DIR = os.path.join(DIR, 'animal')
+WEATHER_DIR = os.path.join(DIR, 'weather')
+VEGETATION_FILE = os.path.join(DIR, 'vegetation/vegetation_native.geojson')
+ANIMAL_LOCATION_FILE = os.path.join(DIR, 'animal/red_deer_location.geojson')
+
+# Full filename of a time-stamped layer, e.g. temperature_241018_07.geojson
+period_file_pattern = re.compile(r'^(?P<layer>[\w-]+?)_(?P<date>\d{6})_(?P<hour>\d{2})\.geojson$')
+
+# Directories scanned for time-stamped layers, and how often (in seconds)
+# their modification times are checked for new or removed files
+CATALOG_DIRS = [WEATHER_DIR, ANIMAL_DIR]
+CATALOG_CHECK_INTERVAL = float(os.getenv('CATALOG_CHECK_INTERVAL', 5))
+
+# Observation pagination settings
+DEFAULT_PAGE_SIZE = int(os.getenv('OBSERVATIONS_PAGE_SIZE', 500))
+MAX_PAGE_SIZE = int(os.getenv('OBSERVATIONS_MAX_PAGE_SIZE', 2000))
+VALID_GENDERS = ['Male', 'Female', 'Unknown']
+
+# Observation aggregation (heatmap) settings
+DEFAULT_CELL_SIZE = 0.1
+MIN_CELL_SIZE = 0.001
+MAX_AGGREGATE_CELLS = int(os.getenv('MAX_AGGREGATE_CELLS', 50000))
+AGGREGATE_WINDOWS = {
+    'hour': '%Y-%m-%dT%H:00Z',
+    'day': '%Y-%m-%d',
+    'month': '%Y-%m'
+}
+
+# Fields returned by the observation and spot read endpoints; everything else
+# (location, changeSeq, derived geometry) stays in the database
+OBSERVATION_FIELDS = ['species', 'gender', 'quantity', 'latitude', 'longitude', 'userId', 'timestamp']
+SPOT_FIELDS = ['name', 'coordinates', 'userId', 'timestamp', 'bbox', 'area', 'centroid']
+# Observation lists at least this long are streamed, encoded SERIALIZE_CHUNK_SIZE documents at a time
+STREAM_MIN_DOCUMENTS = int(os.getenv('STREAM_MIN_DOCUMENTS', 1000))
+SERIALIZE_CHUNK_SIZE = 500
+
+# Per-user in-memory spatial index of favorite spots
+SPOT_INDEX_NODE_SIZE = 16
+SPOT_INDEX_CACHE_SIZE = int(os.getenv('SPOT_INDEX_CACHE_SIZE', 256))
+
+# Observation rollups: counts and summed quantity per species, gender, day and
+# grid cell of ROLLUP_CELL_SIZE degrees, kept up to date by every observation write
+ROLLUP_CELL_SIZE = float(os.getenv('ROLLUP_CELL_SIZE', 1.0))
+REBUILD_ROLLUP_ATTEMPTS = 3
+ROLLUP_FIELDS = ['species', 'gender', 'quantity', 'latitude', 'longitude', 'timestamp']
+ROLLUP_GROUPS = {
+    'species': '$species',
+    'gender': '$gender',
+    'day': '$day',
+    'month': {'$substrCP': ['$day', 0, 7]},
+    'cell': {'x': '$cellX', 'y': '$cellY'}
+}
+MAX_STATS_GROUPS = int(os.getenv('MAX_STATS_GROUPS', 10000))
+
+# Streaming observation export
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv', 'csv'),
+    'geojson': ('application/geo+json', 'geojson')
+}
+EXPORT_CSV_COLUMNS = ['id', 'species', 'gender', 'quantity', 'latitude', 'longitude', 'userId', 'timestamp']
+
+# Live observation feed (Server-Sent Events). Each subscriber holds one of the worker's
+# GUNICORN_THREADS threads for as long as it is connected, so by default only half of
+# them may be taken by the feed and the rest stay free for ordinary requests
+SSE_HEARTBEAT_SECONDS = 15
+SSE_QUEUE_SIZE = 1000
+SSE_MAX_SUBSCRIBERS = int(os.getenv('SSE_MAX_SUBSCRIBERS', max(1, int(os.getenv('GUNICORN_THREADS', 8)) // 2)))
+
+# Delta sync: how long deletions are remembered for clients syncing with ?since=
+TOMBSTONE_RETENTION_DAYS = int(os.getenv('TOMBSTONE_RETENTION_DAYS', 30))
+# Upper bound on the time between reserving a change sequence number and the write
+# becoming visible (including clock skew between servers); each sync round re-checks
+# the changes made within this window before the previous round
+SYNC_SETTLE_SECONDS = int(os.getenv('SYNC_SETTLE_SECONDS', 30))
+
+# Maximum number of IDs accepted by the batch edit and delete endpoints
+MAX_BATCH_IDS = int(os.getenv('MAX_BATCH_IDS', 1000))
+
+# Bulk observation upload limits
+BULK_BATCH_SIZE = int(os.getenv('BULK_BATCH_SIZE', 500))
+BULK_MAX_RECORDS = int(os.getenv('BULK_MAX_RECORDS', 10000))
+
+# Mean Earth radius used to convert distances for $centerSphere queries
+EARTH_RADIUS_METERS = 6371008.8
+
+# bbox filters: largest longitude step between the vertices of the polygon used for the
+# 2dsphere index, and how far (in degrees) it is padded so its great-circle edges
+# still enclose the planar box
+BBOX_EDGE_STEP = 1.0
+BBOX_EDGE_MARGIN = 0.01
+
+# Caching of data files: layers that never change get a long max-age,
+# time-stamped forecast layers are revalidated with their ETag on every use
+STATIC_DATA_PREFIXES = ('vegetation/', 'animal/red_deer_location')
+STATIC_DATA_MAX_AGE = int(os.getenv('STATIC_DATA_MAX_AGE', 7 * 24 * 3600))
+# Precompressed variants written next to each data file, in order of preference
+PRECOMPRESSED_ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+# Compression levels: maximal for the offline compress-data command, fast for variants
+# written while a request waits (brotli at quality 11 takes seconds on a large layer)
+COMPRESSION_LEVELS = {'br': 11, 'gzip': 9}
+FAST_COMPRESSION_LEVELS = {'br': 5, 'gzip': 6}
+
+# Pre-simplified copies of large static layers, one per zoom level
+SIMPLIFIED_DIR = os.getenv('SIMPLIFIED_DIR', '/var/data/simplified')
+SIMPLIFIED_LAYERS = ['vegetation/vegetation_native']
+SIMPLIFY_ZOOMS = [4, 6, 8, 10, 12]
+
+# Bundled multi-frame responses for the time slider
+MAX_BUNDLE_FRAMES = int(os.getenv('MAX_BUNDLE_FRAMES', 64))
+FRAME_BUNDLE_CACHE_SIZE = int(os.getenv('FRAME_BUNDLE_CACHE_SIZE', 8))
+
+# Binary weather grids built from the weather GeoJSON layers
+GRID_DIR = os.getenv('GRID_DIR', '/var/data/grids')
+GRID_LAYERS = ['temperature', 'rain', 'wind_speed', 'cloud_cover']
+
+# Metrics: histogram buckets, an optional bearer token protecting /metrics, and
+# whether requests sent with an X-Profile header are run under cProfile
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+# Directory shared by the worker processes, each of which writes its metrics there at
+# most every METRICS_FLUSH_SECONDS so /metrics can report totals across workers.
+# Without it every worker reports only the requests it served itself.
+METRICS_DIR = os.getenv('METRICS_DIR')
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', 5))
+REQUEST_PROFILING = os.getenv('REQUEST_PROFILING', '').lower() in ('1', 'true', 'yes')
+
+# Layers (e.g. 'vegetation/vegetation_native') parsed into the tile source cache at startup
+WARMUP_LAYERS = [layer.strip() for layer in os.getenv('WARMUP_LAYERS', '').split(',') if layer.strip()]
+
+# Weather sampling: request limits, decoded grids kept in memory, and how far from an
+# observation's timestamp a weather period may be to describe it
+WEATHER_SAMPLE_MAX_POINTS = int(os.getenv('WEATHER_SAMPLE_MAX_POINTS', 1000))
+WEATHER_SAMPLE_MAX_PERIODS = int(os.getenv('WEATHER_SAMPLE_MAX_PERIODS', 240))
+GRID_CACHE_SIZE = int(os.getenv('GRID_CACHE_SIZE', 64))
+WEATHER_MATCH_WINDOW = timedelta(hours=float(os.getenv('WEATHER_MATCH_WINDOW_HOURS', 3)))
+
+# Red deer habitat score grids: where they are written, the cell size of the shared grid,
+# and how abundance, native vegetation and the weather are weighted into the score
+HABITAT_DIR = os.getenv('HABITAT_DIR', '/var/data/habitat')
+HABITAT_CELL_SIZE = float(os.getenv('HABITAT_CELL_SIZE', 0.02))
+HABITAT_ABUNDANCE_SCORES = {'H': 1.0, 'M': 0.6, 'L': 0.3}
+HABITAT_VEGETATION_WEIGHT = 0.5           # Share of the score that depends on native vegetation cover
+HABITAT_COMFORT_TEMPERATURE = (5.0, 20.0) # Temperatures (C) with no penalty
+HABITAT_TEMPERATURE_FALLOFF = 10.0        # Degrees outside the comfort range at which the score reaches 0
+HABITAT_RAIN_CUTOFF = 12.5                # Rain at which the rain factor bottoms out
+HABITAT_MIN_RAIN_FACTOR = 0.2
+MAX_HABITAT_RESULTS = 100
+habitat_file_pattern = re.compile(r'^score_(?P<date>\d{6})_(?P<hour>\d{2})\.grid$')
+
+# Parsed GeoJSON layers kept in memory, bounded by their estimated size in bytes.
+# A parsed layer takes several times the size of its file.
+LAYER_CACHE_MAX_BYTES = int(os.getenv('LAYER_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+LAYER_MEMORY_FACTOR = 8
+MAX_PROPERTY_NAMES = 50
+
+# Vector tile settings
+TILE_CACHE_DIR = os.getenv('TILE_CACHE_DIR', '/var/data/tiles')
+MIN_TILE_ZOOM = 0
+MAX_TILE_ZOOM = int(os.getenv('MAX_TILE_ZOOM', 14))
+TILE_SIZE_PX = 256
+layer_pattern = re.compile(r'^[\w-]+/[\w-]+$')
+
+# ---------------------- Metrics ---------------------- #
+
+# name -> (type, help text, histogram buckets)
+METRIC_DEFINITIONS = {
+    'wildvision_request_duration_seconds': ('histogram', 'Request latency by endpoint, method and status.', LATENCY_BUCKETS),
+    'wildvision_response_size_bytes': ('histogram', 'Response body size by endpoint.', SIZE_BUCKETS),
+    'wildvision_mongo_command_duration_seconds': ('histogram', 'MongoDB command duration by collection and command.', LATENCY_BUCKETS),
+    'wildvision_mongo_command_failures_total': ('counter', 'Failed MongoDB commands by collection and command.', None),
+    'wildvision_serialization_duration_seconds': ('histogram', 'Time spent serializing responses by stage.', LATENCY_BUCKETS),
+    'wildvision_serialized_documents_total': ('counter', 'Documents serialized into responses by endpoint.', None),
+}
+
+# name -> labels -> counter value, or per-bucket counts followed by sum and count
+_metric_series = {name: {} for name in METRIC_DEFINITIONS}
+_metrics_lock = threading.Lock()
+# This process's file in METRICS_DIR as (pid, path), and when it was last written
+_metrics_file = None
+_metrics_flushed_at = 0.0
+
+# Characters escaped in label values
+METRIC_LABEL_ESCAPES = str.maketrans({'\\': '\\\\', '"': '\\"', '\n': '\\n'})
+
+def observe_metric(name, labels, value=1):
+    """
+    Adds 'value' to a counter, or records it as one observation of a histogram.
+    'labels' is a tuple of (name, value) pairs.
+    """
+    kind, _, buckets = METRIC_DEFINITIONS[name]
+    with _metrics_lock:
+        series = _metric_series[name]
+        if kind == 'counter':
+            series[labels] = series.get(labels, 0) + value
+            return
+        state = series.get(labels)
+        if state is None:
+            state = series[labels] = [0] * (len(buckets) + 1) + [0.0, 0]
+        state[bisect.bisect_left(buckets, value)] += 1
+        state[-2] += value
+        state[-1] += 1
+    if METRICS_DIR and time.monotonic() - _metrics_flushed_at >= METRICS_FLUSH_SECONDS:
+        flush_metrics()
+
+def snapshot_metrics():
+    """
+    Returns a copy of this process's metric series.
+    """
+    with _metrics_lock:
+        return {
+            name: {labels: list(state) if isinstance(state, list) else state for labels, state in series.items()}
+            for name, series in _metric_series.items()
+        }
+
+def flush_metrics():
+    """
+    Writes this process's metrics to its own file in METRICS_DIR. Each process gets a
+    new file, so a worker reusing the PID of a dead one never overwrites its totals.
+    Failures are logged rather than raised.
+    """
+    global _metrics_file, _metrics_flushed_at
+    if not METRICS_DIR:
+        return
+    _metrics_flushed_at = time.monotonic()
+    if _metrics_file is None or _metrics_file[0] != os.getpid():
+        _metrics_file = (os.getpid(), os.path.join(METRICS_DIR, f"{os.getpid()}-{uuid.uuid4().hex}.json"))
+    path = _metrics_file[1]
+    snapshot = {name: [[labels, state] for labels, state in series.items()] for name, series in snapshot_metrics().items()}
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.error(f"Failed to write metrics to {path}: {e}")
+
+def collect_metrics():
+    """
+    Returns the metric series of every process that wrote to METRICS_DIR, summed, or
+    this process's own series when METRICS_DIR is not set.
+    """
+    if not METRICS_DIR:
+        return snapshot_metrics()
+    flush_metrics()
+    totals = {name: {} for name in METRIC_DEFINITIONS}
+    for entry in os.scandir(METRICS_DIR):
+        if not entry.name.endswith('.json'):
+            continue
+        try:
+            with open(entry.path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Skipping unreadable metrics file {entry.path}: {e}")
+            continue
+        for name, series in snapshot.items():
+            if name not in totals:
+                continue
+            for labels, state in series:
+                labels = tuple(tuple(pair) for pair in labels)
+                current = totals[name].get(labels)
+                if current is None:
+                    totals[name][labels] = state
+                elif isinstance(state, list):
+                    totals[name][labels] = [a + b for a, b in zip(current, state)]
+                else:
+                    totals[name][labels] = current + state
+    return totals
+
+def format_metric_labels(labels):
+    """
+    Formats label pairs in Prometheus text format, e.g. {endpoint="/api/x",status="200"}.
+    """
+    if not labels:
+        return ''
+    escaped = (f'{key}="{str(value).translate(METRIC_LABEL_ESCAPES)}"' for key, value in labels)
+    return '{' + ','.join(escaped) + '}'
+
+def render_metrics():
+    """
+    Renders all metrics in the Prometheus text exposition format.
+    """
+    snapshot = collect_metrics()
+    lines = []
+    for name, (kind, help_text, buckets) in METRIC_DEFINITIONS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, state in sorted(snapshot[name].items()):
+            if kind == 'counter':
+                lines.append(f'{name}{format_metric_labels(labels)} {state}')
+                continue
+            cumulative = 0
+            for bound, count in zip([*map(str, buckets), '+Inf'], state[:-2]):
+                cumulative += count
+                lines.append(f'{name}_bucket{format_metric_labels(labels + (("le", bound),))} {cumulative}')
+            lines.append(f'{name}_sum{format_metric_labels(labels)} {state[-2]}')
+            lines.append(f'{name}_count{format_metric_labels(labels)} {state[-1]}')
+    return '\n'.join(lines) + '\n'
+
+def add_request_timing(part, seconds):
+    """
+    Adds time spent in one part of the work (e.g. 'mongo') to the current request's timings.
+    """
+    if has_request_context() and 'timings' in g:
+        g.timings[part] = g.timings.get(part, 0.0) + seconds
+
+@contextmanager
+def timed_serialization(stage):
+    """
+    Measures the time spent serializing a response in the enclosed block.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        observe_metric('wildvision_serialization_duration_seconds', (('stage', stage),), elapsed)
+        add_request_timing('serialize', elapsed)
+
+def metrics_endpoint_label():
+    """
+    Returns the route pattern of the current request, which keeps label cardinality bounded.
+    """
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+@app.before_request
+def start_request_metrics():
+    """
+    Starts timing the request, and profiling it when requested and enabled.
+    """
+    g.request_started = time.perf_counter()
+    g.timings = {}
+    if REQUEST_PROFILING and request.headers.get('X-Profile'):
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+@app.after_request
+def record_request_metrics(response):
+    """
+    Records latency and response size, and adds a Server-Timing breakdown for profiled requests.
+    """
+    if 'request_started' not in g:
+        return response
+    elapsed = time.perf_counter() - g.request_started
+    endpoint = metrics_endpoint_label()
+    observe_metric(
+        'wildvision_request_duration_seconds',
+        (('endpoint', endpoint), ('method', request.method), ('status', str(response.status_code))),
+        elapsed
+    )
+    # Streamed responses (SSE, exports) have no length up front
+    if response.content_length is not None:
+        observe_metric('wildvision_response_size_bytes', (('endpoint', endpoint),), response.content_length)
+
+    if request.headers.get('X-Profile'):
+        timings = [f"{part};dur={seconds * 1000:.2f}" for part, seconds in g.timings.items()]
+        timings.append(f"total;dur={elapsed * 1000:.2f}")
+        response.headers['Server-Timing'] = ', '.join(timings)
+        profiler = g.pop('profiler', None)
+        if profiler:
+            profiler.disable()
+            stats_output = io.StringIO()
+            pstats.Stats(profiler, stream=stats_output).sort_stats('cumulative').print_stats(25)
+            logger.info(f"Profile of {request.method} {request.full_path}:\n{stats_output.getvalue()}")
+    return response
+
+@app.teardown_request
+def stop_request_profiler(exception=None):
+    """
+    Makes sure a profiler is never left running after a failed request.
+    """
+    profiler = g.pop('profiler', None)
+    if profiler:
+        profiler.disable()
+
+# ---------------------- Helper Functions ---------------------- #
+
+def get_time_periods(directory, prefix):
+    """
+    Returns the time periods available for files in the specified directory
+    starting with the given prefix, read from the time period catalog.
+    """
+    refresh_time_period_catalog()
+    directory = os.path.abspath(directory)
+    time_periods = []
+    for layer, entry in _time_period_catalog['layers'].items():
+        if not layer.startswith(prefix):
+            continue
+        for period in entry['periods']:
+            file_path = os.path.join(DIR, period['filename'])
+            file_dir = os.path.dirname(file_path)
+            if file_dir == directory or file_dir.startswith(directory + os.sep):
+                time_periods.append({
+                    'filename': os.path.basename(file_path),
+                    'time': period['time']
+                })
+    # Sort the time periods chronologically
+    time_periods.sort(key=lambda x: x['time'])
+    return time_periods
+
+# In-memory catalog of time-stamped layers:
+#   dirs    - modification time of every scanned directory
+#   files   - (layer, date, hour, filename) entries found in each directory
+#   layers  - per layer, the sorted periods and a (date, hour) -> filename lookup
+#   version - incremented whenever the catalog changes
+_time_period_catalog = {'dirs': {}, 'files': {}, 'layers': {}, 'version': 0, 'checked_at': None}
+_time_period_catalog_lock = threading.Lock()
+
+def scan_catalog_directory(directory):
+    """
+    Lists the time-stamped layer files and subdirectories directly inside a directory.
+    """
+    files, subdirs = [], []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                subdirs.append(entry.path)
+                continue
+            match = period_file_pattern.match(entry.name)
+            if match:
+                filename = os.path.relpath(entry.path, DIR).replace(os.sep, '/')
+                files.append((match.group('layer'), match.group('date'), match.group('hour'), filename))
+    return files, subdirs
+
+def rebuild_catalog_layers(catalog):
+    """
+    Regroups the per-directory file entries of the catalog by layer.
+    """
+    layers = {}
+    for files in catalog['files'].values():
+        for layer, date, hour, filename in files:
+            entry = layers.setdefault(layer, {'periods': [], 'frames': {}})
+            entry['frames'][(date, hour)] = filename
+    for entry in layers.values():
+        entry['periods'] = [
+            {
+                'date': date,
+                'hour': hour,
+                'time': f"20{date[:2]}-{date[2:4]}-{date[4:6]} {hour}:00",
+                'filename': filename
+            }
+            for (date, hour), filename in sorted(entry['frames'].items())
+        ]
+    catalog['layers'] = layers
+
+def refresh_time_period_catalog(force=False):
+    """
+    Brings the time period catalog up to date. Directory modification times are checked
+    at most every CATALOG_CHECK_INTERVAL seconds, and only directories whose modification
+    time changed are rescanned.
+    """
+    catalog = _time_period_catalog
+    now = time.monotonic()
+    if not force and catalog['checked_at'] is not None and now - catalog['checked_at'] < CATALOG_CHECK_INTERVAL:
+        return
+
+    with _time_period_catalog_lock:
+        if not force and catalog['checked_at'] is not None and now - catalog['checked_at'] < CATALOG_CHECK_INTERVAL:
+            return
+
+        changed = False
+        pending = list(set(catalog['dirs']) | set(CATALOG_DIRS))
+        while pending:
+            directory = pending.pop()
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+            except OSError:
+                # Directory was removed (or never existed)
+                if catalog['dirs'].pop(directory, None) is not None:
+                    catalog['files'].pop(directory, None)
+                    changed = True
+                continue
+            if catalog['dirs'].get(directory) == mtime:
+                continue
+
+            files, subdirs = scan_catalog_directory(directory)
+            catalog['files'][directory] = files
+            catalog['dirs'][directory] = mtime
+            pending.extend(subdir for subdir in subdirs if subdir not in catalog['dirs'])
+            changed = True
+
+        if changed:
+            rebuild_catalog_layers(catalog)
+            catalog['version'] += 1
+            logger.info(f"Time period catalog updated to version {catalog['version']}.")
+        catalog['checked_at'] = now
+
+def find_time_period_file(layer, date, hour):
+    """
+    Returns the filename (relative to DIR) of a layer at the given YYMMDD date and HH hour,
+    or None if that period is not available.
+    """
+    refresh_time_period_catalog()
+    entry = _time_period_catalog['layers'].get(layer)
+    if not entry:
+        return None
+    return entry['frames'].get((date, hour))
+
+def serialize_observation(obs):
+    return {
+        "id": str(obs["_id"]),
+        "species": obs.get("species", "N/A"),
+        "gender": obs.get("gender", "N/A"),
+        "quantity": obs.get("quantity", "N/A"),
+        "latitude": obs.get("latitude"),
+        "longitude": obs.get("longitude"),
+        "userId": obs.get("userId", "N/A"),
+        "timestamp": obs.get("timestamp").isoformat() + 'Z' if obs.get("timestamp") else "N/A"
+    }
+
+_json_encoder = json.JSONEncoder(ensure_ascii=False, check_circular=False, separators=(',', ':'))
+
+def encode_json(value):
+    """
+    Encodes already-serialized data (no datetimes or ObjectIds) to JSON bytes,
+    using orjson when it is installed.
+    """
+    if orjson is not None:
+        return orjson.dumps(value)
+    return _json_encoder.encode(value).encode()
+
+def iter_observation_list_json(payload, observations):
+    """
+    Yields the JSON encoding of 'payload' with an 'observations' list serialized from
+    'observations' one chunk at a time, so a large list never exists as one string.
+    """
+    yield encode_json(payload)[:-1] + b',"observations":['
+    for start in range(0, len(observations), SERIALIZE_CHUNK_SIZE):
+        with timed_serialization('stream'):
+            chunk = encode_json([serialize_observation(obs) for obs in observations[start:start + SERIALIZE_CHUNK_SIZE]])
+        yield (b',' if start else b'') + chunk[1:-1]
+    yield b']}'
+
+def parse_iso_datetime(value):
+    """
+    Parses an ISO 8601 string (optionally ending in 'Z') into a naive UTC datetime,
+    matching how timestamps are stored in MongoDB.
+    """
+    parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def parse_bbox(value):
+    """
+    Parses a 'minLon,minLat,maxLon,maxLat' string into a tuple of floats.
+    Raises ValueError if the string is malformed or out of range.
+    """
+    parts = [float(part) for part in value.split(',')]
+    if len(parts) != 4:
+        raise ValueError("bbox must have four values: minLon,minLat,maxLon,maxLat")
+    min_lon, min_lat, max_lon, max_lat = parts
+    if not (-180 <= min_lon <= 180 and -180 <= max_lon <= 180):
+        raise ValueError("bbox longitudes must be between -180 and 180")
+    if not (-90 <= min_lat <= max_lat <= 90):
+        raise ValueError("bbox latitudes must be between -90 and 90, min before max")
+    return min_lon, min_lat, max_lon, max_lat
+
+def make_point(latitude, longitude):
+    """
+    Returns a GeoJSON Point for the given coordinates, as stored in the 'location' field.
+    """
+    return {'type': 'Point', 'coordinates': [longitude, latitude]}
+
+def bbox_polygon(min_lon, min_lat, max_lon, max_lat):
+    """
+    Returns a GeoJSON Polygon enclosing the given planar bounding box.
+    A box with min_lon > max_lon is treated as crossing the antimeridian.
+    MongoDB treats polygon edges as great-circle arcs, which bow towards the poles,
+    so the north and south edges are densified and the polygon is padded.
+    Returns None if the padded box reaches a pole or spans more than 180 degrees of
+    longitude, since the polygon would then be degenerate or larger than a hemisphere.
+    """
+    width = max_lon - min_lon if min_lon <= max_lon else max_lon + 360 - min_lon
+    width += 2 * BBOX_EDGE_MARGIN
+    south, north = min_lat - BBOX_EDGE_MARGIN, max_lat + BBOX_EDGE_MARGIN
+    if width > 180 or south <= -90 or north >= 90:
+        return None
+    steps = max(1, math.ceil(width / BBOX_EDGE_STEP))
+    west = min_lon - BBOX_EDGE_MARGIN
+    lons = [(west + width * i / steps + 180) % 360 - 180 for i in range(steps + 1)]
+    ring = [[lon, south] for lon in lons] + [[lon, north] for lon in reversed(lons)]
+    ring.append(ring[0])
+    return {'type': 'Polygon', 'coordinates': [ring]}
+
+def bbox_query(min_lon, min_lat, max_lon, max_lat):
+    """
+    Returns a filter matching observations inside a planar bounding box. The latitude
+    and longitude conditions are the exact test; the location condition lets the
+    2dsphere index narrow the scan first.
+    """
+    if min_lon <= max_lon:
+        longitude = {'$gte': min_lon, '$lte': max_lon}
+    else:
+        longitude = {'$not': {'$gt': max_lon, '$lt': min_lon}}
+    query = {'latitude': {'$gte': min_lat, '$lte': max_lat}, 'longitude': longitude}
+    polygon = bbox_polygon(min_lon, min_lat, max_lon, max_lat)
+    if polygon:
+        query['location'] = {'$geoWithin': {'$geometry': polygon}}
+    return query
+
+def spot_ring(coordinates):
+    """
+    Converts the coordinates of a favorite spot, as sent by Leaflet (LatLng objects or
+    [lat, lng] pairs, optionally wrapped in a list of rings), into a closed GeoJSON
+    ring of [lon, lat] positions. Raises ValueError if there are fewer than three points.
+    """
+    points = coordinates
+    # Leaflet polygons are a list of rings; only the outer ring is used
+    while points and isinstance(points[0], list) and points[0] and not isinstance(points[0][0], (int, float)):
+        points = points[0]
+
+    ring = []
+    for point in points or []:
+        if isinstance(point, dict):
+            lat, lon = float(point['lat']), float(point['lng'])
+        else:
+            lat, lon = float(point[0]), float(point[1])
+        ring.append([lon, lat])
+
+    if ring and ring[0] != ring[-1]:
+        ring.append(list(ring[0]))
+    if len(ring) < 4:
+        raise ValueError("A spot needs at least three distinct points")
+    return ring
+
+def build_observation_query(args):
+    """
+    Builds a MongoDB filter from request query parameters.
+    Supported filters: species, gender, userId (comma separated for several values),
+    start/end (ISO 8601 timestamps) and bbox (minLon,minLat,maxLon,maxLat).
+    Raises ValueError with a user-facing message on invalid input.
+    """
+    query = {}
+
+    for field in ['species', 'gender', 'userId']:
+        raw = args.get(field)
+        if not raw:
+            continue
+        values = [value.strip() for value in raw.split(',') if value.strip()]
+        if field == 'gender' and any(value not in VALID_GENDERS for value in values):
+            raise ValueError("Invalid gender value")
+        if values:
+            query[field] = values[0] if len(values) == 1 else {'$in': values}
+
+    time_range = {}
+    try:
+        if args.get('start'):
+            time_range['$gte'] = parse_iso_datetime(args['start'])
+        if args.get('end'):
+            time_range['$lte'] = parse_iso_datetime(args['end'])
+    except ValueError:
+        raise ValueError("Invalid start or end timestamp")
+    if time_range:
+        query['timestamp'] = time_range
+
+    if args.get('bbox'):
+        try:
+            min_lon, min_lat, max_lon, max_lat = parse_bbox(args['bbox'])
+        except ValueError as e:
+            raise ValueError(f"Invalid bbox: {e}")
+        query.update(bbox_query(min_lon, min_lat, max_lon, max_lat))
+
+    return query
+
+def encode_cursor(obs):
+    """
+    Encodes the (timestamp, _id) sort key of an observation as an opaque cursor.
+    """
+    timestamp = obs.get('timestamp')
+    payload = {
+        't': timestamp.isoformat() if timestamp else None,
+        'id': str(obs['_id'])
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor produced by encode_cursor into a (timestamp, ObjectId) tuple.
+    Raises ValueError if the cursor is invalid.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        timestamp = datetime.fromisoformat(payload['t']) if payload.get('t') else None
+        return timestamp, ObjectId(payload['id'])
+    except (ValueError, TypeError, KeyError, InvalidId):
+        raise ValueError("Invalid cursor")
+
+def cursor_query(timestamp, object_id):
+    """
+    Returns a filter selecting observations that sort after the given key
+    in (timestamp desc, _id desc) order. Observations without a timestamp sort
+    last, so they follow every timestamped page.
+    """
+    if timestamp is None:
+        return {'timestamp': None, '_id': {'$lt': object_id}}
+    return {'$or': [
+        {'timestamp': {'$lt': timestamp}},
+        {'timestamp': timestamp, '_id': {'$lt': object_id}},
+        {'timestamp': None}
+    ]}
+
+def parse_page_size(value):
+    """
+    Parses the requested page size, falling back to the default and capping it at MAX_PAGE_SIZE.
+    """
+    if value is None:
+        return DEFAULT_PAGE_SIZE
+    limit = int(value)
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    return min(limit, MAX_PAGE_SIZE)
+
+def find_observation_page(query, args):
+    """
+    Runs a keyset-paginated observation query, newest first.
+    Returns the page of documents and the cursor for the next page (None on the last page).
+    Raises ValueError if the 'limit' or 'cursor' parameters are invalid.
+    """
+    limit = parse_page_size(args.get('limit'))
+    if args.get('cursor'):
+        after = cursor_query(*decode_cursor(args['cursor']))
+        query = {'$and': [query, after]} if query else after
+
+    # Fetch one extra document to know whether another page exists
+    observations = list(
+        observations_collection.find(query, OBSERVATION_FIELDS)
+        .sort([('timestamp', DESCENDING), ('_id', DESCENDING)])
+        .limit(limit + 1)
+    )
+    has_more = len(observations) > limit
+    observations = observations[:limit]
+    next_cursor = encode_cursor(observations[-1]) if has_more else None
+    return observations, next_cursor
+
+def observation_versions():
+    """
+    Returns (seq, committed): the last reserved change sequence number and the number
+    of observation writes that have committed. A reserved number can belong to a write
+    that is not visible yet, so list ETags use the committed count.
+    """
+    counter = counters_collection.find_one({'_id': 'observations'}) or {}
+    return counter.get('seq', 0), counter.get('committed', 0)
+
+def mark_observations_committed():
+    """
+    Bumps the committed write count once a write is visible, so list ETags only change
+    when the data they describe can be read. Failures are logged rather than raised.
+    """
+    try:
+        counters_collection.update_one({'_id': 'observations'}, {'$inc': {'committed': 1}}, upsert=True)
+    except Exception as e:
+        logger.error(f"Failed to bump the committed observation version: {e}")
+
+def next_change_seq(count=1):
+    """
+    Reserves 'count' consecutive change sequence numbers and returns the last one.
+    """
+    counter = counters_collection.find_one_and_update(
+        {'_id': 'observations'},
+        {'$inc': {'seq': count}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return counter['seq']
+
+def record_tombstones(object_ids, user_id):
+    """
+    Remembers deleted observations so that delta sync clients learn about the deletion.
+    Called after the delete has committed, so failures are logged rather than raised.
+    """
+    if not object_ids:
+        return
+    try:
+        last_seq = next_change_seq(len(object_ids))
+        deleted_at = datetime.utcnow()
+        tombstones_collection.bulk_write([
+            UpdateOne(
+                {'_id': object_id},
+                {'$set': {'changeSeq': last_seq - len(object_ids) + 1 + position, 'deletedAt': deleted_at, 'userId': user_id}},
+                upsert=True
+            )
+            for position, object_id in enumerate(object_ids)
+        ], ordered=False)
+    except Exception as e:
+        logger.error(f"Failed to record tombstones for {len(object_ids)} deleted observations: {e}")
+
+def encode_sync_token(seq, object_id=None, issued=None, recheck=None, started=None):
+    """
+    Encodes a delta sync position: the last (changeSeq, _id) the client has seen, the
+    time from which the tombstones it still needs have been retained, the time from
+    which changes are re-checked at the start of the next round, and, in the middle of
+    a round, when that round started.
+    """
+    payload = {
+        'seq': seq,
+        'id': str(object_id) if object_id else None,
+        'issued': (issued or datetime.utcnow()).isoformat(),
+        'recheck': recheck.isoformat() if recheck else None,
+        'started': started.isoformat() if started else None
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+def decode_sync_token(token):
+    """
+    Decodes a token produced by encode_sync_token into
+    (seq, ObjectId or None, issued, recheck or None, started or None).
+    Raises ValueError if the token is invalid.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+        object_id = ObjectId(payload['id']) if payload.get('id') else None
+        recheck = datetime.fromisoformat(payload['recheck']) if payload.get('recheck') else None
+        started = datetime.fromisoformat(payload['started']) if payload.get('started') else None
+        return int(payload['seq']), object_id, datetime.fromisoformat(payload['issued']), recheck, started
+    except (ValueError, TypeError, KeyError, InvalidId):
+        raise ValueError("Invalid since token")
+
+def find_observation_changes(query, seq, after_id, issued, limit, recheck=None, started=None):
+    """
+    Returns observations matching 'query' that were created or changed after the
+    (seq, after_id) position, and the IDs of observations deleted since then, in change
+    order. Returns (changed, deleted_ids, next_token, has_more). Observations changed
+    so that they no longer match 'query' (e.g. re-labelled or moved out of a bbox) are
+    reported as deleted, since the client must drop them from its filtered copy.
+
+    A write can become visible after a client has moved past its sequence number, so
+    the first page of each sync round also returns everything changed since 'recheck'
+    (SYNC_SETTLE_SECONDS before the previous round started). Clients apply changes by
+    ID, so the repeats this causes are harmless.
+    """
+    # A token without 'started' begins a new round
+    started = started or datetime.utcnow()
+    if after_id is None:
+        after = {'changeSeq': {'$gt': seq}}
+    else:
+        after = {'$or': [{'changeSeq': {'$gt': seq}}, {'changeSeq': seq, '_id': {'$gt': after_id}}]}
+    changed_filter = deleted_filter = after
+    if recheck:
+        changed_filter = {'$or': [after, {'changedAt': {'$gte': recheck}}]}
+        deleted_filter = {'$or': [after, {'deletedAt': {'$gte': recheck}}]}
+    order = [('changeSeq', ASCENDING), ('_id', ASCENDING)]
+
+    # The filter is applied after paging, so changes that move a document out of it are seen
+    changed = list(
+        observations_collection.find(changed_filter, OBSERVATION_FIELDS + ['changeSeq'])
+        .sort(order).limit(limit + 1)
+    )
+    deleted = list(tombstones_collection.find(deleted_filter, {'changeSeq': 1}).sort(order).limit(limit + 1))
+    merged = sorted(
+        [(doc['changeSeq'], doc['_id'], False, doc) for doc in changed] +
+        [(doc['changeSeq'], doc['_id'], True, doc) for doc in deleted],
+        key=lambda item: (item[0], item[1])
+    )
+    has_more = len(merged) > limit
+    merged = merged[:limit]
+
+    if query:
+        page_ids = [object_id for _, object_id, is_deleted, _ in merged if not is_deleted]
+        matching = {
+            doc['_id'] for doc in
+            observations_collection.find({'$and': [query, {'_id': {'$in': page_ids}}]}, ['_id'])
+        } if page_ids else set()
+        merged = [
+            (change_seq, object_id, is_deleted or object_id not in matching, doc)
+            for change_seq, object_id, is_deleted, doc in merged
+        ]
+
+    if merged:
+        seq, after_id = merged[-1][0], merged[-1][1]
+    if has_more:
+        next_token = encode_sync_token(seq, after_id, issued, started=started)
+    else:
+        # Once the client has caught up, only tombstones created from now on are still
+        # needed, and the next round re-checks what changed while this one ran
+        next_token = encode_sync_token(seq, after_id, recheck=started - timedelta(seconds=SYNC_SETTLE_SECONDS))
+    return (
+        [doc for _, _, is_deleted, doc in merged if not is_deleted],
+        [str(object_id) for _, object_id, is_deleted, _ in merged if is_deleted],
+        next_token,
+        has_more
+    )
+
+def observation_list_etag(version, current_user_id):
+    """
+    Builds the ETag of an observation list response from the collection version and
+    everything else the response depends on.
+    """
+    key = f"{request.path}?{request.query_string.decode()}|{current_user_id}"
+    return f"{version}-{hashlib.sha1(key.encode()).hexdigest()[:16]}"
+
+def observation_page_response(query, current_user_id, use_etag=True):
+    """
+    Builds the JSON response for one page of observations matching the given query.
+    With 'since', only changes after that sync token are returned (delta sync).
+    With use_etag, responses carry an ETag derived from the collection version, and a
+    request for an unchanged collection is answered with 304 Not Modified.
+    Pages of STREAM_MIN_DOCUMENTS or more observations are streamed as chunked JSON.
+    """
+    try:
+        # Read the versions first so a write during the query makes the ETag stale
+        listed_at = datetime.utcnow()
+        seq, version = observation_versions()
+        etag = observation_list_etag(version, current_user_id) if use_etag else None
+        if etag and request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+
+        if request.args.get('since'):
+            since_seq, after_id, issued, recheck, started = decode_sync_token(request.args['since'])
+            if issued < datetime.utcnow() - timedelta(days=TOMBSTONE_RETENTION_DAYS):
+                logger.info(f"User {current_user_id} sent an expired since token.")
+                return jsonify({'status': 'error', 'message': 'Sync token expired, reload all observations.'}), 410
+            limit = parse_page_size(request.args.get('limit'))
+            observations, deleted, next_token, has_more = find_observation_changes(
+                query, since_seq, after_id, issued, limit, recheck, started
+            )
+            payload = {
+                'status': 'success',
+                'deleted': deleted,
+                'next_since': next_token,
+                'has_more': has_more
+            }
+            logger.info(f"User {current_user_id} synced {len(observations)} changed and {len(deleted)} deleted observations.")
+        else:
+            observations, next_cursor = find_observation_page(query, request.args)
+            logger.info(f"User {current_user_id} retrieved {len(observations)} observations.")
+            payload = {
+                'status': 'success',
+                'next_cursor': next_cursor,
+                # Pass as ?since= later to fetch only what changed after this listing
+                'sync_token': encode_sync_token(seq, recheck=listed_at - timedelta(seconds=SYNC_SETTLE_SECONDS))
+            }
+
+        observe_metric('wildvision_serialized_documents_total', (('endpoint', metrics_endpoint_label()),), len(observations))
+        if len(observations) >= STREAM_MIN_DOCUMENTS:
+            response = Response(stream_with_context(iter_observation_list_json(payload, observations)), mimetype='application/json')
+        else:
+            with timed_serialization('documents'):
+                payload['observations'] = [serialize_observation(obs) for obs in observations]
+            with timed_serialization('json'):
+                response = Response(encode_json(payload), mimetype='application/json')
+        if etag:
+            response.set_etag(etag)
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+        return response, 200
+    except ValueError as e:
+        logger.error(f"Invalid pagination parameters: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        logger.exception("Exception occurred while fetching observations.")
+        return jsonify({'status': 'error', 'message': 'Failed to fetch observations'}), 500
+
+def validate_observation(data, user_id):
+    """
+    Validates an observation payload and builds the document to insert.
+    Raises ValueError with a user-facing message if the payload is invalid.
+    """
+    required_fields = ['species', 'gender', 'quantity', 'latitude', 'longitude']
+    if not data or not isinstance(data, dict):
+        raise ValueError("No data provided")
+
+    missing_fields = [field for field in required_fields if field not in data]
+    if missing_fields:
+        raise ValueError(f"Missing fields: {', '.join(missing_fields)}")
+
+    # Extract and validate data
+    try:
+        species = str(data['species']).strip()
+        gender = str(data['gender']).strip()
+        quantity = int(data['quantity'])
+        latitude = float(data['latitude'])
+        longitude = float(data['longitude'])
+    except (ValueError, TypeError):
+        raise ValueError("Invalid data types provided")
+
+    # Further validation
+    if gender not in VALID_GENDERS:
+        raise ValueError("Invalid gender value")
+    if quantity < 1:
+        raise ValueError("Quantity must be at least 1")
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError("Coordinates out of range")
+
+    # BSON dates only keep milliseconds; truncate so the returned document matches what is stored
+    now = datetime.utcnow()
+    observation = {
+        'species': species,
+        'gender': gender,
+        'quantity': quantity,
+        'latitude': latitude,
+        'longitude': longitude,
+        'location': make_point(latitude, longitude),
+        'userId': user_id,
+        'timestamp': now.replace(microsecond=now.microsecond // 1000 * 1000)
+    }
+
+    idempotency_key = data.get('idempotency_key')
+    if idempotency_key is not None:
+        idempotency_key = str(idempotency_key).strip()
+        if not idempotency_key or len(idempotency_key) > 128:
+            raise ValueError("Invalid idempotency_key")
+        observation['idempotencyKey'] = idempotency_key
+    return observation
+
+def validate_observation_update(data, require_all=True):
+    """
+    Validates the editable fields of an observation and returns the fields to $set.
+    With require_all, species, gender and quantity must all be present; otherwise at
+    least one editable field must be. Latitude and longitude are optional but must be
+    given together. Raises ValueError with a user-facing message on invalid input.
+    """
+    update_fields = {}
+    for field in ['species', 'gender', 'quantity']:
+        if data.get(field) not in (None, ''):
+            update_fields[field] = data[field]
+    if require_all and len(update_fields) < 3:
+        raise ValueError("Missing data.")
+
+    try:
+        if 'species' in update_fields:
+            update_fields['species'] = str(update_fields['species']).strip()
+        if 'gender' in update_fields:
+            update_fields['gender'] = str(update_fields['gender']).strip()
+        if 'quantity' in update_fields:
+            update_fields['quantity'] = int(update_fields['quantity'])
+    except (ValueError, TypeError):
+        raise ValueError("Invalid data types provided")
+    if update_fields.get('gender', VALID_GENDERS[0]) not in VALID_GENDERS:
+        raise ValueError("Invalid gender value")
+    if update_fields.get('quantity', 1) < 1:
+        raise ValueError("Quantity must be at least 1")
+
+    # Moving an observation is optional, but latitude and longitude must be given together
+    if 'latitude' in data or 'longitude' in data:
+        try:
+            latitude = float(data['latitude'])
+            longitude = float(data['longitude'])
+            if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+                raise ValueError
+        except (KeyError, ValueError, TypeError):
+            raise ValueError("Invalid coordinates.")
+        update_fields.update({
+            "latitude": latitude,
+            "longitude": longitude,
+            "location": make_point(latitude, longitude)
+        })
+
+    if not update_fields:
+        raise ValueError("No data to update.")
+    return update_fields
+
+def parse_object_ids(values):
+    """
+    Parses a non-empty list of ID strings into ObjectIds, dropping duplicates.
+    Raises ValueError if the list is missing, too long or contains an invalid ID.
+    """
+    if not isinstance(values, list) or not values:
+        raise ValueError("A list of IDs is required.")
+    if len(values) > MAX_BATCH_IDS:
+        raise ValueError(f"At most {MAX_BATCH_IDS} IDs can be changed at once.")
+    object_ids = []
+    for value in values:
+        try:
+            object_id = ObjectId(value)
+        except (InvalidId, TypeError):
+            raise ValueError(f"Invalid ID: {value}")
+        if object_id not in object_ids:
+            object_ids.append(object_id)
+    return object_ids
+
+def ownership_error(collection, object_id, user_id, label, action):
+    """
+    Explains why a write filtered on both _id and userId matched nothing.
+    Only called on that failure path, so successful writes stay a single round trip.
+    Returns a (response, status) tuple.
+    """
+    document = collection.find_one({"_id": object_id}, {"userId": 1})
+    if not document:
+        logger.error(f"{label} not found: {object_id}")
+        return jsonify({"status": "error", "message": f"{label} not found."}), 404
+    if not document.get('userId'):
+        logger.error(f"{label} {object_id} has no 'userId' field.")
+        return jsonify({"status": "error", "message": f"{label} data corrupted."}), 500
+    logger.warning(f"Unauthorized {action} attempt by user {user_id} on {label.lower()} {object_id}.")
+    return jsonify({"status": "error", "message": "Unauthorized."}), 403
+
+def classify_unmatched_ids(collection, object_ids, user_id):
+    """
+    Splits IDs that a batch write did not change into those that do not exist and
+    those owned by another user.
+    """
+    owners = {doc['_id']: doc.get('userId') for doc in collection.find({'_id': {'$in': object_ids}}, {'userId': 1})}
+    not_found = [str(object_id) for object_id in object_ids if object_id not in owners]
+    unauthorized = [str(object_id) for object_id, owner in owners.items() if owner != user_id]
+    return not_found, unauthorized
+
+def iter_bulk_records():
+    """
+    Yields the records of a bulk upload. NDJSON bodies are read line by line from the
+    request stream; anything else must be a JSON array or {"observations": [...]}.
+    Lines that are not valid JSON are yielded as None.
+    Raises ValueError if a JSON body is not a list of records.
+    """
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+        return
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('observations')
+    if not isinstance(data, list):
+        raise ValueError("Expected a JSON array of observations or NDJSON")
+    yield from data
+
+def insert_observation_batch(batch, user_id):
+    """
+    Inserts a batch of validated (index, observation) pairs with one unordered insert_many.
+    Observations whose idempotency key was already used by this user are not inserted
+    again and are reported as duplicates of the existing document.
+    Returns one result dict per pair.
+    """
+    keys = [obs['idempotencyKey'] for _, obs in batch if 'idempotencyKey' in obs]
+    existing = {}
+    if keys:
+        for doc in observations_collection.find(
+            {'userId': user_id, 'idempotencyKey': {'$in': keys}},
+            {'idempotencyKey': 1}
+        ):
+            existing[doc['idempotencyKey']] = doc['_id']
+
+    results = []
+    to_insert = []
+    repeated = []
+    pending_keys = set()
+    for index, obs in batch:
+        key = obs.get('idempotencyKey')
+        if key in existing:
+            results.append({'index': index, 'status': 'duplicate', 'id': str(existing[key])})
+        elif key is not None and key in pending_keys:
+            # Same key twice in one upload: resolved once the first copy is inserted
+            repeated.append((index, key))
+        else:
+            if key is not None:
+                pending_keys.add(key)
+            to_insert.append((index, obs))
+
+    failed = {}
+    if to_insert:
+        last_seq = next_change_seq(len(to_insert))
+        changed_at = datetime.utcnow()
+        for position, (_, obs) in enumerate(to_insert):
+            obs['changeSeq'] = last_seq - len(to_insert) + 1 + position
+            obs['changedAt'] = changed_at
+        try:
+            observations_collection.insert_many([obs for _, obs in to_insert], ordered=False)
+        except BulkWriteError as e:
+            failed = {error['index']: error for error in e.details.get('writeErrors', [])}
+        if len(failed) < len(to_insert):
+            mark_observations_committed()
+
+    update_rollups(added=[obs for position, (_, obs) in enumerate(to_insert) if position not in failed])
+
+    lost_keys = []
+    for position, (index, obs) in enumerate(to_insert):
+        error = failed.get(position)
+        if error is None:
+            results.append({'index': index, 'status': 'created', 'id': str(obs['_id'])})
+            publish_observation_event('created', serialize_observation(obs))
+            if 'idempotencyKey' in obs:
+                existing[obs['idempotencyKey']] = obs['_id']
+        elif error.get('code') == 11000 and 'idempotencyKey' in obs:
+            # Another request inserted the same key concurrently
+            lost_keys.append((index, obs['idempotencyKey']))
+        else:
+            results.append({'index': index, 'status': 'error', 'message': 'Failed to add observation'})
+
+    if lost_keys:
+        for doc in observations_collection.find(
+            {'userId': user_id, 'idempotencyKey': {'$in': [key for _, key in lost_keys]}},
+            {'idempotencyKey': 1}
+        ):
+            existing[doc['idempotencyKey']] = doc['_id']
+    for index, key in lost_keys + repeated:
+        if key in existing:
+            results.append({'index': index, 'status': 'duplicate', 'id': str(existing[key])})
+        else:
+            results.append({'index': index, 'status': 'error', 'message': 'Failed to add observation'})
+    return results
+
+def rollup_key(obs):
+    """
+    Returns the rollup bucket (species, gender, day, cellX, cellY) of an observation
+    document, or None if it has no usable timestamp or coordinates.
+    """
+    try:
+        latitude, longitude = float(obs['latitude']), float(obs['longitude'])
+        day = obs['timestamp'].strftime('%Y-%m-%d')
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return None
+    return (
+        obs.get('species'),
+        obs.get('gender'),
+        day,
+        math.floor((longitude + 180) / ROLLUP_CELL_SIZE),
+        math.floor((latitude + 90) / ROLLUP_CELL_SIZE)
+    )
+
+def update_rollups(added=(), removed=()):
+    """
+    Adds the observation documents in 'added' to the rollups and subtracts those in
+    'removed', with one $inc upsert per affected bucket. Failures are logged rather
+    than raised; `flask rebuild-rollups` recomputes the rollups from scratch.
+    """
+    deltas = {}
+    for documents, sign in [(added, 1), (removed, -1)]:
+        for obs in documents:
+            key = rollup_key(obs)
+            if key is None:
+                continue
+            try:
+                quantity = int(obs.get('quantity') or 0)
+            except (TypeError, ValueError):
+                quantity = 0
+            count, total = deltas.get(key, (0, 0))
+            deltas[key] = (count + sign, total + sign * quantity)
+
+    operations = [
+        UpdateOne(
+            {'species': species, 'gender': gender, 'day': day, 'cellX': cell_x, 'cellY': cell_y},
+            {'$inc': {'count': count, 'quantity': quantity}},
+            upsert=True
+        )
+        for (species, gender, day, cell_x, cell_y), (count, quantity) in deltas.items()
+        if count or quantity
+    ]
+    if not operations:
+        return
+    try:
+        rollups_collection.bulk_write(operations, ordered=False)
+    except Exception as e:
+        logger.error(f"Failed to update observation rollups: {e}")
+
+def build_stats_pipeline(args):
+    """
+    Builds the aggregation over the rollups for the stats endpoint from request parameters:
+    group_by (comma-separated keys of ROLLUP_GROUPS), species and gender filters and an
+    inclusive start/end day range. Raises ValueError with a user-facing message on invalid input.
+    """
+    group_by = [key.strip() for key in args.get('group_by', 'species').split(',') if key.strip()]
+    unknown = [key for key in group_by if key not in ROLLUP_GROUPS]
+    if unknown:
+        raise ValueError(f"Invalid group_by: {', '.join(unknown)}")
+
+    match = {}
+    for field in ['species', 'gender']:
+        values = [value.strip() for value in args.get(field, '').split(',') if value.strip()]
+        if values:
+            match[field] = values[0] if len(values) == 1 else {'$in': values}
+    day_range = {}
+    try:
+        if args.get('start'):
+            day_range['$gte'] = parse_iso_datetime(args['start']).strftime('%Y-%m-%d')
+        if args.get('end'):
+            day_range['$lte'] = parse_iso_datetime(args['end']).strftime('%Y-%m-%d')
+    except ValueError:
+        raise ValueError("Invalid start or end date")
+    if day_range:
+        match['day'] = day_range
+
+    return group_by, [
+        {'$match': match},
+        {'$group': {
+            '_id': {key: ROLLUP_GROUPS[key] for key in group_by},
+            'count': {'$sum': '$count'},
+            'quantity': {'$sum': '$quantity'}
+        }},
+        # Buckets emptied by deletions keep a zero count
+        {'$match': {'count': {'$gt': 0}}},
+        {'$sort': {'_id': 1}},
+        {'$limit': MAX_STATS_GROUPS + 1}
+    ]
+
+def observation_to_feature(serialized):
+    """
+    Converts a serialized observation into a GeoJSON Point feature.
+    """
+    return {
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': [serialized['longitude'], serialized['latitude']]},
+        'properties': serialized
+    }
+
+def encode_export_batch(export_format, serialized, first):
+    """
+    Encodes a batch of serialized observations in an export format. 'first' tells
+    whether this is the first batch, which GeoJSON needs to place separators.
+    """
+    if export_format == 'ndjson':
+        return b''.join(encode_json(obs) + b'\n' for obs in serialized)
+    if export_format == 'csv':
+        buffer = io.StringIO()
+        csv.DictWriter(buffer, EXPORT_CSV_COLUMNS, lineterminator='\n').writerows(serialized)
+        return buffer.getvalue().encode()
+    features = encode_json([observation_to_feature(obs) for obs in serialized])[1:-1]
+    return features if first or not features else b',' + features
+
+def iter_observation_export(query, export_format):
+    """
+    Streams the observations matching 'query', newest first, encoded in an export format.
+    Documents are read and encoded EXPORT_BATCH_SIZE at a time, so memory use does not
+    grow with the size of the export.
+    """
+    if export_format == 'csv':
+        yield (','.join(EXPORT_CSV_COLUMNS) + '\n').encode()
+    elif export_format == 'geojson':
+        yield b'{"type":"FeatureCollection","features":['
+
+    cursor = (
+        observations_collection.find(query, OBSERVATION_FIELDS)
+        .sort([('timestamp', DESCENDING), ('_id', DESCENDING)])
+        .batch_size(EXPORT_BATCH_SIZE)
+    )
+    batch, first = [], True
+    try:
+        for obs in cursor:
+            batch.append(serialize_observation(obs))
+            if len(batch) >= EXPORT_BATCH_SIZE:
+                yield encode_export_batch(export_format, batch, first)
+                batch, first = [], False
+        if batch:
+            yield encode_export_batch(export_format, batch, first)
+    finally:
+        cursor.close()
+
+    if export_format == 'geojson':
+        yield b']}'
+
+def gzip_stream(chunks):
+    """
+    Compresses a stream of byte chunks into a gzip stream, flushing after every chunk
+    so the client receives data as soon as it is produced.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+def build_aggregate_pipeline(query, cell_size, by_species=False, window=None):
+    """
+    Builds the aggregation pipeline that bins matching observations into square cells of
+    'cell_size' degrees, optionally also grouping by species and by time window, and
+    returns the observation count and summed quantity of each bin.
+    """
+    group_id = {
+        'x': {'$floor': {'$divide': [{'$add': ['$longitude', 180]}, cell_size]}},
+        'y': {'$floor': {'$divide': [{'$add': ['$latitude', 90]}, cell_size]}}
+    }
+    if by_species:
+        group_id['species'] = '$species'
+    if window:
+        group_id['window'] = {'$dateToString': {'format': AGGREGATE_WINDOWS[window], 'date': '$timestamp'}}
+
+    return [
+        {'$match': query},
+        # Skip legacy documents without usable coordinates
+        {'$match': {'latitude': {'$type': 'number'}, 'longitude': {'$type': 'number'}}},
+        {'$group': {
+            '_id': group_id,
+            'count': {'$sum': 1},
+            'quantity': {'$sum': '$quantity'}
+        }},
+        {'$limit': MAX_AGGREGATE_CELLS + 1}
+    ]
+
+def ensure_indexes():
+    """
+    Creates the indexes used by the observation queries. Safe to call repeatedly.
+    """
+    try:
+        observations_collection.create_index([('timestamp', DESCENDING), ('_id', DESCENDING)])
+        observations_collection.create_index([('species', ASCENDING), ('timestamp', DESCENDING)])
+        observations_collection.create_index([('userId', ASCENDING), ('timestamp', DESCENDING)])
+        observations_collection.create_index([('location', '2dsphere')])
+        observations_collection.create_index([('changeSeq', ASCENDING), ('_id', ASCENDING)])
+        tombstones_collection.create_index([('changeSeq', ASCENDING), ('_id', ASCENDING)])
+        observations_collection.create_index('changedAt', sparse=True)
+        tombstones_collection.create_index('deletedAt', expireAfterSeconds=TOMBSTONE_RETENTION_DAYS * 24 * 3600)
+        observations_collection.create_index(
+            [('userId', ASCENDING), ('idempotencyKey', ASCENDING)],
+            unique=True,
+            partialFilterExpression={'idempotencyKey': {'$exists': True}}
+        )
+        spots_collection.create_index('userId')
+        ensure_rollup_indexes(rollups_collection)
+    except Exception as e:
+        logger.error(f"Failed to create observation indexes: {e}")
+
+def ensure_rollup_indexes(collection):
+    """
+    Creates the rollup indexes on 'collection'. The unique bucket index is what keeps
+    concurrent $inc upserts from creating duplicate buckets.
+    """
+    collection.create_index(
+        [('species', ASCENDING), ('gender', ASCENDING), ('day', ASCENDING), ('cellX', ASCENDING), ('cellY', ASCENDING)],
+        unique=True
+    )
+    collection.create_index([('day', ASCENDING)])
+
+def serialize_spot(spot):
+    return {
+        "id": str(spot["_id"]),
+        "name": spot.get("name", "N/A"),
+        "coordinates": spot.get("coordinates", []),
+        "userId": spot.get("userId", "N/A"),
+        "timestamp": spot.get("timestamp").isoformat() + 'Z' if spot.get("timestamp") else "N/A",
+        "bbox": spot.get("bbox"),
+        "area": spot.get("area"),
+        "centroid": spot.get("centroid")
+    }
+
+# ---------------------- Geometry Helpers ---------------------- #
+
+def iter_positions(coordinates):
+    """
+    Yields every [lon, lat] position in a (possibly nested) GeoJSON coordinates array.
+    """
+    if coordinates and isinstance(coordinates[0], (int, float)):
+        yield coordinates
+        return
+    for part in coordinates or []:
+        yield from iter_positions(part)
+
+def geometry_bbox(geometry):
+    """
+    Returns the (minLon, minLat, maxLon, maxLat) bounding box of a GeoJSON geometry,
+    or None if it has no positions.
+    """
+    if not geometry:
+        return None
+    if geometry['type'] == 'GeometryCollection':
+        boxes = [box for box in map(geometry_bbox, geometry.get('geometries', [])) if box]
+    else:
+        boxes = [(p[0], p[1], p[0], p[1]) for p in iter_positions(geometry.get('coordinates', []))]
+    if not boxes:
+        return None
+    return (
+        min(box[0] for box in boxes),
+        min(box[1] for box in boxes),
+        max(box[2] for box in boxes),
+        max(box[3] for box in boxes)
+    )
+
+def bboxes_intersect(a, b):
+    """
+    Returns True if two (minLon, minLat, maxLon, maxLat) boxes overlap.
+    """
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+def split_bbox(bbox):
+    """
+    Splits a (minLon, minLat, maxLon, maxLat) box that crosses the antimeridian
+    (minLon > maxLon) into its two halves. Other boxes are returned as they are.
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    if min_lon <= max_lon:
+        return [tuple(bbox)]
+    return [(min_lon, min_lat, 180.0, max_lat), (-180.0, min_lat, max_lon, max_lat)]
+
+def tile_bounds(z, x, y):
+    """
+    Returns the (minLon, minLat, maxLon, maxLat) bounds of an XYZ (Web Mercator) tile.
+    """
+    n = 2 ** z
+    min_lon = x / n * 360.0 - 180.0
+    max_lon = (x + 1) / n * 360.0 - 180.0
+    max_lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    min_lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return min_lon, min_lat, max_lon, max_lat
+
+def zoom_tolerance(z):
+    """
+    Returns the simplification tolerance in degrees for a zoom level (about one pixel).
+    """
+    return 360.0 / (TILE_SIZE_PX * 2 ** z)
+
+def zoom_precision(z):
+    """
+    Returns the number of decimal places needed to keep coordinates pixel-accurate at a zoom level.
+    """
+    return max(0, int(math.ceil(-math.log10(zoom_tolerance(z))))) + 1
+
+def simplify_line(points, tolerance):
+    """
+    Simplifies a list of positions with the Douglas-Peucker algorithm.
+    The first and last positions are always kept.
+    """
+    if len(points) < 3 or tolerance <= 0:
+        return list(points)
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        (x1, y1), (x2, y2) = points[start][:2], points[end][:2]
+        dx, dy = x2 - x1, y2 - y1
+        length_sq = dx * dx + dy * dy
+        max_dist, index = 0.0, None
+        for i in range(start + 1, end):
+            px, py = points[i][0], points[i][1]
+            if length_sq == 0:
+                dist = math.hypot(px - x1, py - y1)
+            else:
+                t = max(0.0, min(1.0, ((px - x1) * dx + (py - y1) * dy) / length_sq))
+                dist = math.hypot(px - (x1 + t * dx), py - (y1 + t * dy))
+            if dist > max_dist:
+                max_dist, index = dist, i
+        if index is not None and max_dist > tolerance:
+            keep[index] = True
+            stack.append((start, index))
+            stack.append((index, end))
+    return [point for point, kept in zip(points, keep) if kept]
+
+def simplify_ring(ring, tolerance):
+    """
+    Simplifies a closed ring, returning None if it collapses to fewer than four positions.
+    """
+    simplified = simplify_line(ring, tolerance)
+    if len(simplified) < 4:
+        return None
+    return simplified
+
+def clip_ring(ring, bounds):
+    """
+    Clips a polygon ring to a bounding box using the Sutherland-Hodgman algorithm.
+    Returns a closed ring, or None if nothing is left inside the box.
+    """
+    min_x, min_y, max_x, max_y = bounds
+    edges = [
+        (lambda p: p[0] >= min_x, lambda a, b: (min_x, a[1] + (b[1] - a[1]) * (min_x - a[0]) / (b[0] - a[0]))),
+        (lambda p: p[0] <= max_x, lambda a, b: (max_x, a[1] + (b[1] - a[1]) * (max_x - a[0]) / (b[0] - a[0]))),
+        (lambda p: p[1] >= min_y, lambda a, b: (a[0] + (b[0] - a[0]) * (min_y - a[1]) / (b[1] - a[1]), min_y)),
+        (lambda p: p[1] <= max_y, lambda a, b: (a[0] + (b[0] - a[0]) * (max_y - a[1]) / (b[1] - a[1]), max_y)),
+    ]
+    output = [tuple(p[:2]) for p in ring]
+    if output and output[0] == output[-1]:
+        output = output[:-1]
+    for inside, intersect in edges:
+        if not output:
+            return None
+        points, output = output, []
+        previous = points[-1]
+        for current in points:
+            if inside(current):
+                if not inside(previous):
+                    output.append(intersect(previous, current))
+                output.append(current)
+            elif inside(previous):
+                output.append(intersect(previous, current))
+            previous = current
+    if len(output) < 3:
+        return None
+    return [list(p) for p in output] + [list(output[0])]
+
+def clip_line(points, bounds):
+    """
+    Clips a line string to a bounding box using the Liang-Barsky algorithm.
+    Returns a list of line strings, as a line can leave and re-enter the box.
+    """
+    min_x, min_y, max_x, max_y = bounds
+    lines, current = [], []
+    for a, b in zip(points, points[1:]):
+        x1, y1, x2, y2 = a[0], a[1], b[0], b[1]
+        dx, dy = x2 - x1, y2 - y1
+        t0, t1 = 0.0, 1.0
+        visible = True
+        for p, q in ((-dx, x1 - min_x), (dx, max_x - x1), (-dy, y1 - min_y), (dy, max_y - y1)):
+            if p == 0:
+                if q < 0:
+                    visible = False
+                    break
+                continue
+            r = q / p
+            if p < 0:
+                t0 = max(t0, r)
+            else:
+                t1 = min(t1, r)
+            if t0 > t1:
+                visible = False
+                break
+        if not visible:
+            if len(current) > 1:
+                lines.append(current)
+            current = []
+            continue
+        start = [x1 + t0 * dx, y1 + t0 * dy]
+        end = [x1 + t1 * dx, y1 + t1 * dy]
+        if not current or current[-1] != start:
+            if len(current) > 1:
+                lines.append(current)
+            current = [start]
+        current.append(end)
+        if t1 < 1.0:
+            lines.append(current)
+            current = []
+    if len(current) > 1:
+        lines.append(current)
+    return lines
+
+def round_coordinates(coordinates, precision):
+    """
+    Rounds every position in a nested coordinates array to the given number of decimals.
+    """
+    if coordinates and isinstance(coordinates[0], (int, float)):
+        return [round(value, precision) for value in coordinates[:2]]
+    return [round_coordinates(part, precision) for part in coordinates]
+
+def simplify_polygon(rings, tolerance, bounds=None):
+    """
+    Optionally clips, then simplifies, the rings of one polygon.
+    Returns None if the exterior ring disappears.
+    """
+    result = []
+    for index, ring in enumerate(rings):
+        if bounds is not None:
+            ring = clip_ring(ring, bounds)
+        if ring is not None:
+            ring = simplify_ring(ring, tolerance)
+        if ring is None:
+            if index == 0:
+                return None
+            continue
+        result.append(ring)
+    return result
+
+def transform_geometry(geometry, tolerance, precision, bounds=None):
+    """
+    Clips a GeoJSON geometry to 'bounds' (if given), simplifies it with 'tolerance' degrees
+    and rounds its coordinates to 'precision' decimals. Returns None if nothing is left.
+    """
+    if not geometry:
+        return None
+    geom_type = geometry['type']
+    coordinates = geometry.get('coordinates')
+
+    if geom_type == 'GeometryCollection':
+        parts = [transform_geometry(g, tolerance, precision, bounds) for g in geometry.get('geometries', [])]
+        parts = [part for part in parts if part]
+        return {'type': geom_type, 'geometries': parts} if parts else None
+
+    if geom_type == 'Point':
+        if bounds is not None and not bboxes_intersect(bounds, (coordinates[0], coordinates[1]) * 2):
+            return None
+        result = coordinates
+    elif geom_type == 'MultiPoint':
+        result = [p for p in coordinates
+                  if bounds is None or bboxes_intersect(bounds, (p[0], p[1]) * 2)]
+    elif geom_type in ('LineString', 'MultiLineString'):
+        lines = [coordinates] if geom_type == 'LineString' else coordinates
+        if bounds is not None:
+            lines = [part for line in lines for part in clip_line(line, bounds)]
+        lines = [simplify_line(line, tolerance) for line in lines]
+        lines = [line for line in lines if len(line) > 1]
+        if not lines:
+            return None
+        if len(lines) == 1:
+            geom_type, result = 'LineString', lines[0]
+        else:
+            geom_type, result = 'MultiLineString', lines
+    elif geom_type in ('Polygon', 'MultiPolygon'):
+        polygons = [coordinates] if geom_type == 'Polygon' else coordinates
+        polygons = [simplify_polygon(rings, tolerance, bounds) for rings in polygons]
+        polygons = [rings for rings in polygons if rings]
+        if not polygons:
+            return None
+        if len(polygons) == 1:
+            geom_type, result = 'Polygon', polygons[0]
+        else:
+            geom_type, result = 'MultiPolygon', polygons
+    else:
+        return None
+
+    if not result:
+        return None
+    return {'type': geom_type, 'coordinates': round_coordinates(result, precision)}
+
+# ---------------------- Spot Geometry and Index ---------------------- #
+
+def ring_signed_area(ring):
+    """
+    Returns the planar signed area of a closed [lon, lat] ring in square degrees,
+    positive when the ring is counterclockwise.
+    """
+    return sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(ring, ring[1:])) / 2
+
+def ring_area_sq_meters(ring):
+    """
+    Returns the area of a closed [lon, lat] ring on the sphere, in square meters.
+    """
+    total = sum(
+        math.radians(lon2 - lon1) * (2 + math.sin(math.radians(lat1)) + math.sin(math.radians(lat2)))
+        for (lon1, lat1), (lon2, lat2) in zip(ring, ring[1:])
+    )
+    return abs(total) * EARTH_RADIUS_METERS ** 2 / 2
+
+def ring_centroid(ring):
+    """
+    Returns the [lon, lat] centroid of a closed ring, or the mean of its vertices
+    when the ring has no area.
+    """
+    area = ring_signed_area(ring)
+    if abs(area) < 1e-18:
+        points = ring[:-1]
+        return [sum(p[0] for p in points) / len(points), sum(p[1] for p in points) / len(points)]
+    cx = cy = 0.0
+    for (x1, y1), (x2, y2) in zip(ring, ring[1:]):
+        cross = x1 * y2 - x2 * y1
+        cx += (x1 + x2) * cross
+        cy += (y1 + y2) * cross
+    return [cx / (6 * area), cy / (6 * area)]
+
+def spot_geometry(coordinates):
+    """
+    Normalizes the coordinates of a favorite spot and derives the fields stored with it:
+    a closed counterclockwise [lon, lat] ring without repeated points, its bbox
+    [minLon, minLat, maxLon, maxLat], area in square meters and [lon, lat] centroid.
+    Raises ValueError if the coordinates do not describe a valid polygon.
+    """
+    try:
+        ring = spot_ring(coordinates)
+    except (TypeError, KeyError, IndexError):
+        raise ValueError("Invalid coordinates provided")
+    if any(not (-180 <= lon <= 180 and -90 <= lat <= 90) for lon, lat in ring):
+        raise ValueError("Coordinates out of range")
+
+    # Drop consecutive duplicates, which Leaflet produces on double clicks
+    points = [ring[0]]
+    for point in ring[1:]:
+        if point != points[-1]:
+            points.append(point)
+    if points[0] != points[-1]:
+        points.append(list(points[0]))
+    if len(points) < 4 or abs(ring_signed_area(points)) < 1e-18:
+        raise ValueError("A spot needs at least three distinct points")
+    # GeoJSON orders exterior rings counterclockwise
+    if ring_signed_area(points) < 0:
+        points.reverse()
+
+    lons = [lon for lon, _ in points]
+    lats = [lat for _, lat in points]
+    return {
+        'ring': points,
+        'bbox': [min(lons), min(lats), max(lons), max(lats)],
+        'area': ring_area_sq_meters(points),
+        'centroid': ring_centroid(points)
+    }
+
+def point_in_ring(lon, lat, ring):
+    """
+    Returns whether a point lies inside a closed ring (even-odd rule).
+    """
+    inside = False
+    for (x1, y1), (x2, y2) in zip(ring, ring[1:]):
+        if (y1 > lat) != (y2 > lat) and lon < x1 + (lat - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+    return inside
+
+def build_str_tree(entries, node_size=SPOT_INDEX_NODE_SIZE):
+    """
+    Bulk-loads (bbox, item) entries into a Sort-Tile-Recursive R-tree.
+    Nodes are (bbox, children, is_leaf) tuples; returns the root, or None without entries.
+    """
+    if not entries:
+        return None
+    level = [(bbox, [(bbox, item)], True) for bbox, item in entries]
+    leaf_level = True
+    while True:
+        # Tile the level into vertical slices by x, then pack each slice by y
+        node_count = math.ceil(len(level) / node_size)
+        slice_size = node_size * math.ceil(math.sqrt(node_count))
+        level.sort(key=lambda node: node[0][0] + node[0][2])
+        packed = []
+        for start in range(0, len(level), slice_size):
+            vertical_slice = sorted(level[start:start + slice_size], key=lambda node: node[0][1] + node[0][3])
+            for offset in range(0, len(vertical_slice), node_size):
+                group = vertical_slice[offset:offset + node_size]
+                children = [child for node in group for child in node[1]] if leaf_level else group
+                packed.append((
+                    [min(node[0][0] for node in group), min(node[0][1] for node in group),
+                     max(node[0][2] for node in group), max(node[0][3] for node in group)],
+                    children,
+                    leaf_level
+                ))
+        if len(packed) == 1:
+            return packed[0]
+        level, leaf_level = packed, False
+
+def str_tree_intersecting(node, bbox):
+    """
+    Yields the items of an STR-tree whose bbox intersects the given bbox.
+    """
+    stack = [node] if node else []
+    while stack:
+        node_bbox, children, is_leaf = stack.pop()
+        if not bboxes_intersect(node_bbox, bbox):
+            continue
+        if is_leaf:
+            for child_bbox, item in children:
+                if bboxes_intersect(child_bbox, bbox):
+                    yield item
+        else:
+            stack.extend(children)
+
+def str_tree_candidates(node, lon, lat):
+    """
+    Yields the items of an STR-tree whose bbox contains the given point.
+    """
+    stack = [node] if node else []
+    while stack:
+        bbox, children, is_leaf = stack.pop()
+        if not (bbox[0] <= lon <= bbox[2] and bbox[1] <= lat <= bbox[3]):
+            continue
+        if is_leaf:
+            for child_bbox, item in children:
+                if child_bbox[0] <= lon <= child_bbox[2] and child_bbox[1] <= lat <= child_bbox[3]:
+                    yield item
+        else:
+            stack.extend(children)
+
+# user ID -> {'version', 'tree', 'spots'}, least recently used first
+_spot_indexes = OrderedDict()
+_spot_indexes_lock = threading.Lock()
+
+def spot_index_version(user_id):
+    """
+    Returns the version of a user's spots, bumped by every spot write.
+    """
+    counter = counters_collection.find_one({'_id': f'spots:{user_id}'})
+    return counter['seq'] if counter else 0
+
+def bump_spot_index_version(user_id):
+    """
+    Marks a user's spot index as stale in every process.
+    """
+    counters_collection.update_one({'_id': f'spots:{user_id}'}, {'$inc': {'seq': 1}}, upsert=True)
+
+def get_spot_index(user_id):
+    """
+    Returns the spatial index of a user's favorite spots, rebuilding it when the spots
+    changed. Spots stored before their geometry was derived are normalized on the fly,
+    and spots with invalid coordinates are skipped.
+    """
+    version = spot_index_version(user_id)
+    with _spot_indexes_lock:
+        cached = _spot_indexes.get(user_id)
+        if cached and cached['version'] == version:
+            _spot_indexes.move_to_end(user_id)
+            return cached
+
+    spots = []
+    for spot in spots_collection.find({'userId': user_id}, {'name': 1, 'coordinates': 1, 'ring': 1, 'bbox': 1, 'area': 1, 'centroid': 1}):
+        if not spot.get('ring'):
+            try:
+                spot.update(spot_geometry(spot.get('coordinates')))
+            except ValueError:
+                logger.warning(f"Skipping spot {spot['_id']} with invalid coordinates in the spot index.")
+                continue
+        spots.append(spot)
+
+    index = {
+        'version': version,
+        'spots': spots,
+        'tree': build_str_tree([(spot['bbox'], spot) for spot in spots])
+    }
+    with _spot_indexes_lock:
+        _spot_indexes[user_id] = index
+        _spot_indexes.move_to_end(user_id)
+        while len(_spot_indexes) > SPOT_INDEX_CACHE_SIZE:
+            _spot_indexes.popitem(last=False)
+    return index
+
+def spots_containing(index, lon, lat):
+    """
+    Returns the spots of a spot index that contain the given point.
+    """
+    return [spot for spot in str_tree_candidates(index['tree'], lon, lat) if point_in_ring(lon, lat, spot['ring'])]
+
+# ---------------------- Data File Delivery ---------------------- #
+
+def file_etag(stat_result, encoding=None):
+    """
+    Builds a strong ETag from file metadata. Each encoding of a file gets its own ETag,
+    since the bytes sent differ.
+    """
+    etag = f"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"
+    return f"{etag}-{encoding}" if encoding else etag
+
+def precompressed_variant(file_path, stat_result):
+    """
+    Picks the best precompressed variant of a file accepted by the client.
+    Returns (encoding, path), or (None, file_path) when the plain file should be sent.
+    Variants older than the source file are ignored.
+    """
+    for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+        if not request.accept_encodings[encoding]:
+            continue
+        variant_path = file_path + suffix
+        try:
+            if os.stat(variant_path).st_mtime_ns >= stat_result.st_mtime_ns:
+                return encoding, variant_path
+        except OSError:
+            continue
+    return None, file_path
+
+def send_data_file(file_path, max_age=0, mimetype='application/geo+json'):
+    """
+    Sends a data file, using a precompressed variant when the client accepts one.
+    Responses carry a strong ETag and Last-Modified taken from the source file, and
+    conditional requests are answered with 304 Not Modified.
+    """
+    stat_result = os.stat(file_path)
+    encoding, send_path = precompressed_variant(file_path, stat_result)
+    response = send_file(
+        send_path,
+        mimetype=mimetype,
+        etag=file_etag(stat_result, encoding),
+        last_modified=stat_result.st_mtime,
+        max_age=max_age,
+        conditional=True
+    )
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    # Data files are only served to authenticated users
+    response.cache_control.public = False
+    response.cache_control.private = True
+    if not max_age:
+        response.cache_control.no_cache = True
+    return response
+
+def data_file_max_age(filename):
+    """
+    Returns the Cache-Control max-age for a file under DIR.
+    """
+    if filename.startswith(STATIC_DATA_PREFIXES):
+        return STATIC_DATA_MAX_AGE
+    return 0
+
+def write_compressed_variants(file_path, force=False, fast=False):
+    """
+    Writes gzip (and, if available, brotli) variants next to a file.
+    Existing variants are kept unless they are older than the file or 'force' is set.
+    With 'fast', lower compression levels are used so the call is cheap enough for a request.
+    Returns the number of variants written.
+    """
+    levels = FAST_COMPRESSION_LEVELS if fast else COMPRESSION_LEVELS
+    source_mtime = os.stat(file_path).st_mtime_ns
+    written = 0
+    for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+        if encoding == 'br' and brotli is None:
+            continue
+        variant_path = file_path + suffix
+        if not force and os.path.isfile(variant_path) and os.stat(variant_path).st_mtime_ns >= source_mtime:
+            continue
+        tmp_path = f"{variant_path}.{uuid.uuid4().hex}.tmp"
+        if encoding == 'br':
+            with open(file_path, 'rb') as src:
+                data = brotli.compress(src.read(), quality=levels['br'])
+            with open(tmp_path, 'wb') as dst:
+                dst.write(data)
+        else:
+            with open(file_path, 'rb') as src, gzip.open(tmp_path, 'wb', compresslevel=levels['gzip']) as dst:
+                shutil.copyfileobj(src, dst)
+        os.replace(tmp_path, variant_path)
+        written += 1
+    return written
+
+# ---------------------- GeoJSON Layers and Tiles ---------------------- #
+
+# File path -> parsed layer, least recently used first
+_layers = OrderedDict()
+_layers_lock = threading.Lock()
+
+def layer_file_path(layer):
+    """
+    Resolves a layer name such as 'weather/temperature_241018_07' to its GeoJSON file under DIR.
+    Returns None if the name is invalid or the file does not exist.
+    """
+    if not layer_pattern.match(layer):
+        return None
+    file_path = os.path.join(DIR, f"{layer}.geojson")
+    if not os.path.isfile(file_path):
+        return None
+    return file_path
+
+def load_layer(file_path):
+    """
+    Loads a GeoJSON layer with the bounding box of each feature that has a geometry and
+    an STR-tree over them, reusing the parsed copy until the file changes on disk. Layers are evicted
+    least recently used first once their estimated size exceeds LAYER_CACHE_MAX_BYTES.
+    """
+    stat_result = os.stat(file_path)
+    with _layers_lock:
+        cached = _layers.get(file_path)
+        if cached and cached['mtime'] == stat_result.st_mtime:
+            _layers.move_to_end(file_path)
+            return cached
+
+    with open(file_path, 'rb') as f:
+        data = orjson.loads(f.read()) if orjson is not None else json.load(f)
+    features = []
+    for feature in data.get('features', []):
+        box = geometry_bbox(feature.get('geometry'))
+        if box:
+            features.append((box, feature))
+
+    layer = {
+        'mtime': stat_result.st_mtime,
+        'etag': file_etag(stat_result),
+        'size': stat_result.st_size * LAYER_MEMORY_FACTOR,
+        # Top-level members other than the features, and every feature in file order,
+        # including those without a geometry, for subsets that are not limited to a bbox
+        'members': {key: value for key, value in data.items() if key not in ('features', 'bbox')},
+        'all_features': data.get('features', []),
+        'features': features,
+        'tree': build_str_tree([(box, index) for index, (box, _) in enumerate(features)])
+    }
+    with _layers_lock:
+        _layers[file_path] = layer
+        _layers.move_to_end(file_path)
+        total = sum(entry['size'] for entry in _layers.values())
+        # The layer just loaded is kept even if it alone exceeds the limit
+        while total > LAYER_CACHE_MAX_BYTES and len(_layers) > 1:
+            _, evicted = _layers.popitem(last=False)
+            total -= evicted['size']
+    return layer
+
+def layer_features(layer, bbox=None):
+    """
+    Returns the (bbox, feature) pairs of a loaded layer, in file order, optionally
+    only those whose bounding box intersects 'bbox' (which may cross the antimeridian).
+    """
+    if bbox is None:
+        return layer['features']
+    indexes = sorted({index for part in split_bbox(bbox) for index in str_tree_intersecting(layer['tree'], part)})
+    return [layer['features'][index] for index in indexes]
+
+def parse_property_names(value):
+    """
+    Parses a comma-separated list of feature property names. An empty value selects none.
+    """
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    if len(names) > MAX_PROPERTY_NAMES:
+        raise ValueError(f"At most {MAX_PROPERTY_NAMES} properties can be selected")
+    return names
+
+def layer_subset_response(file_path, max_age=0):
+    """
+    Sends a GeoJSON data file, or when 'bbox' and/or 'properties' are given only the
+    features intersecting the bbox, with only the selected properties. Subsets are cut
+    from the parsed layer cache, so repeated viewport requests do not touch the disk.
+    """
+    if 'bbox' not in request.args and 'properties' not in request.args:
+        return send_data_file(file_path, max_age=max_age)
+    try:
+        bbox = parse_bbox(request.args['bbox']) if 'bbox' in request.args else None
+        properties = parse_property_names(request.args['properties']) if 'properties' in request.args else None
+    except ValueError as e:
+        logger.error(f"Invalid subset request for {file_path}: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    layer = load_layer(file_path)
+    response = Response(mimetype='application/geo+json')
+    selection = f"{bbox}|{properties}".encode()
+    response.set_etag(f"{layer['etag']}-{hashlib.sha1(selection).hexdigest()[:16]}")
+    response.cache_control.private = True
+    response.cache_control.max_age = max_age
+    if not max_age:
+        response.cache_control.no_cache = True
+    if request.if_none_match.contains(response.get_etag()[0]):
+        response.status_code = 304
+        return response
+
+    if bbox is None:
+        selected = layer['all_features']
+    else:
+        selected = [feature for _, feature in layer_features(layer, bbox)]
+    features = []
+    for feature in selected:
+        if properties is not None:
+            source = feature.get('properties') or {}
+            feature = {**feature, 'properties': {name: source[name] for name in properties if name in source}}
+        features.append(feature)
+    with timed_serialization('json'):
+        response.set_data(encode_json({**layer['members'], 'type': 'FeatureCollection', 'features': features}))
+    return response
+
+def build_tile(file_path, z, x, y):
+    """
+    Cuts one tile out of a GeoJSON layer, clipping and simplifying each feature for the zoom level.
+    """
+    bounds = tile_bounds(z, x, y)
+    tolerance = zoom_tolerance(z)
+    precision = zoom_precision(z)
+    features = []
+    for _, feature in layer_features(load_layer(file_path), bounds):
+        geometry = transform_geometry(feature['geometry'], tolerance, precision, bounds)
+        if geometry:
+            features.append({
+                'type': 'Feature',
+                'properties': feature.get('properties') or {},
+                'geometry': geometry
+            })
+    return {'type': 'FeatureCollection', 'features': features}
+
+def tile_cache_path(layer, z, x, y):
+    """
+    Returns the on-disk location of a cached tile.
+    """
+    return os.path.join(TILE_CACHE_DIR, layer, str(z), str(x), f"{y}.geojson")
+
+def get_tile_path(layer, file_path, z, x, y):
+    """
+    Returns the path of a cached tile, generating it first if it is missing or older than its source.
+    """
+    cache_path = tile_cache_path(layer, z, x, y)
+    if os.path.isfile(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(file_path):
+        return cache_path
+
+    tile = build_tile(file_path, z, x, y)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    # Write to a temporary file first so concurrent readers never see a partial tile
+    tmp_path = f"{cache_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(tile, f, separators=(',', ':'))
+    os.replace(tmp_path, cache_path)
+    write_compressed_variants(cache_path, force=True, fast=True)
+    return cache_path
 
-# Initialize Flask app
-app = Flask(__name__)
+# ---------------------- Simplified Layers ---------------------- #
 
-# Configure Logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+def simplified_layer_path(layer, zoom):
+    """
+    Returns the on-disk location of a layer simplified for a zoom level.
+    """
+    return os.path.join(SIMPLIFIED_DIR, layer, f"z{zoom}.geojson")
 
-# CORS Configuration
-CORS(app, resources={
-    r"/api/*": {
-        "origins": "*",  # Adjust this as per your frontend domain
-        "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"]
-    },
-    r"/wildvision/*": {
-        "origins": "*",
-        "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"]
-    }
-})
+def simplify_level_for(zoom=None, tolerance=None):
+    """
+    Picks the simplification level to serve: the coarsest level that is still accurate
+    to one pixel at 'zoom', or the coarsest level whose tolerance does not exceed
+    'tolerance' (in degrees). Falls back to the most detailed level.
+    """
+    if zoom is not None:
+        for level in SIMPLIFY_ZOOMS:
+            if level >= zoom:
+                return level
+    elif tolerance is not None:
+        for level in SIMPLIFY_ZOOMS:
+            if zoom_tolerance(level) <= tolerance:
+                return level
+    return SIMPLIFY_ZOOMS[-1]
 
-# JWT Configuration
-app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY')  # Set this in your .env
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=1)  # Token expires in 1 hour
-jwt = JWTManager(app)
+def build_simplified_layer(layer, zoom, force=False):
+    """
+    Writes the simplified copy of a layer for one zoom level, unless an up-to-date copy exists.
+    Returns its path, or None if the layer does not exist.
+    """
+    file_path = layer_file_path(layer)
+    if not file_path:
+        return None
+    path = simplified_layer_path(layer, zoom)
+    if not force and os.path.isfile(path) and os.path.getmtime(path) >= os.path.getmtime(file_path):
+        return path
 
-# MongoDB Configuration
-MONGO_URI = os.getenv('MONGO_URI')
-if not MONGO_URI:
-    logger.error("MONGO_URI not found in environment variables.")
-    raise ValueError("MONGO_URI not found in environment variables.")
-client = MongoClient(MONGO_URI)
-db = client['wildvision']
-observations_collection = db['observations']
-users_collection = db['users']
-spots_collection = db['spots']  # Added collection for spots
+    tolerance = zoom_tolerance(zoom)
+    precision = zoom_precision(zoom)
+    features = []
+    for _, feature in load_layer(file_path)['features']:
+        geometry = transform_geometry(feature['geometry'], tolerance, precision)
+        if geometry:
+            features.append({
+                'type': 'Feature',
+                'properties': feature.get('properties') or {},
+                'geometry': geometry
+            })
 
-# Directory paths
-DIR = '/var/data/static'  # Ensure this path exists and is correctly configured
-ANIMAL_DIR = os.path.join(DIR, 'animal')
-WEATHER_DIR = os.path.join(DIR, 'weather')
-VEGETATION_FILE = os.path.join(DIR, 'vegetation/vegetation_native.geojson')
-ANIMAL_LOCATION_FILE = os.path.join(DIR, 'animal/red_deer_location.geojson')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'type': 'FeatureCollection', 'features': features}, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+    write_compressed_variants(path, force=True, fast=True)
+    logger.info(f"Simplified {layer} for zoom {zoom}: {len(features)} features kept.")
+    return path
 
-# Common regex for date and time in filenames
-time_pattern = re.compile(r'_(\d{6})_(\d{2})\.geojson')
+# ---------------------- Frame Bundles ---------------------- #
 
-# ---------------------- Helper Functions ---------------------- #
+# Delta-encoded bundles keyed by the (filename, mtime) of every frame they contain
+_frame_bundles = OrderedDict()
+_frame_bundles_lock = threading.Lock()
 
-def get_time_periods(directory, prefix):
+def property_changes(previous, current):
     """
-    Scans the specified directory for files starting with the given prefix
-    and extracts date and time information from their filenames.
+    Returns the properties of 'current' that differ from 'previous'.
+    Properties missing from 'current' are reported as None.
     """
-    time_periods = []
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            if file.startswith(prefix):
-                match = time_pattern.search(file)
-                if match:
-                    date = match.group(1)  # YYMMDD
-                    hour = match.group(2)  # HH
-                    readable_time = f"20{date[:2]}-{date[2:4]}-{date[4:6]} {hour}:00"
-                    time_periods.append({
-                        'filename': file,
-                        'time': readable_time
-                    })
-    # Sort the time periods chronologically
-    time_periods.sort(key=lambda x: x['time'])
-    return time_periods
+    changes = {key: value for key, value in current.items() if key not in previous or previous[key] != value}
+    for key in previous:
+        if key not in current:
+            changes[key] = None
+    return changes
 
-def serialize_observation(obs):
+def build_frame_bundle(periods):
+    """
+    Loads every period of a layer and delta-encodes it against the previous one.
+    Frames that share their geometry with the previous frame only carry the properties
+    that changed. A frame whose geometry differs starts a new geometry set and carries
+    all of its properties. Returns {'geometry_sets': [...], 'frames': [...]} where each
+    geometry set is a list of (bbox, geometry).
+    """
+    key = tuple((period['filename'], os.path.getmtime(os.path.join(DIR, period['filename']))) for period in periods)
+    with _frame_bundles_lock:
+        cached = _frame_bundles.get(key)
+        if cached:
+            _frame_bundles.move_to_end(key)
+            return cached
+
+    geometry_sets, frames = [], []
+    previous_geometries = previous_properties = None
+    for period in periods:
+        with open(os.path.join(DIR, period['filename'])) as f:
+            features = [feature for feature in json.load(f).get('features', []) if feature.get('geometry')]
+        geometries = [feature['geometry'] for feature in features]
+        properties = [feature.get('properties') or {} for feature in features]
+        frame = {'date': period['date'], 'hour': period['hour'], 'time': period['time']}
+
+        if geometries == previous_geometries:
+            frame['geometry_set'] = len(geometry_sets) - 1
+            frame['changes'] = [
+                (index, changes)
+                for index, changes in enumerate(
+                    property_changes(old, new) for old, new in zip(previous_properties, properties)
+                )
+                if changes
+            ]
+        else:
+            geometry_sets.append([(geometry_bbox(geometry), geometry) for geometry in geometries])
+            frame['geometry_set'] = len(geometry_sets) - 1
+            frame['properties'] = properties
+        frames.append(frame)
+        previous_geometries, previous_properties = geometries, properties
+
+    bundle = {'geometry_sets': geometry_sets, 'frames': frames}
+    with _frame_bundles_lock:
+        _frame_bundles[key] = bundle
+        _frame_bundles.move_to_end(key)
+        while len(_frame_bundles) > FRAME_BUNDLE_CACHE_SIZE:
+            _frame_bundles.popitem(last=False)
+    return bundle
+
+def subset_frame_bundle(bundle, bbox=None):
+    """
+    Restricts a frame bundle to the features whose bounding box intersects 'bbox'
+    (which may cross the antimeridian) and converts it to its JSON form. Feature
+    indices are renumbered within each geometry set.
+    """
+    parts = split_bbox(bbox) if bbox is not None else None
+    selections = []
+    geometry_sets = []
+    for geometry_set in bundle['geometry_sets']:
+        selected = [index for index, (box, _) in enumerate(geometry_set)
+                    if parts is None or (box and any(bboxes_intersect(box, part) for part in parts))]
+        selections.append({old: new for new, old in enumerate(selected)})
+        geometry_sets.append([geometry_set[index][1] for index in selected])
+
+    frames = []
+    for frame in bundle['frames']:
+        selection = selections[frame['geometry_set']]
+        encoded = {key: frame[key] for key in ('date', 'hour', 'time', 'geometry_set')}
+        if 'properties' in frame:
+            encoded['properties'] = [frame['properties'][old] for old in selection]
+        else:
+            encoded['changes'] = [[selection[index], changes] for index, changes in frame['changes'] if index in selection]
+        frames.append(encoded)
+    return {'geometry_sets': geometry_sets, 'frames': frames}
+
+# ---------------------- Binary Weather Grids ---------------------- #
+
+# Grid file layout (little-endian): a 64-byte header followed by ny rows of nx values.
+# Row 0 is the southernmost row and column 0 the westernmost column, so the value of
+# cell (row, col) is at index row * nx + col. Cell bounds are
+# [min_lon + col * dx, min_lon + (col + 1) * dx] x [min_lat + row * dy, min_lat + (row + 1) * dy].
+# float32 grids use NaN for missing cells. uint16 grids store round((value - offset) / scale)
+# and use GRID_UINT16_NODATA for missing cells.
+GRID_MAGIC = b'WVG1'
+GRID_VERSION = 1
+GRID_HEADER = struct.Struct('<4sHHIIddddff')
+GRID_HEADER_SIZE = 64
+GRID_DTYPES = {0: np.dtype('<f4'), 1: np.dtype('<u2')}
+GRID_UINT16_NODATA = 65535
+
+def grid_value_property(layer, features):
+    """
+    Picks the feature property holding the grid values: the property named after
+    the layer if present, otherwise the first numeric property.
+    """
+    for feature in features:
+        properties = feature.get('properties') or {}
+        if layer in properties:
+            return layer
+        for key, value in properties.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                return key
+    return None
+
+def geojson_to_grid(data, value_property):
+    """
+    Converts a GeoJSON FeatureCollection of regular grid cells into a 2-D float32 array.
+    Returns (values, (min_lon, min_lat, dx, dy)). Raises ValueError if the cells do not
+    form a regular grid.
+    """
+    boxes, values = [], []
+    for feature in data.get('features', []):
+        box = geometry_bbox(feature.get('geometry'))
+        if not box:
+            continue
+        value = (feature.get('properties') or {}).get(value_property)
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            value = np.nan
+        boxes.append(box)
+        values.append(value)
+    if not boxes:
+        raise ValueError("Layer has no cells")
+
+    boxes = np.asarray(boxes, dtype=np.float64)
+    widths = boxes[:, 2] - boxes[:, 0]
+    heights = boxes[:, 3] - boxes[:, 1]
+    dx, dy = float(np.median(widths)), float(np.median(heights))
+    if dx <= 0 or dy <= 0:
+        raise ValueError("Cells have no area")
+    if np.any(np.abs(widths - dx) > dx * 0.01) or np.any(np.abs(heights - dy) > dy * 0.01):
+        raise ValueError("Cells are not all the same size")
+
+    min_lon, min_lat = float(boxes[:, 0].min()), float(boxes[:, 1].min())
+    cols = np.rint((boxes[:, 0] - min_lon) / dx).astype(np.int64)
+    rows = np.rint((boxes[:, 1] - min_lat) / dy).astype(np.int64)
+    nx, ny = int(cols.max()) + 1, int(rows.max()) + 1
+
+    grid = np.full((ny, nx), np.nan, dtype=np.float32)
+    grid[rows, cols] = np.asarray(values, dtype=np.float32)
+    return grid, (min_lon, min_lat, dx, dy)
+
+def write_grid(path, grid, geotransform, dtype='float32'):
+    """
+    Writes a grid to disk in the binary grid format, optionally quantized to uint16.
+    """
+    min_lon, min_lat, dx, dy = geotransform
+    ny, nx = grid.shape
+    scale, offset = 1.0, 0.0
+    if dtype == 'uint16':
+        dtype_code = 1
+        finite = grid[np.isfinite(grid)]
+        if finite.size:
+            offset = float(finite.min())
+            scale = float(finite.max() - offset) / (GRID_UINT16_NODATA - 1) or 1.0
+        quantized = np.rint((grid - offset) / scale)
+        packed = np.where(np.isfinite(grid), quantized, GRID_UINT16_NODATA).astype('<u2')
+    else:
+        dtype_code = 0
+        packed = grid.astype('<f4')
+
+    header = GRID_HEADER.pack(GRID_MAGIC, GRID_VERSION, dtype_code, nx, ny,
+                              min_lon, min_lat, dx, dy, scale, offset)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(header.ljust(GRID_HEADER_SIZE, b'\0'))
+        f.write(packed.tobytes())
+    os.replace(tmp_path, path)
+
+def read_grid_header(path):
+    """
+    Reads the header of a binary grid file into a dict.
+    """
+    with open(path, 'rb') as f:
+        raw = f.read(GRID_HEADER.size)
+    magic, version, dtype_code, nx, ny, min_lon, min_lat, dx, dy, scale, offset = GRID_HEADER.unpack(raw)
+    if magic != GRID_MAGIC or version != GRID_VERSION or dtype_code not in GRID_DTYPES:
+        raise ValueError(f"Not a supported grid file: {path}")
     return {
-        "id": str(obs["_id"]),
-        "species": obs.get("species", "N/A"),
-        "gender": obs.get("gender", "N/A"),
-        "quantity": obs.get("quantity", "N/A"),
-        "latitude": obs.get("latitude"),
-        "longitude": obs.get("longitude"),
-        "userId": obs.get("userId", "N/A"),
-        "timestamp": obs.get("timestamp").isoformat() + 'Z' if obs.get("timestamp") else "N/A"
+        'dtype': GRID_DTYPES[dtype_code], 'nx': nx, 'ny': ny,
+        'min_lon': min_lon, 'min_lat': min_lat, 'dx': dx, 'dy': dy,
+        'scale': scale, 'offset': offset
     }
 
-def serialize_spot(spot):
+def load_grid(path):
+    """
+    Memory-maps a binary grid file. Returns (header, values) where values is a
+    read-only (ny, nx) array of raw stored values.
+    """
+    header = read_grid_header(path)
+    values = np.memmap(path, dtype=header['dtype'], mode='r', offset=GRID_HEADER_SIZE,
+                       shape=(header['ny'], header['nx']))
+    return header, values
+
+def grid_file_path(layer, date, hour):
+    """
+    Returns the on-disk location of the binary grid for a weather layer period.
+    """
+    return os.path.join(GRID_DIR, f"{layer}_{date}_{hour}.grid")
+
+def ingest_grid(layer, date, hour, dtype='float32', force=False):
+    """
+    Converts one weather GeoJSON period into a binary grid, unless an up-to-date grid exists.
+    Returns the grid path, or None if the period is not available.
+    """
+    filename = find_time_period_file(layer, date, hour)
+    if not filename:
+        return None
+    source_path = os.path.join(DIR, filename)
+    path = grid_file_path(layer, date, hour)
+    if not force and os.path.isfile(path) and os.path.getmtime(path) >= os.path.getmtime(source_path):
+        return path
+
+    with open(source_path) as f:
+        data = json.load(f)
+    value_property = grid_value_property(layer, data.get('features', []))
+    if not value_property:
+        raise ValueError(f"No numeric property found in {filename}")
+    grid, geotransform = geojson_to_grid(data, value_property)
+    write_grid(path, grid, geotransform, dtype=dtype)
+    write_compressed_variants(path, force=True, fast=True)
+    logger.info(f"Ingested {filename} into a {grid.shape[1]}x{grid.shape[0]} {dtype} grid.")
+    return path
+
+# ---------------------- Weather Sampling ---------------------- #
+
+# grid path -> (mtime, header, float32 values with NaN for missing cells), least recently used first
+_grid_cache = OrderedDict()
+_grid_cache_lock = threading.Lock()
+
+def get_grid(layer, date, hour):
+    """
+    Returns (header, values) for a weather layer period, ingesting the grid if needed.
+    The values are decoded to float32 with NaN for missing cells. Returns None if the
+    period is not available.
+    """
+    path = ingest_grid(layer, date, hour)
+    if not path:
+        return None
+    return read_cached_grid(path)
+
+def read_cached_grid(path):
+    """
+    Returns (header, values) of a binary grid file with the values decoded to float32,
+    NaN for missing cells, reusing the decoded copy until the file changes.
+    """
+    mtime = os.path.getmtime(path)
+    with _grid_cache_lock:
+        cached = _grid_cache.get(path)
+        if cached and cached[0] == mtime:
+            _grid_cache.move_to_end(path)
+            return cached[1], cached[2]
+
+    header, raw = load_grid(path)
+    if header['dtype'] == GRID_DTYPES[1]:
+        values = np.where(raw == GRID_UINT16_NODATA, np.nan, raw * header['scale'] + header['offset']).astype(np.float32)
+    else:
+        values = np.array(raw, dtype=np.float32)
+    with _grid_cache_lock:
+        _grid_cache[path] = (mtime, header, values)
+        _grid_cache.move_to_end(path)
+        while len(_grid_cache) > GRID_CACHE_SIZE:
+            _grid_cache.popitem(last=False)
+    return header, values
+
+def sample_grid(header, values, lons, lats):
+    """
+    Looks up the cells containing each (lon, lat) point. Returns a float array with
+    NaN for points outside the grid or on missing cells.
+    """
+    cols = np.floor((lons - header['min_lon']) / header['dx']).astype(np.int64)
+    rows = np.floor((lats - header['min_lat']) / header['dy']).astype(np.int64)
+    inside = (cols >= 0) & (cols < header['nx']) & (rows >= 0) & (rows < header['ny'])
+    sampled = np.full(lons.shape, np.nan, dtype=np.float32)
+    sampled[inside] = values[rows[inside], cols[inside]]
+    return sampled
+
+def period_datetime(period):
+    """
+    Returns the (naive UTC) datetime of a catalog period.
+    """
+    return datetime.strptime(period['date'] + period['hour'], '%y%m%d%H')
+
+def layer_periods(layer, start=None, end=None):
+    """
+    Returns the catalog periods of a weather layer between start and end (inclusive).
+    """
+    refresh_time_period_catalog()
+    entry = _time_period_catalog['layers'].get(layer)
+    return [
+        period for period in (entry['periods'] if entry else [])
+        if (start is None or period_datetime(period) >= start) and (end is None or period_datetime(period) <= end)
+    ]
+
+def grid_values_to_json(values):
+    """
+    Converts sampled values to a list of floats, with None for missing values.
+    """
+    return [None if math.isnan(value) else round(value, 4) for value in values.tolist()]
+
+def parse_sample_points(raw):
+    """
+    Parses sample points given as [[lat, lon], ...], [{'latitude', 'longitude'}, ...]
+    or a 'lat,lon;lat,lon' string. Returns (lats, lons) arrays.
+    Raises ValueError with a user-facing message on invalid input.
+    """
+    if isinstance(raw, str):
+        raw = [pair.split(',') for pair in raw.split(';') if pair.strip()]
+    if not isinstance(raw, list) or not raw:
+        raise ValueError("At least one point is required")
+    if len(raw) > WEATHER_SAMPLE_MAX_POINTS:
+        raise ValueError(f"At most {WEATHER_SAMPLE_MAX_POINTS} points are allowed")
+    try:
+        points = [
+            (float(point['latitude']), float(point['longitude'])) if isinstance(point, dict)
+            else (float(point[0]), float(point[1]))
+            for point in raw
+        ]
+    except (KeyError, IndexError, TypeError, ValueError):
+        raise ValueError("Points must be latitude, longitude pairs")
+    lats = np.array([lat for lat, _ in points], dtype=np.float64)
+    lons = np.array([lon for _, lon in points], dtype=np.float64)
+    if np.any(np.abs(lats) > 90) or np.any(np.abs(lons) > 180):
+        raise ValueError("Coordinates out of range")
+    return lats, lons
+
+def parse_weather_layers(raw):
+    """
+    Parses the requested weather layers (a list or comma-separated string).
+    Raises ValueError if a layer is unknown.
+    """
+    layers = raw.split(',') if isinstance(raw, str) else raw
+    if not isinstance(layers, list) or not layers:
+        raise ValueError("At least one layer is required")
+    layers = [str(layer).strip() for layer in layers]
+    unknown = [layer for layer in layers if layer not in GRID_LAYERS]
+    if unknown:
+        raise ValueError(f"Unknown layers: {', '.join(unknown)}")
+    return layers
+
+def sample_weather(layers, lats, lons, start=None, end=None):
+    """
+    Samples every available period of each layer between start and end at the given points.
+    Returns {layer: [{'time', 'values'}]}. Raises ValueError if too many periods match.
+    """
+    result = {}
+    for layer in layers:
+        periods = layer_periods(layer, start, end)
+        if len(periods) > WEATHER_SAMPLE_MAX_PERIODS:
+            raise ValueError(f"At most {WEATHER_SAMPLE_MAX_PERIODS} periods can be sampled per layer; narrow the time range")
+        samples = []
+        for period in periods:
+            grid = get_grid(layer, period['date'], period['hour'])
+            if grid is None:
+                continue
+            samples.append({'time': period['time'], 'values': grid_values_to_json(sample_grid(*grid, lons, lats))})
+        result[layer] = samples
+    return result
+
+def weather_at_observations(observations, layers):
+    """
+    Samples each layer at the location of each observation, using the layer period closest
+    to the observation's timestamp (within WEATHER_MATCH_WINDOW). Observations are grouped
+    by period so each grid is sampled once. Returns {observation id: {layer: {'time', 'value'}}}.
+    """
+    weather = {str(obs['_id']): {} for obs in observations}
+    for layer in layers:
+        periods = layer_periods(layer)
+        if not periods:
+            continue
+        times = [period_datetime(period) for period in periods]
+        by_period = {}
+        for obs in observations:
+            timestamp = obs.get('timestamp')
+            if not timestamp or obs.get('latitude') is None or obs.get('longitude') is None:
+                continue
+            position = bisect.bisect_left(times, timestamp)
+            candidates = [i for i in (position - 1, position) if 0 <= i < len(times)]
+            nearest = min(candidates, key=lambda i: abs(times[i] - timestamp))
+            if abs(times[nearest] - timestamp) <= WEATHER_MATCH_WINDOW:
+                by_period.setdefault(nearest, []).append(obs)
+
+        for index, group in by_period.items():
+            period = periods[index]
+            grid = get_grid(layer, period['date'], period['hour'])
+            if grid is None:
+                continue
+            lons = np.array([float(obs['longitude']) for obs in group])
+            lats = np.array([float(obs['latitude']) for obs in group])
+            for obs, value in zip(group, grid_values_to_json(sample_grid(*grid, lons, lats))):
+                weather[str(obs['_id'])][layer] = {'time': period['time'], 'value': value}
+    return weather
+
+# ---------------------- Red Deer Habitat ---------------------- #
+
+def iter_polygon_rings(geometry):
+    """
+    Yields the rings of each polygon in a Polygon or MultiPolygon geometry, one list per polygon.
+    """
+    if not geometry:
+        return
+    if geometry['type'] == 'Polygon':
+        yield geometry['coordinates']
+    elif geometry['type'] == 'MultiPolygon':
+        yield from geometry['coordinates']
+
+def rasterize_features(features, value_of, header):
+    """
+    Burns polygon features onto a grid: each cell whose center lies inside a feature
+    gets value_of(feature), the highest one where features overlap. Cells are tested
+    against every ring edge at once with NumPy (even-odd rule, so holes are respected).
+    """
+    grid = np.zeros((header['ny'], header['nx']), dtype=np.float32)
+    for feature in features:
+        value = value_of(feature)
+        if not value:
+            continue
+        for rings in iter_polygon_rings(feature.get('geometry')):
+            box = geometry_bbox({'type': 'Polygon', 'coordinates': rings})
+            if not box:
+                continue
+            col0 = max(0, math.floor((box[0] - header['min_lon']) / header['dx'] - 0.5))
+            col1 = min(header['nx'], math.ceil((box[2] - header['min_lon']) / header['dx'] + 0.5))
+            row0 = max(0, math.floor((box[1] - header['min_lat']) / header['dy'] - 0.5))
+            row1 = min(header['ny'], math.ceil((box[3] - header['min_lat']) / header['dy'] + 0.5))
+            if col0 >= col1 or row0 >= row1:
+                continue
+            lons = header['min_lon'] + (np.arange(col0, col1) + 0.5) * header['dx']
+            lats = header['min_lat'] + (np.arange(row0, row1) + 0.5) * header['dy']
+            xs, ys = np.meshgrid(lons, lats)
+            inside = np.zeros(xs.shape, dtype=bool)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                for ring in rings:
+                    ring = np.asarray(ring, dtype=np.float64)[:, :2]
+                    for (x1, y1), (x2, y2) in zip(ring[:-1], ring[1:]):
+                        if y1 == y2:
+                            continue
+                        inside ^= ((y1 > ys) != (y2 > ys)) & (xs < x1 + (ys - y1) * (x2 - x1) / (y2 - y1))
+            window = grid[row0:row1, col0:col1]
+            np.maximum(window, np.where(inside, value, 0), out=window)
+    return grid
+
+def habitat_grid_header(features):
+    """
+    Returns the header of the shared habitat grid, which covers the red deer layer.
+    """
+    boxes = [box for box in (geometry_bbox(feature.get('geometry')) for feature in features) if box]
+    if not boxes:
+        raise ValueError("The red deer layer has no features")
+    min_lon, min_lat = min(box[0] for box in boxes), min(box[1] for box in boxes)
+    max_lon, max_lat = max(box[2] for box in boxes), max(box[3] for box in boxes)
     return {
-        "id": str(spot["_id"]),
-        "name": spot.get("name", "N/A"),
-        "coordinates": spot.get("coordinates", []),
-        "userId": spot.get("userId", "N/A"),
-        "timestamp": spot.get("timestamp").isoformat() + 'Z' if spot.get("timestamp") else "N/A"
+        'min_lon': min_lon, 'min_lat': min_lat, 'dx': HABITAT_CELL_SIZE, 'dy': HABITAT_CELL_SIZE,
+        'nx': max(1, math.ceil((max_lon - min_lon) / HABITAT_CELL_SIZE)),
+        'ny': max(1, math.ceil((max_lat - min_lat) / HABITAT_CELL_SIZE))
     }
 
+def weather_factor(temperature, rain):
+    """
+    Scores how favourable the weather is (0-1) from temperature and rain grids.
+    Cells without weather data are not penalized.
+    """
+    low, high = HABITAT_COMFORT_TEMPERATURE
+    distance = np.maximum(low - temperature, temperature - high).clip(min=0)
+    temperature_factor = np.nan_to_num(1 - distance / HABITAT_TEMPERATURE_FALLOFF, nan=1.0).clip(0, 1)
+    rain_factor = np.nan_to_num(1 - rain / HABITAT_RAIN_CUTOFF, nan=1.0).clip(HABITAT_MIN_RAIN_FACTOR, 1)
+    return temperature_factor * rain_factor
+
+def habitat_score_path(date, hour):
+    """
+    Returns the on-disk location of the habitat score grid of a period.
+    """
+    return os.path.join(HABITAT_DIR, f"score_{date}_{hour}.grid")
+
+def build_habitat_static():
+    """
+    Rasterizes the red deer abundance and native vegetation layers onto the habitat grid
+    and combines them into the weather-independent part of the score.
+    Returns (header, static score array).
+    """
+    with open(ANIMAL_LOCATION_FILE) as f:
+        deer = json.load(f).get('features', [])
+    header = habitat_grid_header(deer)
+    abundance = rasterize_features(
+        deer,
+        lambda feature: HABITAT_ABUNDANCE_SCORES.get(str((feature.get('properties') or {}).get('Abundance', '')).upper()[:1], 0),
+        header
+    )
+    if os.path.isfile(VEGETATION_FILE):
+        with open(VEGETATION_FILE) as f:
+            vegetation = rasterize_features(json.load(f).get('features', []), lambda feature: 1.0, header)
+    else:
+        logger.warning(f"Vegetation layer not found, scoring without it: {VEGETATION_FILE}")
+        vegetation = np.zeros_like(abundance)
+    static = abundance * (1 - HABITAT_VEGETATION_WEIGHT + HABITAT_VEGETATION_WEIGHT * vegetation)
+    return header, static
+
+def build_habitat_period(header, static, date, hour):
+    """
+    Combines the static score with the weather of one period and writes the score grid.
+    """
+    lons = header['min_lon'] + (np.arange(header['nx']) + 0.5) * header['dx']
+    lats = header['min_lat'] + (np.arange(header['ny']) + 0.5) * header['dy']
+    xs, ys = np.meshgrid(lons, lats)
+    weather = {}
+    for layer in ['temperature', 'rain']:
+        grid = get_grid(layer, date, hour)
+        weather[layer] = sample_grid(*grid, xs.ravel(), ys.ravel()).reshape(xs.shape) if grid else np.full(xs.shape, np.nan)
+    score = static * weather_factor(weather['temperature'], weather['rain'])
+    path = habitat_score_path(date, hour)
+    write_grid(path, score.astype(np.float32), (header['min_lon'], header['min_lat'], header['dx'], header['dy']), dtype='uint16')
+    write_compressed_variants(path, force=True, fast=True)
+    return path
+
+def list_habitat_periods():
+    """
+    Returns the (date, hour) of every habitat score grid that has been built, oldest first.
+    """
+    try:
+        names = os.listdir(HABITAT_DIR)
+    except OSError:
+        return []
+    return sorted((match['date'], match['hour']) for match in map(habitat_file_pattern.match, names) if match)
+
+def resolve_habitat_period(args):
+    """
+    Returns the (date, hour) requested with 'date' and 'hour', or the built period closest
+    to now. Raises ValueError if the parameters are malformed and LookupError if no
+    matching score grid exists.
+    """
+    date, hour = args.get('date'), args.get('hour')
+    if date or hour:
+        if not re.fullmatch(r'\d{6}', date or '') or not re.fullmatch(r'\d{2}', hour or ''):
+            raise ValueError("date must be YYMMDD and hour HH")
+        if not os.path.isfile(habitat_score_path(date, hour)):
+            raise LookupError("No habitat score for that period")
+        return date, hour
+    periods = list_habitat_periods()
+    if not periods:
+        raise LookupError("No habitat scores have been built")
+    now = datetime.utcnow()
+    return min(periods, key=lambda period: abs(datetime.strptime(''.join(period), '%y%m%d%H') - now))
+
+def best_habitat_cells(header, values, limit, bbox=None):
+    """
+    Returns the highest scoring cells, optionally within a bbox (which may cross the
+    antimeridian), best first.
+    """
+    windows = []
+    for part in split_bbox(bbox) if bbox else [None]:
+        row0, row1, col0, col1 = 0, header['ny'], 0, header['nx']
+        if part:
+            col0 = max(col0, math.floor((part[0] - header['min_lon']) / header['dx']))
+            col1 = min(col1, math.ceil((part[2] - header['min_lon']) / header['dx']))
+            row0 = max(row0, math.floor((part[1] - header['min_lat']) / header['dy']))
+            row1 = min(row1, math.ceil((part[3] - header['min_lat']) / header['dy']))
+        if col0 < col1 and row0 < row1:
+            windows.append((row0, row1, col0, col1))
+
+    candidates = []
+    for row0, row1, col0, col1 in windows:
+        window = np.nan_to_num(values[row0:row1, col0:col1], nan=0.0).ravel()
+        count = min(limit, int(np.count_nonzero(window > 0)))
+        if count == 0:
+            continue
+        width = col1 - col0
+        for index in np.argpartition(window, -count)[-count:].tolist():
+            candidates.append((float(window[index]), row0 + index // width, col0 + index % width))
+    candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+
+    cells = []
+    for score, row, col in candidates[:limit]:
+        min_lon = header['min_lon'] + col * header['dx']
+        min_lat = header['min_lat'] + row * header['dy']
+        cells.append({
+            'latitude': round(min_lat + header['dy'] / 2, 6),
+            'longitude': round(min_lon + header['dx'] / 2, 6),
+            'score': round(score, 4),
+            'bbox': [min_lon, min_lat, min_lon + header['dx'], min_lat + header['dy']]
+        })
+    return cells
+
+def habitat_tile_bytes(path, z, x, y):
+    """
+    Crops a habitat score grid to an XYZ tile, keeping the stored (quantized) values.
+    Returns the tile in the binary grid format, or None if the tile misses the grid.
+    """
+    header, raw = load_grid(path)
+    min_lon, min_lat, max_lon, max_lat = tile_bounds(z, x, y)
+    col0 = max(0, math.floor((min_lon - header['min_lon']) / header['dx']))
+    col1 = min(header['nx'], math.ceil((max_lon - header['min_lon']) / header['dx']))
+    row0 = max(0, math.floor((min_lat - header['min_lat']) / header['dy']))
+    row1 = min(header['ny'], math.ceil((max_lat - header['min_lat']) / header['dy']))
+    if col0 >= col1 or row0 >= row1:
+        return None
+    dtype_code = next(code for code, dtype in GRID_DTYPES.items() if dtype == header['dtype'])
+    tile_header = GRID_HEADER.pack(
+        GRID_MAGIC, GRID_VERSION, dtype_code, col1 - col0, row1 - row0,
+        header['min_lon'] + col0 * header['dx'], header['min_lat'] + row0 * header['dy'],
+        header['dx'], header['dy'], header['scale'], header['offset']
+    )
+    return tile_header.ljust(GRID_HEADER_SIZE, b'\0') + np.ascontiguousarray(raw[row0:row1, col0:col1]).tobytes()
+
+# ---------------------- Live Observation Feed ---------------------- #
+
+# Connected feed clients keyed by subscriber ID. 'source' is 'change_stream' while a
+# MongoDB change stream delivers every write (including other workers'), otherwise
+# the request handlers of this process publish their own writes.
+_live_subscribers = {}
+_live_subscribers_lock = threading.Lock()
+_live_feed = {'source': None, 'thread': None}
+
+def subscribe_to_observations(bbox=None, species=None):
+    """
+    Registers a feed client with optional bbox and species filters.
+    Returns the subscriber, or None if the subscriber limit is reached.
+    """
+    with _live_subscribers_lock:
+        if len(_live_subscribers) >= SSE_MAX_SUBSCRIBERS:
+            return None
+        subscriber = {
+            'id': uuid.uuid4().hex,
+            'queue': queue.Queue(maxsize=SSE_QUEUE_SIZE),
+            'bbox': bbox,
+            'species': species,
+            'overflow': False
+        }
+        _live_subscribers[subscriber['id']] = subscriber
+    start_change_stream_listener()
+    return subscriber
+
+def unsubscribe_from_observations(subscriber):
+    """
+    Removes a feed client.
+    """
+    with _live_subscribers_lock:
+        _live_subscribers.pop(subscriber['id'], None)
+
+def has_observation_subscribers():
+    """
+    Returns True if local handlers need to publish their writes to the feed.
+    """
+    return bool(_live_subscribers) and _live_feed['source'] != 'change_stream'
+
+def subscriber_matches(subscriber, observation):
+    """
+    Checks an observation against a subscriber's filters. Observations without
+    coordinates or species (e.g. deletions seen by a change stream) always match.
+    """
+    species = observation.get('species')
+    if subscriber['species'] and species is not None and species not in subscriber['species']:
+        return False
+    latitude, longitude = observation.get('latitude'), observation.get('longitude')
+    if subscriber['bbox'] and isinstance(latitude, (int, float)) and isinstance(longitude, (int, float)):
+        min_lon, min_lat, max_lon, max_lat = subscriber['bbox']
+        if not (min_lat <= latitude <= max_lat):
+            return False
+        if min_lon <= max_lon:
+            return min_lon <= longitude <= max_lon
+        return longitude >= min_lon or longitude <= max_lon
+    return True
+
+def publish_observation_event(event_type, observation, from_change_stream=False):
+    """
+    Queues a 'created', 'updated' or 'deleted' event for every matching feed client.
+    Writes are published by the request handlers unless a change stream is running,
+    in which case only the change stream publishes. A client that falls too far
+    behind is flagged and disconnected.
+    """
+    if not _live_subscribers:
+        return
+    if (_live_feed['source'] == 'change_stream') != from_change_stream:
+        return
+    with _live_subscribers_lock:
+        subscribers = list(_live_subscribers.values())
+    event = {'type': event_type, 'observation': observation}
+    for subscriber in subscribers:
+        if not subscriber_matches(subscriber, observation):
+            continue
+        try:
+            subscriber['queue'].put_nowait(event)
+        except queue.Full:
+            subscriber['overflow'] = True
+
+def watch_observation_changes():
+    """
+    Publishes observation writes from a MongoDB change stream. Change streams need a
+    replica set; on a standalone server the feed stays in-process.
+    """
+    try:
+        with observations_collection.watch(full_document='updateLookup') as stream:
+            _live_feed['source'] = 'change_stream'
+            logger.info("Live observation feed is using a MongoDB change stream.")
+            for change in stream:
+                operation = change['operationType']
+                if operation == 'insert':
+                    publish_observation_event('created', serialize_observation(change['fullDocument']), True)
+                elif operation in ('update', 'replace') and change.get('fullDocument'):
+                    publish_observation_event('updated', serialize_observation(change['fullDocument']), True)
+                elif operation == 'delete':
+                    publish_observation_event('deleted', {'id': str(change['documentKey']['_id'])}, True)
+    except OperationFailure as e:
+        logger.info(f"Change streams unavailable ({e}), live feed is in-process only.")
+        _live_feed['source'] = 'local'
+        return
+    except Exception:
+        logger.exception("Observation change stream stopped.")
+    # Let the next subscriber try to start the change stream again
+    _live_feed['source'] = None
+    _live_feed['thread'] = None
+
+def start_change_stream_listener():
+    """
+    Starts the change stream thread once, on the first feed subscription.
+    """
+    with _live_subscribers_lock:
+        if _live_feed['thread'] is not None or _live_feed['source'] == 'local':
+            return
+        _live_feed['thread'] = threading.Thread(target=watch_observation_changes, name='observation-changes', daemon=True)
+        _live_feed['thread'].start()
+
+def format_sse(event_type, data):
+    """
+    Formats one Server-Sent Events message.
+    """
+    return f"event: {event_type}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+# ---------------------- App Initialization ---------------------- #
+
+_initialization = {'done': False}
+_initialization_lock = threading.Lock()
+
+def warm_up():
+    """
+    Creates the indexes and fills the caches that the first requests would otherwise build.
+    """
+    ensure_indexes()
+    refresh_time_period_catalog(force=True)
+    for layer in WARMUP_LAYERS:
+        file_path = layer_file_path(layer)
+        if file_path is None:
+            logger.warning(f"Warm-up layer not found: {layer}")
+            continue
+        load_layer(file_path)
+    logger.info(f"Warm-up complete: {len(_time_period_catalog['layers'])} time-stamped layers, {len(WARMUP_LAYERS)} parsed layers.")
+
+def initialize_app():
+    """
+    Runs warm_up once. Under a preloading server this happens in the master process,
+    so forked workers start with warm caches and create their own MongoClient.
+    """
+    if _initialization['done']:
+        return
+    with _initialization_lock:
+        if not _initialization['done']:
+            warm_up()
+            _initialization['done'] = True
+
+def create_app():
+    """
+    Application factory for WSGI servers, e.g. gunicorn 'app:create_app()' (see gunicorn.conf.py).
+    Checks the configuration and warms the app up; routes are registered on the
+    module-level app at import.
+    """
+    check_mongo_config()
+    initialize_app()
+    return app
+
+@app.before_request
+def ensure_app_initialized():
+    """
+    Initializes the app on the first request when it was not created through create_app().
+    """
+    initialize_app()
+
 # ---------------------- Route Definitions ---------------------- #
 
+# Prometheus metrics
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Exposes request, MongoDB and serialization metrics in Prometheus text format.
+    Metrics are kept per worker process; they cover all workers only when METRICS_DIR
+    is set, and then lag by up to METRICS_FLUSH_SECONDS for the other workers.
+    """
+    if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        return jsonify({'status': 'error', 'message': 'Unauthorized'}), 401
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/')
 def home():
     """
@@ -202,22 +3300,22 @@ def login():
 
     return jsonify({'status': 'success', 'access_token': access_token}), 200
 
-# Get All Observations
+# Get Observations
 @app.route('/api/get_observations', methods=['GET'])
 @jwt_required()
 def get_observations():
     """
-    Retrieves all observations from the database.
+    Retrieves one page of observations, newest first.
+    Accepts the filters understood by build_observation_query, a 'limit' page size
+    (capped at MAX_PAGE_SIZE) and the 'cursor' returned by the previous page.
     """
     current_user_id = get_jwt_identity()
     try:
-        observations = list(observations_collection.find())
-        serialized_observations = [serialize_observation(obs) for obs in observations]
-        logger.info(f"User {current_user_id} retrieved {len(serialized_observations)} observations.")
-        return jsonify({'status': 'success', 'observations': serialized_observations}), 200
-    except Exception as e:
-        logger.exception("Exception occurred while fetching observations.")
-        return jsonify({'status': 'error', 'message': 'Failed to fetch observations'}), 500
+        query = build_observation_query(request.args)
+    except ValueError as e:
+        logger.error(f"Invalid get_observations parameters: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    return observation_page_response(query, current_user_id)
 
 # Add Observation
 @app.route('/api/add_observation', methods=['POST'])
@@ -225,74 +3323,98 @@ def get_observations():
 def add_observation():
     """
     Adds a new observation to the database.
+    An optional 'idempotency_key' makes retries return the observation created the first time.
     """
     current_user_id = get_jwt_identity()
-    data = request.get_json()
-    required_fields = ['species', 'gender', 'quantity', 'latitude', 'longitude']
-    
-    # Validate required fields
-    if not data:
-        logger.error("No data provided in add_observation request.")
-        return jsonify({'status': 'error', 'message': 'No data provided'}), 400
-    
-    missing_fields = [field for field in required_fields if field not in data]
-    if missing_fields:
-        logger.error(f"Missing fields: {', '.join(missing_fields)}")
-        return jsonify({'status': 'error', 'message': f"Missing fields: {', '.join(missing_fields)}"}), 400
-    
-    # Extract and validate data
     try:
-        species = str(data['species']).strip()
-        gender = str(data['gender']).strip()
-        quantity = int(data['quantity'])
-        latitude = float(data['latitude'])
-        longitude = float(data['longitude'])
-        
-        # Further validation
-        if gender not in ['Male', 'Female', 'Unknown']:
-            logger.error("Invalid gender value provided.")
-            return jsonify({'status': 'error', 'message': 'Invalid gender value'}), 400
-        if quantity < 1:
-            logger.error("Quantity less than 1 provided.")
-            return jsonify({'status': 'error', 'message': 'Quantity must be at least 1'}), 400
-    except (ValueError, TypeError) as e:
-        logger.error(f"Invalid data types provided: {e}")
-        return jsonify({'status': 'error', 'message': 'Invalid data types provided'}), 400
-    
-    # Create observation document
-    observation = {
-        'species': species,
-        'gender': gender,
-        'quantity': quantity,
-        'latitude': latitude,
-        'longitude': longitude,
-        'userId': current_user_id,
-        'timestamp': datetime.utcnow()
-    }
+        observation = validate_observation(request.get_json(), current_user_id)
+    except ValueError as e:
+        logger.error(f"Invalid add_observation request: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 400
     
     try:
+        observation['changeSeq'] = next_change_seq()
+        observation['changedAt'] = datetime.utcnow()
         result = observations_collection.insert_one(observation)
+        mark_observations_committed()
+        update_rollups(added=[observation])
         logger.info(f"User {current_user_id} added observation with ID: {result.inserted_id}")
-        # Fetch the inserted document
-        inserted_observation = observations_collection.find_one({"_id": result.inserted_id})
-        serialized_observation = serialize_observation(inserted_observation)
+        # insert_one sets _id on the document, so it can be serialized without reading it back
+        serialized_observation = serialize_observation(observation)
+        publish_observation_event('created', serialized_observation)
         return jsonify({'status': 'success', 'message': 'Observation added successfully', 'observation': serialized_observation}), 201
+    except DuplicateKeyError:
+        existing = observations_collection.find_one({
+            'userId': current_user_id,
+            'idempotencyKey': observation['idempotencyKey']
+        })
+        logger.info(f"User {current_user_id} retried observation {existing['_id']}.")
+        return jsonify({'status': 'success', 'message': 'Observation already added', 'observation': serialize_observation(existing)}), 200
     except Exception as e:
         logger.exception(f"Failed to add observation: {e}")
         return jsonify({'status': 'error', 'message': 'Failed to add observation'}), 500
 
+# Bulk Add Observations
+@app.route('/api/bulk_add_observations', methods=['POST'])
+@jwt_required()
+def bulk_add_observations():
+    """
+    Adds many observations at once, from a JSON array (or {"observations": [...]})
+    or a streamed NDJSON body (Content-Type: application/x-ndjson).
+    Each record is validated like add_observation and may carry an 'idempotency_key'
+    so that re-uploading it does not create a duplicate. Returns one result per record.
+    """
+    current_user_id = get_jwt_identity()
+    try:
+        records = iter_bulk_records()
+        results = []
+        batch = []
+        truncated = False
+        for index, record in enumerate(records):
+            if index >= BULK_MAX_RECORDS:
+                truncated = True
+                break
+            if record is None:
+                results.append({'index': index, 'status': 'error', 'message': 'Invalid JSON record'})
+                continue
+            try:
+                batch.append((index, validate_observation(record, current_user_id)))
+            except ValueError as e:
+                results.append({'index': index, 'status': 'error', 'message': str(e)})
+                continue
+            if len(batch) >= BULK_BATCH_SIZE:
+                results.extend(insert_observation_batch(batch, current_user_id))
+                batch = []
+        if batch:
+            results.extend(insert_observation_batch(batch, current_user_id))
+    except ValueError as e:
+        logger.error(f"Invalid bulk_add_observations request: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        logger.exception(f"Failed to bulk add observations: {e}")
+        return jsonify({'status': 'error', 'message': 'Failed to add observations'}), 500
+
+    results.sort(key=lambda result: result['index'])
+    summary = {status: sum(1 for r in results if r['status'] == status) for status in ('created', 'duplicate', 'error')}
+    logger.info(f"User {current_user_id} bulk added observations: {summary}")
+    response = {'status': 'success', 'summary': summary, 'results': results}
+    if truncated:
+        response['message'] = f"Only the first {BULK_MAX_RECORDS} records were processed."
+    return jsonify(response), 200
+
 # Edit Observation
 @app.route('/api/edit_observation', methods=['PUT'])
 @jwt_required()
 def edit_observation():
+    """
+    Edits one of the authenticated user's observations with a single atomic,
+    ownership-checked update.
+    """
     user_id = get_jwt_identity()
-    data = request.get_json()
+    data = request.get_json() or {}
     obs_id = data.get('observation_id')
-    species = data.get('species')
-    gender = data.get('gender')
-    quantity = data.get('quantity')
     
-    if not all([obs_id, species, gender, quantity]):
+    if not obs_id:
         logger.error("Missing data in edit_observation request.")
         return jsonify({"status": "error", "message": "Missing data."}), 400
     
@@ -301,46 +3423,107 @@ def edit_observation():
     except InvalidId:
         logger.error(f"Invalid observation_id provided: {obs_id}")
         return jsonify({"status": "error", "message": "Invalid observation ID."}), 400
-    
-    observation = observations_collection.find_one({"_id": object_id})
-    if not observation:
-        logger.error(f"Observation not found: {obs_id}")
-        return jsonify({"status": "error", "message": "Observation not found."}), 404
-    
-    if not observation.get('userId'):
-        logger.error(f"Observation {obs_id} has no 'userId' field.")
-        return jsonify({"status": "error", "message": "Observation data corrupted."}), 500
-    
-    if observation.get('userId') != user_id:
-        logger.warning(f"Unauthorized edit attempt by user {user_id} on observation {obs_id}.")
-        return jsonify({"status": "error", "message": "Unauthorized."}), 403
+
+    try:
+        update_fields = validate_observation_update(data)
+    except ValueError as e:
+        logger.error(f"Invalid edit_observation request for {obs_id}: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 400
     
     try:
-        updated = observations_collection.update_one(
-            {"_id": object_id},
-            {"$set": {
-                "species": species,
-                "gender": gender,
-                "quantity": quantity
-            }}
+        # The previous version is returned so a no-op edit can still be reported
+        previous = observations_collection.find_one_and_update(
+            {"_id": object_id, "userId": user_id, "deleteClaim": {"$exists": False}},
+            {"$set": {**update_fields, "changeSeq": next_change_seq(), "changedAt": datetime.utcnow()}},
+            return_document=ReturnDocument.BEFORE
         )
-        
-        if updated.modified_count > 0:
-            logger.info(f"Observation {obs_id} updated successfully by user {user_id}.")
-            return jsonify({"status": "success", "message": "Observation updated successfully."}), 200
-        else:
+        if previous is None:
+            return ownership_error(observations_collection, object_id, user_id, "Observation", "edit")
+        mark_observations_committed()
+
+        if all(previous.get(field) == value for field, value in update_fields.items()):
             logger.info(f"No changes made to observation {obs_id} by user {user_id}.")
             return jsonify({"status": "error", "message": "No changes made."}), 400
+
+        update_rollups(added=[{**previous, **update_fields}], removed=[previous])
+        logger.info(f"Observation {obs_id} updated successfully by user {user_id}.")
+        serialized_observation = serialize_observation({**previous, **update_fields})
+        publish_observation_event('updated', serialized_observation)
+        return jsonify({
+            "status": "success",
+            "message": "Observation updated successfully.",
+            "observation": serialized_observation
+        }), 200
     except Exception as e:
         logger.exception(f"Failed to update observation {obs_id}: {e}")
         return jsonify({"status": "error", "message": "Failed to update observation."}), 500
 
+# Edit Several Observations
+@app.route('/api/edit_observations', methods=['PUT'])
+@jwt_required()
+def edit_observations():
+    """
+    Applies the same species, gender, quantity and/or location change to every
+    observation in 'observation_ids' owned by the authenticated user.
+    """
+    user_id = get_jwt_identity()
+    data = request.get_json() or {}
+    try:
+        object_ids = parse_object_ids(data.get('observation_ids'))
+        update_fields = validate_observation_update(data, require_all=False)
+    except ValueError as e:
+        logger.error(f"Invalid edit_observations request: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    try:
+        # A constant number of round trips: one update stamps every changed document with
+        # its previous rollup fields under this request's claim, so the rollups stay exact
+        # under concurrent edits. Documents claimed by a batch delete are left alone; a
+        # delete landing between the update and the read below is only corrected by
+        # `flask rebuild-rollups`.
+        change = {**update_fields, "changeSeq": next_change_seq(), "changedAt": datetime.utcnow()}
+        token = str(ObjectId())
+        claim = f"rollupClaims.{token}"
+        observations_collection.update_many(
+            {"_id": {"$in": object_ids}, "userId": user_id, "deleteClaim": {"$exists": False}},
+            [{"$set": {
+                claim: {field: f"${field}" for field in ROLLUP_FIELDS},
+                **{field: {"$literal": value} for field, value in change.items()}
+            }}]
+        )
+        updated = list(observations_collection.find({claim: {"$exists": True}}, OBSERVATION_FIELDS + [claim]))
+        previous = [obs['rollupClaims'][token] for obs in updated]
+        if updated:
+            observations_collection.update_many({claim: {"$exists": True}}, {"$unset": {claim: ""}})
+            mark_observations_committed()
+            update_rollups(added=[{**obs, **update_fields} for obs in previous], removed=previous)
+        not_found, unauthorized = [], []
+        if len(previous) < len(object_ids):
+            not_found, unauthorized = classify_unmatched_ids(observations_collection, object_ids, user_id)
+        if updated and has_observation_subscribers():
+            for obs in updated:
+                publish_observation_event('updated', serialize_observation(obs))
+        logger.info(f"User {user_id} updated {len(previous)} of {len(object_ids)} observations.")
+        return jsonify({
+            "status": "success",
+            "updated": len(previous),
+            "not_found": not_found,
+            "unauthorized": unauthorized
+        }), 200
+    except Exception as e:
+        logger.exception(f"Failed to update observations: {e}")
+        return jsonify({"status": "error", "message": "Failed to update observations."}), 500
+
 # Delete Observation
 @app.route('/api/delete_observation', methods=['DELETE'])
 @jwt_required()
 def delete_observation():
+    """
+    Deletes one of the authenticated user's observations with a single atomic,
+    ownership-checked delete.
+    """
     user_id = get_jwt_identity()
-    data = request.get_json()
+    data = request.get_json() or {}
     obs_id = data.get('observation_id')
     
     if not obs_id:
@@ -353,38 +3536,342 @@ def delete_observation():
         logger.error(f"Invalid observation_id provided: {obs_id}")
         return jsonify({"status": "error", "message": "Invalid observation ID."}), 400
     
-    observation = observations_collection.find_one({"_id": object_id})
-    if not observation:
-        logger.error(f"Observation not found: {obs_id}")
-        return jsonify({"status": "error", "message": "Observation not found."}), 404
-    
-    if not observation.get('userId'):
-        logger.error(f"Observation {obs_id} has no 'userId' field.")
-        return jsonify({"status": "error", "message": "Observation data corrupted."}), 500
-    
-    if observation.get('userId') != user_id:
-        logger.warning(f"Unauthorized delete attempt by user {user_id} on observation {obs_id}.")
-        return jsonify({"status": "error", "message": "Unauthorized."}), 403
-    
     try:
-        deleted = observations_collection.delete_one({"_id": object_id})
-        
-        if deleted.deleted_count > 0:
-            logger.info(f"Observation {obs_id} deleted successfully by user {user_id}.")
-            return jsonify({"status": "success", "message": "Observation deleted successfully."}), 200
-        else:
-            logger.error(f"Failed to delete observation {obs_id} by user {user_id}.")
-            return jsonify({"status": "error", "message": "Failed to delete observation."}), 500
+        deleted = observations_collection.find_one_and_delete({"_id": object_id, "userId": user_id, "deleteClaim": {"$exists": False}})
+        if deleted is None:
+            return ownership_error(observations_collection, object_id, user_id, "Observation", "delete")
+
+        record_tombstones([object_id], user_id)
+        mark_observations_committed()
+        update_rollups(removed=[deleted])
+        logger.info(f"Observation {obs_id} deleted successfully by user {user_id}.")
+        serialized_observation = serialize_observation(deleted)
+        publish_observation_event('deleted', serialized_observation)
+        return jsonify({
+            "status": "success",
+            "message": "Observation deleted successfully.",
+            "observation": serialized_observation
+        }), 200
     except Exception as e:
         logger.exception(f"Failed to delete observation {obs_id}: {e}")
         return jsonify({"status": "error", "message": "Failed to delete observation."}), 500
 
+# Delete Several Observations
+@app.route('/api/delete_observations', methods=['DELETE'])
+@jwt_required()
+def delete_observations():
+    """
+    Deletes every observation in 'observation_ids' owned by the authenticated user.
+    """
+    user_id = get_jwt_identity()
+    data = request.get_json() or {}
+    try:
+        object_ids = parse_object_ids(data.get('observation_ids'))
+    except ValueError as e:
+        logger.error(f"Invalid delete_observations request: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    try:
+        # A constant number of round trips: the documents are claimed first, so only those
+        # this request removes are subtracted from the rollups and tombstoned, even if
+        # another request deletes them too
+        claim = ObjectId()
+        observations_collection.update_many(
+            {"_id": {"$in": object_ids}, "userId": user_id, "deleteClaim": {"$exists": False}},
+            {"$set": {"deleteClaim": claim}}
+        )
+        deleted = list(observations_collection.find({"deleteClaim": claim}, ROLLUP_FIELDS))
+        if deleted:
+            observations_collection.delete_many({"deleteClaim": claim})
+        unauthorized = []
+        if len(deleted) < len(object_ids):
+            # IDs that no longer exist may have been deleted just now, so only report the ones still owned by someone else
+            _, unauthorized = classify_unmatched_ids(observations_collection, object_ids, user_id)
+        if deleted:
+            update_rollups(removed=deleted)
+            removed_ids = [obs['_id'] for obs in deleted]
+            record_tombstones(removed_ids, user_id)
+            mark_observations_committed()
+            if has_observation_subscribers():
+                for object_id in removed_ids:
+                    publish_observation_event('deleted', {'id': str(object_id)})
+        logger.info(f"User {user_id} deleted {len(deleted)} of {len(object_ids)} observations.")
+        return jsonify({
+            "status": "success",
+            "deleted": len(deleted),
+            "unauthorized": unauthorized
+        }), 200
+    except Exception as e:
+        logger.exception(f"Failed to delete observations: {e}")
+        return jsonify({"status": "error", "message": "Failed to delete observations."}), 500
+
+# Live Observation Feed
+@app.route('/api/observations/stream', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def observation_stream():
+    """
+    Streams observation changes as Server-Sent Events ('created', 'updated' and 'deleted'),
+    optionally limited to a 'bbox' and to a comma-separated list of 'species'.
+    EventSource cannot send headers, so the token may be passed as ?jwt=<token>.
+    """
+    current_user_id = get_jwt_identity()
+    try:
+        bbox = parse_bbox(request.args['bbox']) if request.args.get('bbox') else None
+    except ValueError as e:
+        logger.error(f"Invalid bbox in observation_stream request: {e}")
+        return jsonify({'status': 'error', 'message': f"Invalid bbox: {e}"}), 400
+    species = {value.strip() for value in request.args.get('species', '').split(',') if value.strip()} or None
+
+    subscriber = subscribe_to_observations(bbox, species)
+    if subscriber is None:
+        logger.warning(f"Live feed subscriber limit reached, rejecting user {current_user_id}.")
+        return jsonify({'status': 'error', 'message': 'Too many live feed connections.'}), 503
+    logger.info(f"User {current_user_id} subscribed to the live observation feed.")
+
+    def generate():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                if subscriber['overflow']:
+                    # The client missed events and must reload observations
+                    yield format_sse('reset', {})
+                    return
+                try:
+                    event = subscriber['queue'].get(timeout=SSE_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event['type'], event['observation'])
+        finally:
+            unsubscribe_from_observations(subscriber)
+            logger.info(f"User {current_user_id} left the live observation feed.")
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+# Observation Export
+@app.route('/api/observations/export', methods=['GET'])
+@jwt_required()
+def export_observations():
+    """
+    Streams every observation matching the get_observations filters as NDJSON, CSV or
+    a GeoJSON FeatureCollection (?format=, default ndjson). With ?gzip=1 the export is
+    compressed on the fly into a .gz download.
+    """
+    current_user_id = get_jwt_identity()
+    export_format = request.args.get('format', 'ndjson').lower()
+    if export_format not in EXPORT_FORMATS:
+        logger.error(f"Invalid export format requested: {export_format}")
+        return jsonify({'status': 'error', 'message': f"Format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    try:
+        query = build_observation_query(request.args)
+    except ValueError as e:
+        logger.error(f"Invalid export_observations request: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    filename = f"observations-{datetime.utcnow():%Y%m%d%H%M%S}.{extension}"
+    body = iter_observation_export(query, export_format)
+    if request.args.get('gzip', '').lower() in ('1', 'true', 'yes'):
+        body = gzip_stream(body)
+        mimetype, filename = 'application/gzip', f"{filename}.gz"
+
+    logger.info(f"User {current_user_id} started a {export_format} export of observations.")
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    # Ask reverse proxies not to buffer the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# Observation Statistics
+@app.route('/api/observations/stats', methods=['GET'])
+@jwt_required()
+def observation_stats():
+    """
+    Returns observation counts and summed quantity grouped by any of species, gender,
+    day, month and grid cell (?group_by=species,day), read only from the rollups.
+    Accepts species and gender filters and an inclusive start/end date range.
+    """
+    current_user_id = get_jwt_identity()
+    try:
+        group_by, pipeline = build_stats_pipeline(request.args)
+    except ValueError as e:
+        logger.error(f"Invalid observation_stats request: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    try:
+        groups = list(rollups_collection.aggregate(pipeline))
+    except Exception as e:
+        logger.exception(f"Failed to compute observation stats: {e}")
+        return jsonify({'status': 'error', 'message': 'Failed to compute observation stats.'}), 500
+    if len(groups) > MAX_STATS_GROUPS:
+        logger.error(f"Too many stats groups requested by user {current_user_id}.")
+        return jsonify({'status': 'error', 'message': 'Too many groups; add filters or group by fewer fields.'}), 400
+
+    results = []
+    for group in groups:
+        result = {key: group['_id'].get(key) for key in group_by}
+        if 'cell' in result:
+            x, y = result['cell']['x'], result['cell']['y']
+            result['cell'] = [
+                x * ROLLUP_CELL_SIZE - 180, y * ROLLUP_CELL_SIZE - 90,
+                (x + 1) * ROLLUP_CELL_SIZE - 180, (y + 1) * ROLLUP_CELL_SIZE - 90
+            ]
+        result['count'] = group['count']
+        result['quantity'] = group['quantity']
+        results.append(result)
+
+    logger.info(f"User {current_user_id} retrieved {len(results)} observation stats groups.")
+    return jsonify({'status': 'success', 'group_by': group_by, 'cell_size': ROLLUP_CELL_SIZE, 'groups': results}), 200
+
+# Aggregated Observations (Heatmap)
+@app.route('/api/observations/aggregate', methods=['GET'])
+@jwt_required()
+def aggregate_observations():
+    """
+    Bins observations into grid cells and returns the count and summed quantity per cell.
+    Cells are 'cell_size' degrees wide (or about 32 pixels at 'zoom'). 'group_by' may list
+    'species' and a time 'window' of hour, day or month. Accepts the get_observations filters.
+    """
+    current_user_id = get_jwt_identity()
+    try:
+        query = build_observation_query(request.args)
+        if 'zoom' in request.args:
+            cell_size = zoom_tolerance(int(request.args['zoom'])) * 32
+        else:
+            cell_size = float(request.args.get('cell_size', DEFAULT_CELL_SIZE))
+        if not (MIN_CELL_SIZE <= cell_size <= 90):
+            raise ValueError(f"cell_size must be between {MIN_CELL_SIZE} and 90 degrees")
+        group_by = [value.strip() for value in request.args.get('group_by', '').split(',') if value.strip()]
+        if any(value not in ['species', 'window'] for value in group_by):
+            raise ValueError("group_by may only contain species and window")
+        window = request.args.get('window', 'day') if 'window' in group_by else None
+        if window and window not in AGGREGATE_WINDOWS:
+            raise ValueError(f"window must be one of {', '.join(AGGREGATE_WINDOWS)}")
+    except ValueError as e:
+        logger.error(f"Invalid aggregate_observations parameters: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    try:
+        pipeline = build_aggregate_pipeline(query, cell_size, 'species' in group_by, window)
+        buckets = list(observations_collection.aggregate(pipeline, allowDiskUse=True))
+    except Exception:
+        logger.exception("Exception occurred while aggregating observations.")
+        return jsonify({'status': 'error', 'message': 'Failed to aggregate observations'}), 500
+
+    if len(buckets) > MAX_AGGREGATE_CELLS:
+        logger.error(f"Aggregation for user {current_user_id} exceeded {MAX_AGGREGATE_CELLS} cells.")
+        return jsonify({'status': 'error', 'message': 'Too many cells, use a larger cell_size or a smaller bbox.'}), 400
+
+    cells = []
+    for bucket in buckets:
+        key = bucket['_id']
+        cell = {
+            'latitude': round((key['y'] + 0.5) * cell_size - 90, 6),
+            'longitude': round((key['x'] + 0.5) * cell_size - 180, 6),
+            'count': bucket['count'],
+            'quantity': bucket['quantity']
+        }
+        if 'species' in key:
+            cell['species'] = key['species']
+        if 'window' in key:
+            cell['window'] = key['window']
+        cells.append(cell)
+
+    logger.info(f"User {current_user_id} aggregated observations into {len(cells)} cells.")
+    return jsonify({'status': 'success', 'cell_size': cell_size, 'cells': cells}), 200
+
+# Observations Within a Bounding Box
+@app.route('/api/observations/within_bbox', methods=['GET'])
+@jwt_required()
+def observations_within_bbox():
+    """
+    Retrieves observations inside the 'bbox' (minLon,minLat,maxLon,maxLat) viewport.
+    Accepts the same filters and pagination parameters as get_observations.
+    """
+    current_user_id = get_jwt_identity()
+    if not request.args.get('bbox'):
+        logger.error("Missing bbox in observations_within_bbox request.")
+        return jsonify({'status': 'error', 'message': 'Missing bbox.'}), 400
+    try:
+        query = build_observation_query(request.args)
+    except ValueError as e:
+        logger.error(f"Invalid observations_within_bbox parameters: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    return observation_page_response(query, current_user_id)
+
+# Observations Near a Point
+@app.route('/api/observations/near', methods=['GET'])
+@jwt_required()
+def observations_near():
+    """
+    Retrieves observations within 'radius' metres of the 'latitude'/'longitude' point.
+    Accepts the same filters and pagination parameters as get_observations.
+    """
+    current_user_id = get_jwt_identity()
+    try:
+        latitude = float(request.args['latitude'])
+        longitude = float(request.args['longitude'])
+        radius = float(request.args['radius'])
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180) or radius <= 0:
+            raise ValueError
+    except (KeyError, ValueError, TypeError):
+        logger.error("Invalid point or radius in observations_near request.")
+        return jsonify({'status': 'error', 'message': 'latitude, longitude and a positive radius are required.'}), 400
+
+    try:
+        query = build_observation_query(request.args)
+    except ValueError as e:
+        logger.error(f"Invalid observations_near parameters: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    # $centerSphere takes the radius in radians
+    query['location'] = {'$geoWithin': {
+        '$centerSphere': [[longitude, latitude], radius / EARTH_RADIUS_METERS]
+    }}
+    return observation_page_response(query, current_user_id)
+
+# Observations Inside a Favorite Spot
+@app.route('/api/observations/in_spot/<spot_id>', methods=['GET'])
+@jwt_required()
+def observations_in_spot(spot_id):
+    """
+    Retrieves observations inside one of the authenticated user's favorite spots.
+    Accepts the same filters and pagination parameters as get_observations.
+    """
+    current_user_id = get_jwt_identity()
+    try:
+        object_id = ObjectId(spot_id)
+    except InvalidId:
+        logger.error(f"Invalid spot_id provided: {spot_id}")
+        return jsonify({'status': 'error', 'message': 'Invalid spot ID.'}), 400
+
+    spot = spots_collection.find_one({'_id': object_id, 'userId': current_user_id})
+    if not spot:
+        logger.error(f"Spot not found for user {current_user_id}: {spot_id}")
+        return jsonify({'status': 'error', 'message': 'Favorite spot not found.'}), 404
+
+    try:
+        query = build_observation_query(request.args)
+        ring = spot_ring(spot.get('coordinates', []))
+    except (ValueError, TypeError, KeyError) as e:
+        logger.error(f"Invalid observations_in_spot request for spot {spot_id}: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    query['location'] = {'$geoWithin': {'$geometry': {'type': 'Polygon', 'coordinates': [ring]}}}
+    # The result also depends on the spot, which the observation version does not track
+    return observation_page_response(query, current_user_id, use_etag=False)
+
 # Serve GeoJSON Files via /data/<filename>
 @app.route('/var/data/<path:filename>', methods=['GET'])
 @jwt_required()
 def serve_data(filename):
     """
-    Serves GeoJSON files from the specified data directory.
+    Serves GeoJSON files from the specified data directory. With ?bbox=minLon,minLat,maxLon,maxLat
+    only the intersecting features are returned, and ?properties=a,b keeps only those properties.
     """
     # Define allowed extensions
     allowed_extensions = {'geojson'}
@@ -406,22 +3893,315 @@ def serve_data(filename):
         return jsonify({'status': 'error', 'message': 'File not found.'}), 404
     
     logger.info(f"User is requesting data file: {filename}")
-    return send_from_directory(DIR, filename)
+    return layer_subset_response(file_path, max_age=data_file_max_age(filename))
+
+# Available Time Periods
+@app.route('/api/time_periods', methods=['GET'])
+@jwt_required()
+def time_periods():
+    """
+    Lists the available time periods of every time-stamped layer,
+    or of a single layer when 'layer' is given (e.g. ?layer=temperature).
+    """
+    refresh_time_period_catalog()
+    catalog = _time_period_catalog
+    layer = request.args.get('layer')
+    if layer:
+        entry = catalog['layers'].get(layer)
+        if not entry:
+            logger.error(f"Unknown layer requested in time_periods: {layer}")
+            return jsonify({'status': 'error', 'message': 'Layer not found.'}), 404
+        layers = {layer: entry['periods']}
+    else:
+        layers = {name: entry['periods'] for name, entry in catalog['layers'].items()}
+
+    response = jsonify({'status': 'success', 'layers': layers})
+    response.set_etag(f"catalog-{catalog['version']}-{layer or '*'}")
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+# Vector Tiles for GeoJSON Layers
+@app.route('/tiles/<path:layer>/<int:z>/<int:x>/<int:y>', methods=['GET'])
+@jwt_required()
+def serve_tile(layer, z, x, y):
+    """
+    Serves the features of a GeoJSON layer that fall inside one XYZ tile,
+    clipped and simplified for the zoom level. Tiles are cached on disk.
+    """
+    if not (MIN_TILE_ZOOM <= z <= MAX_TILE_ZOOM) or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        logger.warning(f"Invalid tile requested: {layer}/{z}/{x}/{y}")
+        return jsonify({'status': 'error', 'message': 'Invalid tile coordinates.'}), 400
+
+    file_path = layer_file_path(layer)
+    if not file_path:
+        logger.error(f"Tile layer not found: {layer}")
+        return jsonify({'status': 'error', 'message': 'Layer not found.'}), 404
+
+    try:
+        tile_path = get_tile_path(layer, file_path, z, x, y)
+    except (OSError, ValueError) as e:
+        logger.exception(f"Failed to build tile {layer}/{z}/{x}/{y}: {e}")
+        return jsonify({'status': 'error', 'message': 'Failed to build tile.'}), 500
+    return send_data_file(tile_path)
+
+# Simplified Static Layers
+@app.route('/simplified/<path:layer>', methods=['GET'])
+@jwt_required()
+def serve_simplified_layer(layer):
+    """
+    Serves a large static layer (e.g. /simplified/vegetation/vegetation_native?zoom=8)
+    simplified for the requested 'zoom' level or 'tolerance' in degrees.
+    """
+    if layer not in SIMPLIFIED_LAYERS:
+        logger.error(f"Simplified layer not available: {layer}")
+        return jsonify({'status': 'error', 'message': 'Layer not found.'}), 404
+
+    try:
+        zoom = int(request.args['zoom']) if 'zoom' in request.args else None
+        tolerance = float(request.args['tolerance']) if 'tolerance' in request.args else None
+    except ValueError:
+        logger.error("Invalid zoom or tolerance in serve_simplified_layer request.")
+        return jsonify({'status': 'error', 'message': 'Invalid zoom or tolerance.'}), 400
+
+    level = simplify_level_for(zoom=zoom, tolerance=tolerance)
+    try:
+        path = build_simplified_layer(layer, level)
+    except (OSError, ValueError) as e:
+        logger.exception(f"Failed to simplify {layer} for zoom {level}: {e}")
+        return jsonify({'status': 'error', 'message': 'Failed to simplify layer.'}), 500
+    if not path:
+        logger.error(f"Data file not found: {layer}")
+        return jsonify({'status': 'error', 'message': 'File not found.'}), 404
+
+    response = send_data_file(path, max_age=STATIC_DATA_MAX_AGE)
+    response.headers['X-Simplify-Zoom'] = str(level)
+    return response
+
+# Bundled Frames for the Time Slider
+@app.route('/api/frames/<layer>', methods=['GET'])
+@jwt_required()
+def layer_frames(layer):
+    """
+    Returns every available period of a time-stamped layer between the 'start' and 'end'
+    dates (YYMMDD, inclusive) in one delta-encoded response, optionally limited to the
+    features intersecting 'bbox'.
+    """
+    start = request.args.get('start', '')
+    end = request.args.get('end', start)
+    if not re.fullmatch(r'\d{6}', start) or not re.fullmatch(r'\d{6}', end) or end < start:
+        logger.error(f"Invalid date range in layer_frames request: {start}-{end}")
+        return jsonify({'status': 'error', 'message': 'start and end dates (YYMMDD) are required.'}), 400
+    try:
+        bbox = parse_bbox(request.args['bbox']) if request.args.get('bbox') else None
+    except ValueError as e:
+        logger.error(f"Invalid bbox in layer_frames request: {e}")
+        return jsonify({'status': 'error', 'message': f"Invalid bbox: {e}"}), 400
+
+    refresh_time_period_catalog()
+    entry = _time_period_catalog['layers'].get(layer)
+    if not entry:
+        logger.error(f"Unknown layer requested in layer_frames: {layer}")
+        return jsonify({'status': 'error', 'message': 'Layer not found.'}), 404
+    periods = [period for period in entry['periods'] if start <= period['date'] <= end]
+    if len(periods) > MAX_BUNDLE_FRAMES:
+        logger.error(f"Too many frames requested for {layer}: {len(periods)}")
+        return jsonify({'status': 'error', 'message': f"At most {MAX_BUNDLE_FRAMES} frames can be requested at once."}), 400
+
+    try:
+        bundle = build_frame_bundle(periods)
+    except (OSError, ValueError) as e:
+        logger.exception(f"Failed to build frame bundle for {layer}: {e}")
+        return jsonify({'status': 'error', 'message': 'Failed to load frames.'}), 500
+
+    etag_source = repr([(p['filename'], os.path.getmtime(os.path.join(DIR, p['filename']))) for p in periods] + [bbox])
+    response = jsonify({'status': 'success', 'layer': layer, **subset_frame_bundle(bundle, bbox)})
+    response.set_etag(hashlib.sha1(etag_source.encode()).hexdigest())
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    logger.info(f"Serving {len(periods)} frames of {layer} for {start}-{end}.")
+    return response.make_conditional(request)
+
+# Binary Weather Grids
+@app.route('/grids/<layer>/<date>/<hour>', methods=['GET'])
+@jwt_required()
+def serve_grid(layer, date, hour):
+    """
+    Serves a weather layer period (e.g. /grids/temperature/241018/07) in the binary
+    grid format, for the client to read as an ArrayBuffer.
+    """
+    if layer not in GRID_LAYERS or not re.fullmatch(r'\d{6}', date) or not re.fullmatch(r'\d{2}', hour):
+        logger.warning(f"Invalid grid requested: {layer}/{date}/{hour}")
+        return jsonify({'status': 'error', 'message': 'Invalid grid.'}), 400
+
+    try:
+        path = ingest_grid(layer, date, hour)
+    except (OSError, ValueError) as e:
+        logger.exception(f"Failed to build grid {layer}/{date}/{hour}: {e}")
+        return jsonify({'status': 'error', 'message': 'Failed to build grid.'}), 500
+    if not path:
+        logger.error(f"Grid source not found: {layer}/{date}/{hour}")
+        return jsonify({'status': 'error', 'message': 'File not found.'}), 404
+    return send_data_file(path, mimetype='application/octet-stream')
+
+# Weather at Points
+@app.route('/api/weather/sample', methods=['GET', 'POST'])
+@jwt_required()
+def weather_sample():
+    """
+    Samples weather layers at one or more points for every available period.
+    GET takes ?points=lat,lon;lat,lon&layers=temperature,rain&start=...&end=...,
+    POST a JSON body with the same keys ('points' as a list of pairs or objects).
+    """
+    current_user_id = get_jwt_identity()
+    params = (request.get_json(silent=True) or {}) if request.method == 'POST' else request.args
+    try:
+        lats, lons = parse_sample_points(params.get('points'))
+        layers = parse_weather_layers(params.get('layers') or ','.join(GRID_LAYERS))
+        start = parse_iso_datetime(params['start']) if params.get('start') else None
+        end = parse_iso_datetime(params['end']) if params.get('end') else None
+        samples = sample_weather(layers, lats, lons, start, end)
+    except ValueError as e:
+        logger.error(f"Invalid weather_sample request: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except OSError as e:
+        logger.exception(f"Failed to sample weather: {e}")
+        return jsonify({'status': 'error', 'message': 'Failed to sample weather.'}), 500
+
+    logger.info(f"User {current_user_id} sampled {len(layers)} weather layers at {len(lats)} points.")
+    return jsonify({
+        'status': 'success',
+        'points': [[lat, lon] for lat, lon in zip(lats.tolist(), lons.tolist())],
+        'layers': samples
+    }), 200
+
+# Weather at Observations
+@app.route('/api/weather/observations', methods=['POST'])
+@jwt_required()
+def weather_at_observation_ids():
+    """
+    Returns the weather at the time and place of each observation in 'observation_ids',
+    for the given 'layers' (all weather layers by default).
+    """
+    current_user_id = get_jwt_identity()
+    data = request.get_json(silent=True) or {}
+    try:
+        object_ids = parse_object_ids(data.get('observation_ids'))
+        layers = parse_weather_layers(data.get('layers') or GRID_LAYERS)
+    except ValueError as e:
+        logger.error(f"Invalid weather_at_observation_ids request: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    try:
+        observations = list(observations_collection.find(
+            {'_id': {'$in': object_ids}},
+            ['latitude', 'longitude', 'timestamp']
+        ))
+        weather = weather_at_observations(observations, layers)
+        logger.info(f"User {current_user_id} fetched weather for {len(observations)} observations.")
+        return jsonify({'status': 'success', 'weather': weather}), 200
+    except Exception as e:
+        logger.exception(f"Failed to fetch weather for observations: {e}")
+        return jsonify({'status': 'error', 'message': 'Failed to fetch weather for observations.'}), 500
+
+# Habitat Score Grid
+@app.route('/habitat/<date>/<hour>', methods=['GET'])
+@jwt_required()
+def serve_habitat_grid(date, hour):
+    """
+    Serves the red deer habitat score of one period (e.g. /habitat/241018/07) in the
+    binary grid format.
+    """
+    if not re.fullmatch(r'\d{6}', date) or not re.fullmatch(r'\d{2}', hour):
+        logger.warning(f"Invalid habitat grid requested: {date}/{hour}")
+        return jsonify({'status': 'error', 'message': 'Invalid period.'}), 400
+    path = habitat_score_path(date, hour)
+    if not os.path.isfile(path):
+        logger.error(f"Habitat grid not found: {date}/{hour}")
+        return jsonify({'status': 'error', 'message': 'File not found.'}), 404
+    return send_data_file(path, mimetype='application/octet-stream')
+
+# Habitat Score Tile
+@app.route('/habitat/<date>/<hour>/<int:z>/<int:x>/<int:y>', methods=['GET'])
+@jwt_required()
+def serve_habitat_tile(date, hour, z, x, y):
+    """
+    Serves the part of a habitat score grid covering one XYZ tile, in the binary grid format.
+    """
+    if not re.fullmatch(r'\d{6}', date) or not re.fullmatch(r'\d{2}', hour) \
+            or not (MIN_TILE_ZOOM <= z <= MAX_TILE_ZOOM) or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        logger.warning(f"Invalid habitat tile requested: {date}/{hour}/{z}/{x}/{y}")
+        return jsonify({'status': 'error', 'message': 'Invalid tile.'}), 400
+    path = habitat_score_path(date, hour)
+    if not os.path.isfile(path):
+        logger.error(f"Habitat grid not found: {date}/{hour}")
+        return jsonify({'status': 'error', 'message': 'File not found.'}), 404
+
+    response = Response(mimetype='application/octet-stream')
+    response.set_etag(f"{file_etag(os.stat(path))}-{z}-{x}-{y}")
+    response.cache_control.no_cache = True
+    if request.if_none_match.contains(response.get_etag()[0]):
+        response.status_code = 304
+        return response
+    try:
+        tile = habitat_tile_bytes(path, z, x, y)
+    except (OSError, ValueError) as e:
+        logger.exception(f"Failed to build habitat tile {date}/{hour}/{z}/{x}/{y}: {e}")
+        return jsonify({'status': 'error', 'message': 'Failed to build tile.'}), 500
+    if tile is None:
+        response.status_code = 204
+        return response
+    response.set_data(tile)
+    return response
+
+# Best Habitat Right Now
+@app.route('/api/habitat/best', methods=['GET'])
+@jwt_required()
+def best_habitat():
+    """
+    Returns the best scoring red deer habitat cells for a period (?date=YYMMDD&hour=HH,
+    default: the built period closest to now), optionally within a bbox.
+    """
+    current_user_id = get_jwt_identity()
+    try:
+        date, hour = resolve_habitat_period(request.args)
+        limit = int(request.args.get('limit', 10))
+        if not 1 <= limit <= MAX_HABITAT_RESULTS:
+            raise ValueError(f"limit must be between 1 and {MAX_HABITAT_RESULTS}")
+        bbox = parse_bbox(request.args['bbox']) if request.args.get('bbox') else None
+    except LookupError as e:
+        logger.error(f"Habitat score not available: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 404
+    except ValueError as e:
+        logger.error(f"Invalid best_habitat request: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    try:
+        header, values = read_cached_grid(habitat_score_path(date, hour))
+        cells = best_habitat_cells(header, values, limit, bbox)
+    except (OSError, ValueError) as e:
+        logger.exception(f"Failed to read habitat score {date}/{hour}: {e}")
+        return jsonify({'status': 'error', 'message': 'Failed to read habitat score.'}), 500
+
+    logger.info(f"User {current_user_id} retrieved {len(cells)} best habitat cells for {date}/{hour}.")
+    return jsonify({
+        'status': 'success',
+        'time': f"20{date[:2]}-{date[2:4]}-{date[4:6]} {hour}:00",
+        'cells': cells
+    }), 200
 
 # Animal Location
 @app.route('/animal_location', methods=['GET'])
 @jwt_required()
 def animal_location():
     """
-    Serves the animal location GeoJSON file.
+    Serves the animal location GeoJSON file, optionally subset with ?bbox= and ?properties=.
     """
-    animal_location_filename = os.path.basename(ANIMAL_LOCATION_FILE)
-    animal_location_dir = os.path.dirname(ANIMAL_LOCATION_FILE)
     if not os.path.isfile(ANIMAL_LOCATION_FILE):
         logger.error(f"Animal location GeoJSON file not found: {ANIMAL_LOCATION_FILE}")
         return jsonify({'status': 'error', 'message': 'File not found.'}), 404
     logger.info("Serving animal location GeoJSON.")
-    return send_from_directory(animal_location_dir, animal_location_filename)
+    return layer_subset_response(ANIMAL_LOCATION_FILE, max_age=STATIC_DATA_MAX_AGE)
 
 # ---------------------- New Endpoints for Favorite Spots ---------------------- #
 
@@ -451,17 +4231,25 @@ def add_favorite_spot():
     if not coordinates or not isinstance(coordinates, list):
         logger.error("Invalid coordinates provided in add_favorite_spot.")
         return jsonify({'status': 'error', 'message': 'Invalid coordinates provided.'}), 400
+
+    try:
+        geometry = spot_geometry(coordinates)
+    except ValueError as e:
+        logger.error(f"Invalid coordinates provided in add_favorite_spot: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 400
     
     # Create spot document
     spot = {
         'name': name,
         'coordinates': coordinates,  # Expecting list of LatLng arrays
         'userId': current_user_id,
-        'timestamp': datetime.utcnow()
+        'timestamp': datetime.utcnow(),
+        **geometry
     }
     
     try:
         result = spots_collection.insert_one(spot)
+        bump_spot_index_version(current_user_id)
         logger.info(f"User {current_user_id} added a favorite spot with ID: {result.inserted_id}")
         return jsonify({'status': 'success', 'message': 'Favorite spot added successfully', 'id': str(result.inserted_id)}), 201
     except Exception as e:
@@ -477,10 +4265,10 @@ def get_favorite_spots():
     """
     current_user_id = get_jwt_identity()
     try:
-        spots = list(spots_collection.find({'userId': current_user_id}))
+        spots = list(spots_collection.find({'userId': current_user_id}, SPOT_FIELDS))
         serialized_spots = [serialize_spot(spot) for spot in spots]
         logger.info(f"User {current_user_id} retrieved {len(serialized_spots)} favorite spots.")
-        return jsonify(serialized_spots), 200
+        return Response(encode_json(serialized_spots), mimetype='application/json'), 200
     except Exception as e:
         logger.exception("Exception occurred while fetching favorite spots.")
         return jsonify({'status': 'error', 'message': 'Failed to fetch favorite spots.'}), 500
@@ -490,10 +4278,10 @@ def get_favorite_spots():
 @jwt_required()
 def edit_favorite_spot():
     """
-    Edits an existing favorite spot.
+    Edits an existing favorite spot with a single atomic, ownership-checked update.
     """
     current_user_id = get_jwt_identity()
-    data = request.get_json()
+    data = request.get_json() or {}
     spot_id = data.get('spot_id')
     name = data.get('name', '').strip()
     coordinates = data.get('coordinates')  # New line to get coordinates
@@ -508,15 +4296,6 @@ def edit_favorite_spot():
         logger.error(f"Invalid spot_id provided: {spot_id}")
         return jsonify({'status': 'error', 'message': 'Invalid spot ID.'}), 400
 
-    spot = spots_collection.find_one({"_id": object_id})
-    if not spot:
-        logger.error(f"Spot not found: {spot_id}")
-        return jsonify({'status': 'error', 'message': 'Favorite spot not found.'}), 404
-
-    if spot.get('userId') != current_user_id:
-        logger.warning(f"Unauthorized edit attempt by user {current_user_id} on spot {spot_id}.")
-        return jsonify({'status': 'error', 'message': 'Unauthorized.'}), 403
-
     update_fields = {}
     if name:
         update_fields['name'] = name
@@ -527,18 +4306,35 @@ def edit_favorite_spot():
         logger.error("No update fields provided in edit_favorite_spot request.")
         return jsonify({'status': 'error', 'message': 'No data to update.'}), 400
 
+    geometry = {}
+    if coordinates:
+        try:
+            geometry = spot_geometry(coordinates)
+        except ValueError as e:
+            logger.error(f"Invalid coordinates provided in edit_favorite_spot: {e}")
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+
     try:
-        updated = spots_collection.update_one(
-            {"_id": object_id},
-            {"$set": update_fields}
+        # The previous version is returned so a no-op edit can still be reported
+        previous = spots_collection.find_one_and_update(
+            {"_id": object_id, "userId": current_user_id},
+            {"$set": {**update_fields, **geometry}},
+            return_document=ReturnDocument.BEFORE
         )
+        if previous is None:
+            return ownership_error(spots_collection, object_id, current_user_id, "Favorite spot", "edit")
 
-        if updated.modified_count > 0:
-            logger.info(f"Spot {spot_id} updated successfully by user {current_user_id}.")
-            return jsonify({'status': 'success', 'message': 'Favorite spot updated successfully.'}), 200
-        else:
+        if all(previous.get(field) == value for field, value in update_fields.items()):
             logger.info(f"No changes made to spot {spot_id} by user {current_user_id}.")
             return jsonify({'status': 'error', 'message': 'No changes made.'}), 400
+
+        bump_spot_index_version(current_user_id)
+        logger.info(f"Spot {spot_id} updated successfully by user {current_user_id}.")
+        return jsonify({
+            'status': 'success',
+            'message': 'Favorite spot updated successfully.',
+            'spot': serialize_spot({**previous, **update_fields, **geometry})
+        }), 200
     except Exception as e:
         logger.exception(f"Failed to update spot {spot_id}: {e}")
         return jsonify({'status': 'error', 'message': 'Failed to update favorite spot.'}), 500
@@ -548,10 +4344,10 @@ def edit_favorite_spot():
 @jwt_required()
 def delete_favorite_spot():
     """
-    Deletes a favorite spot.
+    Deletes a favorite spot with a single atomic, ownership-checked delete.
     """
     current_user_id = get_jwt_identity()
-    data = request.get_json()
+    data = request.get_json() or {}
     spot_id = data.get('spot_id')
     
     if not spot_id:
@@ -564,29 +4360,354 @@ def delete_favorite_spot():
         logger.error(f"Invalid spot_id provided: {spot_id}")
         return jsonify({'status': 'error', 'message': 'Invalid spot ID.'}), 400
     
-    spot = spots_collection.find_one({"_id": object_id})
-    if not spot:
-        logger.error(f"Spot not found: {spot_id}")
-        return jsonify({'status': 'error', 'message': 'Favorite spot not found.'}), 404
-    
-    if spot.get('userId') != current_user_id:
-        logger.warning(f"Unauthorized delete attempt by user {current_user_id} on spot {spot_id}.")
-        return jsonify({'status': 'error', 'message': 'Unauthorized.'}), 403
-    
     try:
-        deleted = spots_collection.delete_one({"_id": object_id})
-        
-        if deleted.deleted_count > 0:
-            logger.info(f"Spot {spot_id} deleted successfully by user {current_user_id}.")
-            return jsonify({'status': 'success', 'message': 'Favorite spot deleted successfully.'}), 200
-        else:
-            logger.error(f"Failed to delete spot {spot_id} by user {current_user_id}.")
-            return jsonify({'status': 'error', 'message': 'Failed to delete favorite spot.'}), 500
+        deleted = spots_collection.find_one_and_delete({"_id": object_id, "userId": current_user_id})
+        if deleted is None:
+            return ownership_error(spots_collection, object_id, current_user_id, "Favorite spot", "delete")
+
+        bump_spot_index_version(current_user_id)
+        logger.info(f"Spot {spot_id} deleted successfully by user {current_user_id}.")
+        return jsonify({'status': 'success', 'message': 'Favorite spot deleted successfully.'}), 200
     except Exception as e:
         logger.exception(f"Failed to delete spot {spot_id}: {e}")
         return jsonify({'status': 'error', 'message': 'Failed to delete favorite spot.'}), 500
+
+# Delete Several Favorite Spots
+@app.route('/wildvision/spots/batch', methods=['DELETE'])
+@jwt_required()
+def delete_favorite_spots():
+    """
+    Deletes every favorite spot in 'spot_ids' owned by the authenticated user.
+    """
+    current_user_id = get_jwt_identity()
+    data = request.get_json() or {}
+    try:
+        object_ids = parse_object_ids(data.get('spot_ids'))
+    except ValueError as e:
+        logger.error(f"Invalid delete_favorite_spots request: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    try:
+        deleted = spots_collection.delete_many({"_id": {"$in": object_ids}, "userId": current_user_id})
+        if deleted.deleted_count:
+            bump_spot_index_version(current_user_id)
+        unauthorized = []
+        if deleted.deleted_count < len(object_ids):
+            # IDs that no longer exist may have been deleted just now, so only report the ones still owned by someone else
+            _, unauthorized = classify_unmatched_ids(spots_collection, object_ids, current_user_id)
+        logger.info(f"User {current_user_id} deleted {deleted.deleted_count} of {len(object_ids)} spots.")
+        return jsonify({
+            'status': 'success',
+            'deleted': deleted.deleted_count,
+            'unauthorized': unauthorized
+        }), 200
+    except Exception as e:
+        logger.exception(f"Failed to delete favorite spots: {e}")
+        return jsonify({'status': 'error', 'message': 'Failed to delete favorite spots.'}), 500
+
+# Favorite Spots Containing a Point
+@app.route('/wildvision/spots/containing', methods=['GET'])
+@jwt_required()
+def favorite_spots_containing():
+    """
+    Lists the authenticated user's favorite spots that contain the point given by
+    the 'latitude' and 'longitude' query parameters.
+    """
+    current_user_id = get_jwt_identity()
+    try:
+        latitude = float(request.args['latitude'])
+        longitude = float(request.args['longitude'])
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValueError
+    except (KeyError, ValueError):
+        logger.error("Invalid point provided in favorite_spots_containing.")
+        return jsonify({'status': 'error', 'message': 'Valid latitude and longitude are required.'}), 400
+
+    try:
+        index = get_spot_index(current_user_id)
+        spots = spots_containing(index, longitude, latitude)
+        return jsonify({
+            'status': 'success',
+            'spots': [{'id': str(spot['_id']), 'name': spot.get('name', 'N/A')} for spot in spots]
+        }), 200
+    except Exception as e:
+        logger.exception(f"Failed to find spots containing a point: {e}")
+        return jsonify({'status': 'error', 'message': 'Failed to find favorite spots.'}), 500
+
+# Favorite Spot Summary
+@app.route('/wildvision/spots/summary', methods=['GET'])
+@jwt_required()
+def favorite_spots_summary():
+    """
+    Summarizes each of the authenticated user's favorite spots: bbox, area, centroid and
+    the number of observations inside it. Accepts the species, gender, userId, start
+    and end filters of get_observations.
+    """
+    current_user_id = get_jwt_identity()
+    try:
+        query = build_observation_query(request.args)
+    except ValueError as e:
+        logger.error(f"Invalid favorite_spots_summary request: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    try:
+        index = get_spot_index(current_user_id)
+        counts = {spot['_id']: 0 for spot in index['spots']}
+        if index['tree']:
+            # Only observations within the bbox of all spots can fall inside one
+            query.update(bbox_query(*index['tree'][0]))
+            for obs in observations_collection.find(query, {'latitude': 1, 'longitude': 1}).batch_size(5000):
+                for spot in spots_containing(index, obs['longitude'], obs['latitude']):
+                    counts[spot['_id']] += 1
+
+        logger.info(f"User {current_user_id} summarized {len(counts)} favorite spots.")
+        return jsonify({
+            'status': 'success',
+            'spots': [
+                {
+                    'id': str(spot['_id']),
+                    'name': spot.get('name', 'N/A'),
+                    'bbox': spot['bbox'],
+                    'area': spot['area'],
+                    'centroid': spot['centroid'],
+                    'observations': counts[spot['_id']]
+                }
+                for spot in index['spots']
+            ]
+        }), 200
+    except Exception as e:
+        logger.exception(f"Failed to summarize favorite spots: {e}")
+        return jsonify({'status': 'error', 'message': 'Failed to summarize favorite spots.'}), 500
+
+# ---------------------- CLI Commands ---------------------- #
+
+@app.cli.command('migrate-locations')
+def migrate_locations():
+    """
+    One-time migration that adds the GeoJSON 'location' field to existing observations.
+    """
+    ensure_indexes()
+    batch = []
+    migrated = skipped = 0
+    for obs in observations_collection.find(
+        {'location': {'$exists': False}},
+        {'latitude': 1, 'longitude': 1}
+    ):
+        try:
+            latitude = float(obs['latitude'])
+            longitude = float(obs['longitude'])
+            if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+                raise ValueError
+        except (KeyError, ValueError, TypeError):
+            logger.warning(f"Skipping observation {obs['_id']} with invalid coordinates.")
+            skipped += 1
+            continue
+        batch.append(UpdateOne({'_id': obs['_id']}, {'$set': {'location': make_point(latitude, longitude)}}))
+        if len(batch) >= 1000:
+            migrated += observations_collection.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        migrated += observations_collection.bulk_write(batch, ordered=False).modified_count
+    logger.info(f"Added location to {migrated} observations, skipped {skipped}.")
+
+@app.cli.command('backfill-spot-geometry')
+def backfill_spot_geometry():
+    """
+    One-time migration that stores the normalized ring, bbox, area and centroid of existing spots.
+    """
+    ensure_indexes()
+    batch = []
+    updated = skipped = 0
+    users = set()
+    for spot in spots_collection.find({'ring': {'$exists': False}}, {'coordinates': 1, 'userId': 1}):
+        try:
+            geometry = spot_geometry(spot.get('coordinates'))
+        except ValueError as e:
+            logger.warning(f"Skipping spot {spot['_id']}: {e}")
+            skipped += 1
+            continue
+        batch.append(UpdateOne({'_id': spot['_id']}, {'$set': geometry}))
+        users.add(spot.get('userId'))
+        if len(batch) >= 1000:
+            updated += spots_collection.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += spots_collection.bulk_write(batch, ordered=False).modified_count
+    for user_id in users:
+        bump_spot_index_version(user_id)
+    logger.info(f"Added geometry to {updated} spots, skipped {skipped}.")
+
+def build_rollups(target_name):
+    """
+    Aggregates the observations into rollup buckets and writes them to 'target_name',
+    replacing that collection.
+    """
+    observations_collection.aggregate([
+        {'$match': {
+            'latitude': {'$type': 'number'},
+            'longitude': {'$type': 'number'},
+            'timestamp': {'$type': 'date'}
+        }},
+        {'$group': {
+            '_id': {
+                'species': '$species',
+                'gender': '$gender',
+                'day': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$timestamp'}},
+                'cellX': {'$floor': {'$divide': [{'$add': ['$longitude', 180]}, ROLLUP_CELL_SIZE]}},
+                'cellY': {'$floor': {'$divide': [{'$add': ['$latitude', 90]}, ROLLUP_CELL_SIZE]}}
+            },
+            'count': {'$sum': 1},
+            'quantity': {'$sum': '$quantity'}
+        }},
+        {'$project': {
+            '_id': 0,
+            'species': '$_id.species',
+            'gender': '$_id.gender',
+            'day': '$_id.day',
+            'cellX': {'$toInt': '$_id.cellX'},
+            'cellY': {'$toInt': '$_id.cellY'},
+            'count': 1,
+            'quantity': 1
+        }},
+        {'$out': target_name}
+    ], allowDiskUse=True)
+
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups():
+    """
+    Recomputes the observation rollups from the observations collection. The new rollups
+    are built and indexed in a separate collection and swapped in when complete.
+    Rollup updates made while the aggregation runs go to the old collection and would be
+    lost, so the build is retried if any observation write was recorded meanwhile and
+    abandoned after REBUILD_ROLLUP_ATTEMPTS. Writes still in flight when the build ends
+    are not detected; run the command while writes are paused for an exact result.
+    """
+    staging = rollups_collection.database[f"{rollups_collection.name}_rebuild"]
+    for attempt in range(1, REBUILD_ROLLUP_ATTEMPTS + 1):
+        versions = observation_versions()
+        build_rollups(staging.name)
+        ensure_rollup_indexes(staging)
+        if observation_versions() == versions:
+            break
+        logger.warning(f"Observations changed during rollup rebuild attempt {attempt}.")
+    else:
+        staging.drop()
+        raise click.ClickException("Observations kept changing during the rebuild; run it again while writes are paused.")
+    staging.rename(rollups_collection.name, dropTarget=True)
+    logger.info(f"Rebuilt {rollups_collection.count_documents({})} observation rollups.")
+
+@app.cli.command('build-habitat')
+@click.option('--force', is_flag=True, help='Rebuild periods whose score grid is up to date.')
+def build_habitat(force):
+    """
+    Builds the red deer habitat score grid of every temperature period.
+    """
+    refresh_time_period_catalog(force=True)
+    header, static = build_habitat_static()
+    static_inputs = [path for path in (ANIMAL_LOCATION_FILE, VEGETATION_FILE) if os.path.isfile(path)]
+    static_mtime = max(os.path.getmtime(path) for path in static_inputs)
+    built = skipped = 0
+    for period in layer_periods('temperature'):
+        date, hour = period['date'], period['hour']
+        path = habitat_score_path(date, hour)
+        inputs = [os.path.join(DIR, filename) for filename in
+                  (find_time_period_file(layer, date, hour) for layer in ['temperature', 'rain']) if filename]
+        newest_input = max([static_mtime] + [os.path.getmtime(source) for source in inputs])
+        if not force and os.path.isfile(path) and os.path.getmtime(path) >= newest_input:
+            skipped += 1
+            continue
+        try:
+            build_habitat_period(header, static, date, hour)
+            built += 1
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to build habitat score for {date}/{hour}: {e}")
+    logger.info(f"Built {built} habitat score grids on a {header['nx']}x{header['ny']} grid, {skipped} up to date.")
+
+@app.cli.command('generate-tiles')
+@click.argument('layer')
+@click.option('--min-zoom', default=MIN_TILE_ZOOM, show_default=True, help='Lowest zoom level to generate.')
+@click.option('--max-zoom', default=10, show_default=True, help='Highest zoom level to generate.')
+def generate_tiles(layer, min_zoom, max_zoom):
+    """
+    Pre-generates the tiles of a GeoJSON layer (e.g. weather/temperature_241018_07)
+    for every tile that intersects the layer's extent.
+    """
+    file_path = layer_file_path(layer)
+    if not file_path:
+        raise click.ClickException(f"Layer not found: {layer}")
+
+    features = load_layer(file_path)['features']
+    if not features:
+        logger.info(f"Layer {layer} has no features, nothing to generate.")
+        return
+    min_lon = min(box[0] for box, _ in features)
+    min_lat = min(box[1] for box, _ in features)
+    max_lon = max(box[2] for box, _ in features)
+    max_lat = max(box[3] for box, _ in features)
+
+    generated = 0
+    for z in range(min_zoom, min(max_zoom, MAX_TILE_ZOOM) + 1):
+        n = 2 ** z
+        x_min = int((min_lon + 180.0) / 360.0 * n)
+        x_max = min(n - 1, int((max_lon + 180.0) / 360.0 * n))
+        y_min = int((1 - math.asinh(math.tan(math.radians(max_lat))) / math.pi) / 2 * n)
+        y_max = min(n - 1, int((1 - math.asinh(math.tan(math.radians(min_lat))) / math.pi) / 2 * n))
+        for x in range(x_min, x_max + 1):
+            for y in range(max(0, y_min), y_max + 1):
+                get_tile_path(layer, file_path, z, x, y)
+                generated += 1
+    logger.info(f"Generated {generated} tiles for layer {layer}.")
+
+@app.cli.command('compress-data')
+@click.option('--force', is_flag=True, help='Rewrite variants even if they are up to date.')
+def compress_data(force):
+    """
+    Writes gzip and brotli variants next to every GeoJSON file under DIR.
+    """
+    written = 0
+    for root, dirs, files in os.walk(DIR):
+        for file in files:
+            if file.endswith('.geojson'):
+                written += write_compressed_variants(os.path.join(root, file), force=force)
+    logger.info(f"Wrote {written} precompressed data files.")
+
+@app.cli.command('simplify-layers')
+@click.option('--force', is_flag=True, help='Rebuild levels even if they are up to date.')
+def simplify_layers(force):
+    """
+    Builds every simplification level of the large static layers under SIMPLIFIED_DIR.
+    """
+    for layer in SIMPLIFIED_LAYERS:
+        for zoom in SIMPLIFY_ZOOMS:
+            if not build_simplified_layer(layer, zoom, force=force):
+                logger.error(f"Layer not found: {layer}")
+                break
+
+@app.cli.command('ingest-grids')
+@click.option('--layer', 'layers', multiple=True, type=click.Choice(GRID_LAYERS),
+              help='Weather layer to ingest (repeatable, default: all).')
+@click.option('--dtype', default='float32', show_default=True, type=click.Choice(['float32', 'uint16']),
+              help='Storage type of the grid values.')
+@click.option('--force', is_flag=True, help='Rebuild grids even if they are up to date.')
+def ingest_grids(layers, dtype, force):
+    """
+    Converts every weather GeoJSON period into a binary grid under GRID_DIR.
+    """
+    refresh_time_period_catalog(force=True)
+    ingested = failed = 0
+    for layer in layers or GRID_LAYERS:
+        entry = _time_period_catalog['layers'].get(layer)
+        for period in (entry['periods'] if entry else []):
+            try:
+                ingest_grid(layer, period['date'], period['hour'], dtype=dtype, force=force)
+                ingested += 1
+            except (OSError, ValueError) as e:
+                logger.error(f"Failed to ingest {period['filename']}: {e}")
+                failed += 1
+    logger.info(f"Ingested {ingested} grids, {failed} failed.")
+
 # ---------------------- Run the App ---------------------- #
 
 if __name__ == '__main__':
     # It's recommended to set debug=False in production
-    app.run(debug=True)
+    create_app().run(debug=True)
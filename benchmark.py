@@ -0,0 +1,312 @@
+"""
+Load test and benchmark for the WildVision API.
+
+Generates synthetic observations, spots and weather/vegetation GeoJSON at the
+requested sizes, then drives the API concurrently through Flask's test client
+and reports throughput and p50/p95/p99 latency per scenario.
+
+By default MongoDB is replaced by mongomock so the run needs no server; pass
+--mongo-uri to benchmark against a local mongod instead (the observations,
+spots and sync collections of its 'wildvision' database are cleared and
+refilled). Results can be appended as JSON lines to a
+file with --output to track them over time.
+
+    python benchmark.py --observations 20000 --concurrency 8 --duration 20
+"""
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+SCENARIOS = ['get_observations', 'add_observation', 'serve_data', 'get_spots', 'add_spot']
+SPECIES = ['Red Deer', 'Sika Deer', 'Fallow Deer', 'Tahr', 'Chamois', 'Wild Pig', 'Goat']
+GENDERS = ['Male', 'Female', 'Unknown']
+# Region the fixtures are generated in (roughly the South Island of New Zealand)
+REGION = (166.0, -47.0, 174.5, -40.5)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--observations', type=int, default=10000, help='Synthetic observations to load.')
+    parser.add_argument('--users', type=int, default=20, help='Users the observations and spots belong to.')
+    parser.add_argument('--spots', type=int, default=10, help='Favorite spots per user.')
+    parser.add_argument('--grid-size', type=int, default=60, help='Cells per side of each weather layer.')
+    parser.add_argument('--periods', type=int, default=6, help='Time periods per weather layer.')
+    parser.add_argument('--vegetation-features', type=int, default=200, help='Polygons in the vegetation layer.')
+    parser.add_argument('--vertices', type=int, default=200, help='Vertices per vegetation polygon.')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='Comma-separated scenarios to run.')
+    parser.add_argument('--concurrency', type=int, default=4, help='Concurrent workers per scenario.')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds to run each scenario.')
+    parser.add_argument('--warmup', type=float, default=1.0, help='Seconds of unmeasured warm-up per scenario.')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for fixtures and requests.')
+    parser.add_argument('--mongo-uri', help='Benchmark against this MongoDB instead of mongomock.')
+    parser.add_argument('--data-dir', help='Directory for the generated GeoJSON (default: a temporary directory).')
+    parser.add_argument('--output', help='Append the results as a JSON line to this file.')
+    return parser.parse_args()
+
+# ---------------------- Fixtures ---------------------- #
+
+def random_point(rng):
+    """
+    Returns a random (latitude, longitude) inside the fixture region.
+    """
+    return rng.uniform(REGION[1], REGION[3]), rng.uniform(REGION[0], REGION[2])
+
+def write_geojson(path, features):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'type': 'FeatureCollection', 'features': features}, f)
+
+def generate_data_files(data_dir, args, rng):
+    """
+    Writes weather grids, the vegetation layer and the red deer layer under data_dir.
+    Returns the data file names (relative to data_dir) used by the serve_data scenario.
+    """
+    min_lon, min_lat, max_lon, max_lat = REGION
+    cell_width = (max_lon - min_lon) / args.grid_size
+    cell_height = (max_lat - min_lat) / args.grid_size
+    start = datetime(2024, 10, 18)
+    weather_files = []
+    for period in range(args.periods):
+        when = start + timedelta(hours=3 * period)
+        for layer in ['temperature', 'rain']:
+            features = []
+            for i in range(args.grid_size):
+                for j in range(args.grid_size):
+                    lon, lat = min_lon + i * cell_width, min_lat + j * cell_height
+                    ring = [[lon, lat], [lon + cell_width, lat], [lon + cell_width, lat + cell_height],
+                            [lon, lat + cell_height], [lon, lat]]
+                    features.append({
+                        'type': 'Feature',
+                        'properties': {layer: round(rng.uniform(0, 25), 1), 'color': '#%06x' % rng.randrange(0x1000000)},
+                        'geometry': {'type': 'Polygon', 'coordinates': [ring]}
+                    })
+            filename = f"weather/{layer}_{when:%y%m%d_%H}.geojson"
+            write_geojson(os.path.join(data_dir, filename), features)
+            weather_files.append(filename)
+
+    features = []
+    for k in range(args.vegetation_features):
+        cy, cx = random_point(rng)
+        radius = rng.uniform(0.02, 0.3)
+        ring = [
+            [cx + radius * math.cos(2 * math.pi * t / args.vertices) * rng.uniform(0.8, 1.2),
+             cy + radius * math.sin(2 * math.pi * t / args.vertices) * rng.uniform(0.8, 1.2)]
+            for t in range(args.vertices)
+        ]
+        ring.append(ring[0])
+        features.append({'type': 'Feature', 'properties': {'Name': f'vegetation {k}'},
+                         'geometry': {'type': 'Polygon', 'coordinates': [ring]}})
+    write_geojson(os.path.join(data_dir, 'vegetation/vegetation_native.geojson'), features)
+
+    features = []
+    for k in range(50):
+        lat, lon = random_point(rng)
+        ring = [[lon, lat], [lon + 0.2, lat], [lon + 0.2, lat + 0.2], [lon, lat + 0.2], [lon, lat]]
+        features.append({'type': 'Feature', 'properties': {'Abundance': rng.choice('HML')},
+                         'geometry': {'type': 'Polygon', 'coordinates': [ring]}})
+    write_geojson(os.path.join(data_dir, 'animal/red_deer_location.geojson'), features)
+    return weather_files + ['vegetation/vegetation_native.geojson', 'animal/red_deer_location.geojson']
+
+def load_database(app_module, args, rng, user_ids):
+    """
+    Replaces the observations and spots with synthetic documents.
+    """
+    for collection in [app_module.observations_collection, app_module.spots_collection,
+                       app_module.tombstones_collection, app_module.counters_collection]:
+        collection.delete_many({})
+
+    now = datetime.utcnow().replace(microsecond=0)
+    observations = []
+    for seq in range(1, args.observations + 1):
+        lat, lon = random_point(rng)
+        observations.append({
+            'species': rng.choice(SPECIES),
+            'gender': rng.choice(GENDERS),
+            'quantity': rng.randint(1, 12),
+            'latitude': lat,
+            'longitude': lon,
+            'location': app_module.make_point(lat, lon),
+            'userId': rng.choice(user_ids),
+            'timestamp': now - timedelta(minutes=rng.randrange(60 * 24 * 365)),
+            'changeSeq': seq
+        })
+    for offset in range(0, len(observations), 5000):
+        app_module.observations_collection.insert_many(observations[offset:offset + 5000])
+    app_module.counters_collection.insert_one({'_id': 'observations', 'seq': args.observations})
+
+    spots = []
+    for user_id in user_ids:
+        for k in range(args.spots):
+            lat, lon = random_point(rng)
+            spots.append({
+                'name': f'spot {k}',
+                'coordinates': [[lat, lon], [lat + 0.1, lon], [lat + 0.1, lon + 0.1], [lat, lon + 0.1]],
+                'userId': user_id,
+                'timestamp': now
+            })
+    if spots:
+        app_module.spots_collection.insert_many(spots)
+
+# ---------------------- Scenarios ---------------------- #
+
+def make_request(scenario, client, headers, rng, data_files):
+    """
+    Sends one request of the given scenario and returns the response.
+    """
+    if scenario == 'get_observations':
+        params = {'limit': 500}
+        if rng.random() < 0.5:
+            params['species'] = rng.choice(SPECIES)
+        return client.get('/api/get_observations', query_string=params, headers=headers)
+    if scenario == 'add_observation':
+        lat, lon = random_point(rng)
+        return client.post('/api/add_observation', headers=headers, json={
+            'species': rng.choice(SPECIES), 'gender': rng.choice(GENDERS),
+            'quantity': rng.randint(1, 12), 'latitude': lat, 'longitude': lon
+        })
+    if scenario == 'serve_data':
+        return client.get(f'/var/data/{rng.choice(data_files)}', headers={**headers, 'Accept-Encoding': 'gzip, br'})
+    if scenario == 'get_spots':
+        return client.get('/wildvision/spots', headers=headers)
+    if scenario == 'add_spot':
+        lat, lon = random_point(rng)
+        return client.post('/wildvision/spots', headers=headers, json={
+            'name': 'benchmark', 'coordinates': [[lat, lon], [lat + 0.1, lon], [lat + 0.1, lon + 0.1]]
+        })
+    raise ValueError(f"Unknown scenario: {scenario}")
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return float('nan')
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def run_scenario(scenario, app_module, tokens, data_files, args):
+    """
+    Runs one scenario with args.concurrency workers for args.duration seconds.
+    Returns throughput, error count and latency percentiles in milliseconds.
+    """
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+
+    def worker(worker_id, until, measure):
+        rng = random.Random(args.seed * 1000 + worker_id)
+        client = app_module.app.test_client()
+        headers = {'Authorization': f"Bearer {tokens[worker_id % len(tokens)]}"}
+        local_latencies, local_errors = [], 0
+        while time.perf_counter() < until:
+            started = time.perf_counter()
+            response = make_request(scenario, client, headers, rng, data_files)
+            response.get_data()
+            elapsed = time.perf_counter() - started
+            if response.status_code >= 400:
+                local_errors += 1
+            local_latencies.append(elapsed)
+        if measure:
+            with lock:
+                latencies.extend(local_latencies)
+                errors[0] += local_errors
+
+    elapsed = 0.0
+    for measure, seconds in [(False, args.warmup), (True, args.duration)]:
+        if seconds <= 0:
+            continue
+        started = time.perf_counter()
+        until = started + seconds
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            for future in [executor.submit(worker, i, until, measure) for i in range(args.concurrency)]:
+                future.result()
+        if measure:
+            elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'throughput': len(latencies) / elapsed if latencies else 0.0,
+        'mean_ms': 1000 * sum(latencies) / len(latencies) if latencies else float('nan'),
+        'p50_ms': 1000 * percentile(latencies, 0.50),
+        'p95_ms': 1000 * percentile(latencies, 0.95),
+        'p99_ms': 1000 * percentile(latencies, 0.99)
+    }
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    args = parse_args()
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        sys.exit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    rng = random.Random(args.seed)
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='wildvision-bench-')
+    print(f"Generating data files in {data_dir}...")
+    data_files = generate_data_files(data_dir, args, rng)
+
+    # app.py reads its configuration when imported
+    os.environ['DATA_DIR'] = data_dir
+    for name in ['SIMPLIFIED_DIR', 'GRID_DIR', 'TILE_CACHE_DIR']:
+        os.environ.setdefault(name, os.path.join(data_dir, '_' + name.lower()))
+    os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-secret-key-of-sufficient-length')
+    if args.mongo_uri:
+        os.environ['MONGO_URI'] = args.mongo_uri
+    else:
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("mongomock is required unless --mongo-uri is given (pip install mongomock).")
+        import pymongo
+        pymongo.MongoClient = mongomock.MongoClient
+        os.environ['MONGO_URI'] = 'mongodb://localhost:27017'
+
+    import logging
+    import app as app_module
+    from flask_jwt_extended import create_access_token
+    # Create the indexes on the empty collections, as a freshly started server would
+    app_module.create_app()
+    # Per-request INFO logging would dominate the measurements
+    app_module.logger.setLevel(logging.WARNING)
+    app_module.app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(days=1)
+
+    user_ids = [f'benchmark-user-{k}' for k in range(max(1, args.users))]
+    print(f"Loading {args.observations} observations and {args.spots * len(user_ids)} spots...")
+    load_database(app_module, args, rng, user_ids)
+    with app_module.app.app_context():
+        tokens = [create_access_token(identity=user_id) for user_id in user_ids]
+
+    results = {}
+    print(f"\n{'scenario':<18}{'requests':>10}{'errors':>8}{'req/s':>10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for scenario in scenarios:
+        result = results[scenario] = run_scenario(scenario, app_module, tokens, data_files, args)
+        print(f"{scenario:<18}{result['requests']:>10}{result['errors']:>8}{result['throughput']:>10.1f}"
+              f"{result['mean_ms']:>10.2f}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}")
+
+    if args.output:
+        record = {
+            'time': datetime.utcnow().isoformat() + 'Z',
+            'revision': git_revision(),
+            'backend': 'mongod' if args.mongo_uri else 'mongomock',
+            'params': {key: value for key, value in vars(args).items() if key not in ('output', 'mongo_uri', 'data_dir')},
+            'results': results
+        }
+        with open(args.output, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+        print(f"\nResults appended to {args.output}")
+
+if __name__ == '__main__':
+    main()
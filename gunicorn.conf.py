@@ -0,0 +1,37 @@
+"""
+Gunicorn settings: gunicorn -c gunicorn.conf.py
+
+The app is imported and warmed up once in the master process (preload_app), then
+forked into the workers, each of which creates its own MongoDB connection pool.
+The master closes the client its warm-up opened before forking.
+
+Metrics are collected per worker. Set METRICS_DIR to a directory the workers share
+so /metrics reports totals across all of them; it is emptied when the server starts.
+"""
+import os
+import glob
+
+wsgi_app = 'app:create_app()'
+preload_app = True
+bind = os.getenv('BIND', '0.0.0.0:8000')
+workers = int(os.getenv('WEB_CONCURRENCY', 4))
+# The live observation feed holds a thread per subscriber for as long as it is
+# connected; the app admits at most SSE_MAX_SUBSCRIBERS (half the threads by default)
+# per worker. Feed clients only see writes made through other workers when MongoDB
+# runs as a replica set, whose change streams the feed then follows.
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+
+def on_starting(server):
+    metrics_dir = os.getenv('METRICS_DIR')
+    if metrics_dir:
+        for path in glob.glob(os.path.join(metrics_dir, '*.json')):
+            os.remove(path)
+
+def pre_fork(server, worker):
+    import app
+    app.close_mongo_client()
+
+def worker_exit(server, worker):
+    import app
+    app.flush_metrics()
@@ -250,8 +250,24 @@ map.on(L.Draw.Event.CREATED, function (event) {
 let currentDateIndex = 0;
 let currentTimeIndex = 0;
 
-// Define the time periods as strings with leading zeros
-const timePeriods = ['01', '04', '07', '10', '13', '16', '19', '22'];
+// Time periods as strings with leading zeros. These defaults are only used until
+// the catalog from /api/time_periods has been loaded (e.g. while logged out or offline)
+let timePeriods = ['01', '04', '07', '10', '13', '16', '19', '22'];
+
+// Function to describe a date for the slider
+function getDateEntry(date) {
+    const yy = String(date.getFullYear()).slice(-2);
+    const mm = String(date.getMonth() + 1).padStart(2, '0');
+    const dd = String(date.getDate()).padStart(2, '0');
+    const yymmdd = yy + mm + dd;
+    return { 
+        date: `${yy}-${mm}-${dd}`, 
+        readable: `${date.toLocaleDateString('en-US', { 
+            weekday: 'long', year: 'numeric', month: 'long', day: 'numeric' 
+        })}`, 
+        yymmdd 
+    };
+}
 
 // Function to get an array of dates in yymmdd format for the next 4 days
 function getDatesArray(numDays) {
@@ -260,23 +276,13 @@ function getDatesArray(numDays) {
     for (let i = 0; i < numDays; i++) {
         const date = new Date(today);
         date.setDate(today.getDate() + i);
-        const yy = String(date.getFullYear()).slice(-2);
-        const mm = String(date.getMonth() + 1).padStart(2, '0');
-        const dd = String(date.getDate()).padStart(2, '0');
-        const yymmdd = yy + mm + dd;
-        dates.push({ 
-            date: `${yy}-${mm}-${dd}`, 
-            readable: `${date.toLocaleDateString('en-US', { 
-                weekday: 'long', year: 'numeric', month: 'long', day: 'numeric' 
-            })}`, 
-            yymmdd 
-        });
+        dates.push(getDateEntry(date));
     }
     return dates;
 }
 
-// Get the unique dates
-const uniqueDates = getDatesArray(4); // 4 days' worth of files
+// Get the unique dates, replaced by the catalog's dates once it has been loaded
+let uniqueDates = getDatesArray(4); // 4 days' worth of files
 
 // Get today's date and format it
 const today = new Date();
@@ -301,6 +307,170 @@ function updateDisplayedDate() {
     }
 }
 
+// Available layer periods ("<layer>_<yymmdd>_<hh>"), loaded from /api/time_periods
+let availableFrames = null;
+
+// Function to fetch the catalog of available time periods
+async function fetchTimePeriodCatalog() {
+    try {
+        const response = await fetch('/api/time_periods', {
+            headers: {
+                'Authorization': `Bearer ${getAccessToken()}`
+            }
+        });
+        if (!response.ok) {
+            console.warn('Failed to fetch available time periods.');
+            return;
+        }
+        const data = await response.json();
+        availableFrames = new Set();
+        const dates = new Set();
+        const hours = new Set();
+        Object.entries(data.layers).forEach(([layer, periods]) => {
+            periods.forEach(period => {
+                availableFrames.add(`${layer}_${period.date}_${period.hour}`);
+                dates.add(period.date);
+                hours.add(period.hour);
+            });
+        });
+
+        // Drive the slider from the periods the server actually has
+        if (dates.size > 0) {
+            uniqueDates = [...dates].sort().map(yymmdd => getDateEntry(new Date(
+                2000 + parseInt(yymmdd.slice(0, 2)), parseInt(yymmdd.slice(2, 4)) - 1, parseInt(yymmdd.slice(4, 6))
+            )));
+            timePeriods = [...hours].sort();
+        }
+    } catch (error) {
+        console.error('Error fetching time periods:', error);
+    }
+}
+
+// Decoded frames of one weather layer for the slider, keyed by "<yymmdd>_<hh>"
+let frameCache = { layer: null, bounds: null, frames: new Map() };
+let frameRequest = null;
+
+// Function to rebuild every frame of a delta-encoded /api/frames bundle
+function decodeFrameBundle(bundle) {
+    const frames = new Map();
+    let properties = null;
+    bundle.frames.forEach(frame => {
+        if (frame.properties) {
+            properties = frame.properties;
+        } else {
+            // Copy only the features whose properties changed since the previous frame
+            properties = properties.slice();
+            frame.changes.forEach(([index, changes]) => {
+                properties[index] = Object.assign({}, properties[index], changes);
+            });
+        }
+        const geometries = bundle.geometry_sets[frame.geometry_set];
+        frames.set(`${frame.date}_${frame.hour}`, {
+            type: 'FeatureCollection',
+            features: geometries.map((geometry, index) => ({
+                type: 'Feature',
+                geometry: geometry,
+                properties: properties[index]
+            }))
+        });
+    });
+    return frames;
+}
+
+// Function to fetch every slider frame of a layer around the current view in one request
+function prefetchLayerFrames(layerType) {
+    const bounds = map.getBounds().pad(0.5);
+    const bbox = [
+        Math.max(bounds.getWest(), -180),
+        Math.max(bounds.getSouth(), -90),
+        Math.min(bounds.getEast(), 180),
+        Math.min(bounds.getNorth(), 90)
+    ].map(value => value.toFixed(4)).join(',');
+    const start = uniqueDates[0].yymmdd;
+    const end = uniqueDates[uniqueDates.length - 1].yymmdd;
+
+    const request = fetch(`/api/frames/${layerType}?start=${start}&end=${end}&bbox=${bbox}`, {
+        headers: {
+            'Authorization': `Bearer ${getAccessToken()}`
+        }
+    })
+    .then(res => res.ok ? res.json() : null)
+    .then(data => {
+        if (data && data.status === 'success') {
+            frameCache = { layer: layerType, bounds: bounds, frames: decodeFrameBundle(data) };
+        }
+    })
+    .catch(err => console.error(`Error fetching ${layerType} frames:`, err))
+    .finally(() => {
+        if (frameRequest === request) {
+            frameRequest = null;
+        }
+    });
+    frameRequest = request;
+    return request;
+}
+
+// Function to get a cached frame, if the cache covers the layer and the current view
+function getCachedFrame(layerType, date, hour) {
+    if (frameCache.layer !== layerType || !frameCache.bounds || !frameCache.bounds.contains(map.getBounds())) {
+        return null;
+    }
+    return frameCache.frames.get(`${date}_${hour}`) || null;
+}
+
+// Grid layer that loads /tiles/<layer>/<z>/<x>/<y> GeoJSON tiles for the visible area only
+const TiledGeoJSONLayer = L.GridLayer.extend({
+    initialize: function (layerPath, geoJsonOptions, options) {
+        L.GridLayer.prototype.initialize.call(this, options);
+        this._layerPath = layerPath;
+        this._geoJsonOptions = geoJsonOptions;
+        this._tileLayers = {};
+        this.on('tileunload', (event) => {
+            this._removeTileLayer(this._tileCoordsToKey(event.coords));
+        });
+    },
+
+    createTile: function (coords, done) {
+        const tile = document.createElement('div');
+        const key = this._tileCoordsToKey(coords);
+        fetch(`/tiles/${this._layerPath}/${coords.z}/${coords.x}/${coords.y}`, {
+            headers: {
+                'Authorization': `Bearer ${getAccessToken()}`
+            }
+        })
+        .then(res => res.ok ? res.json() : null)
+        .then(data => {
+            // Skip tiles that scrolled away while they were loading
+            if (data && this._map && this._tiles[key]) {
+                const layer = L.geoJSON(data, this._geoJsonOptions);
+                this._tileLayers[key] = layer;
+                this._map.addLayer(layer);
+            }
+            done(null, tile);
+        })
+        .catch(err => {
+            console.error(`Error fetching tile ${this._layerPath}/${key}:`, err);
+            done(err, tile);
+        });
+        return tile;
+    },
+
+    onRemove: function (map) {
+        Object.keys(this._tileLayers).forEach(key => this._removeTileLayer(key));
+        L.GridLayer.prototype.onRemove.call(this, map);
+    },
+
+    _removeTileLayer: function (key) {
+        const layer = this._tileLayers[key];
+        if (layer) {
+            if (this._map) {
+                this._map.removeLayer(layer);
+            }
+            delete this._tileLayers[key];
+        }
+    }
+});
+
 // Function to plot data layers
 const plotDataLayer = async (layerGroup, layerType, dateIndex, timeIndex) => {
     layerGroup.clearLayers(); // Clear existing layers
@@ -329,6 +499,74 @@ const plotDataLayer = async (layerGroup, layerType, dateIndex, timeIndex) => {
         return;
     }
 
+    // Skip periods the server has no file for instead of requesting a missing file
+    if (layerType !== 'red_deer_location' && availableFrames &&
+        !availableFrames.has(`${layerType}_${selectedDate}_${selectedTimePeriod}`)) {
+        console.warn(`No ${layerType} data available for ${selectedDate} ${selectedTimePeriod}:00`);
+        return;
+    }
+
+    // Styling and popups shared by tiled and whole-file layers
+    const geoJsonOptions = {
+        style: function (feature) {
+            let styleOptions = {
+                weight: 1,
+                opacity: 0.7,
+                fillOpacity: 0.7,
+            };
+
+            if (layerType === 'red_deer_location') {
+                // Map abundance levels to colours
+                let abundance = feature.properties.Abundance;
+                let color;
+                if (abundance === 'H') {
+                    color = '#FF0000'; // Red for High
+                } else if (abundance === 'M') {
+                    color = '#FFA500'; // Orange for Medium
+                } else if (abundance === 'L') {
+                    color = '#0000FF'; // Green for Low
+                } else {
+                    color = '#808080'; // Gray for unknown abundance
+                }
+                styleOptions.color = color;
+                styleOptions.fillColor = color;
+            } else {
+                // Use default or existing properties
+                styleOptions.color = feature.properties.color || '#ff0000';
+                styleOptions.fillColor = feature.properties.color || '#ff0000';
+            }
+
+            return styleOptions;
+        },
+        onEachFeature: function (feature, layer) {
+            const props = feature.properties;
+            const popupContent = `
+                <strong>${layerType.replace('_', ' ')} Data</strong><br>
+                Date: ${selectedDate}<br>
+                Time Period: ${selectedTimePeriod}:00<br>
+                ${Object.keys(props).map(key => `${key}: ${props[key]}`).join('<br>')}
+            `;
+            layer.bindPopup(popupContent);
+        },
+    };
+
+    // Weather layers are served as tiles so only the visible area is downloaded.
+    // Once every frame of the layer has been bundled for this view, the slider
+    // switches frames from memory instead.
+    if (filename.startsWith('weather/')) {
+        const cachedFrame = getCachedFrame(layerType, selectedDate, selectedTimePeriod);
+        if (cachedFrame) {
+            layerGroup.addLayer(L.geoJSON(cachedFrame, geoJsonOptions));
+            return;
+        }
+        const layerPath = filename.replace(/\.geojson$/, '');
+        layerGroup.addLayer(new TiledGeoJSONLayer(layerPath, geoJsonOptions));
+        if (!frameRequest) {
+            prefetchLayerFrames(layerType);
+        }
+        return;
+    }
+
     // Fetch the GeoJSON data
     try {
         const res = await fetch(`var/data/${filename}`, { // Adjusted to match backend route
@@ -343,48 +581,7 @@ const plotDataLayer = async (layerGroup, layerType, dateIndex, timeIndex) => {
         const data = await res.json();
 
         // Create and add GeoJSON layer to the specified layer group
-        const geoJsonLayer = L.geoJSON(data, {
-            style: function (feature) {
-                let styleOptions = {
-                    weight: 1,
-                    opacity: 0.7,
-                    fillOpacity: 0.7,
-                };
-
-                if (layerType === 'red_deer_location') {
-                    // Map abundance levels to colours
-                    let abundance = feature.properties.Abundance;
-                    let color;
-                    if (abundance === 'H') {
-                        color = '#FF0000'; // Red for High
-                    } else if (abundance === 'M') {
-                        color = '#FFA500'; // Orange for Medium
-                    } else if (abundance === 'L') {
-                        color = '#0000FF'; // Green for Low
-                    } else {
-                        color = '#808080'; // Gray for unknown abundance
-                    }
-                    styleOptions.color = color;
-                    styleOptions.fillColor = color;
-                } else {
-                    // Use default or existing properties
-                    styleOptions.color = feature.properties.color || '#ff0000';
-                    styleOptions.fillColor = feature.properties.color || '#ff0000';
-                }
-
-                return styleOptions;
-            },
-            onEachFeature: function (feature, layer) {
-                const props = feature.properties;
-                const popupContent = `
-                    <strong>${layerType.replace('_', ' ')} Data</strong><br>
-                    Date: ${selectedDate}<br>
-                    Time Period: ${selectedTimePeriod}:00<br>
-                    ${Object.keys(props).map(key => `${key}: ${props[key]}`).join('<br>')}
-                `;
-                layer.bindPopup(popupContent);
-            },
-        });
+        const geoJsonLayer = L.geoJSON(data, geoJsonOptions);
         // Add the layer to the map
         layerGroup.addLayer(geoJsonLayer);
     } catch (err) {
@@ -641,6 +838,18 @@ map.on('click', function(e) {
     });
 });
 
+// Observation markers on the map, keyed by observation ID
+const markersById = new Map();
+
+// Function to remove an observation marker from the map
+function removeObservationMarker(id) {
+    const marker = markersById.get(id);
+    if (marker) {
+        markers.removeLayer(marker);
+        markersById.delete(id);
+    }
+}
+
 // Function to add an observation marker
 function addObservationMarker(obs) {
     // Check for required properties
@@ -654,7 +863,10 @@ function addObservationMarker(obs) {
     const observationTimestamp = obs.timestamp ? new Date(obs.timestamp).toLocaleString() : 'N/A';
     
     console.log(`Adding observation marker for ID: ${observationId}`);
+    // Replace the marker if this observation is already on the map
+    removeObservationMarker(observationId);
     const marker = L.marker([obs.latitude, obs.longitude]);
+    markersById.set(observationId, marker);
 
     // Construct popup content using classes and data attributes
     const popupContent = `
@@ -719,10 +931,39 @@ toggleMarkersBtn.addEventListener('click', () => {
     markersVisible = !markersVisible;
 });
 
-// Function to fetch and display all observations on map load
+// Observations are loaded for the area around the current view, one page at a time
+let observationBounds = null;
+let observationCursor = null;
+
+// Function to fetch and display the observations around the current view
 async function fetchAllObservations() {
+    const bounds = map.getBounds().pad(0.5);
+    observationBounds = bounds;
+    observationCursor = null;
+    await fetchObservationPage(bounds, null);
+}
+
+// Function to fetch the next page of observations for the loaded area
+async function fetchMoreObservations() {
+    if (observationBounds && observationCursor) {
+        await fetchObservationPage(observationBounds, observationCursor);
+    }
+}
+
+// Function to fetch one page of observations inside the given bounds
+async function fetchObservationPage(bounds, cursor) {
     try {
-        const response = await fetch('/api/get_observations', {
+        const params = new URLSearchParams();
+        params.set('bbox', [
+            Math.max(bounds.getWest(), -180),
+            Math.max(bounds.getSouth(), -90),
+            Math.min(bounds.getEast(), 180),
+            Math.min(bounds.getNorth(), 90)
+        ].map(value => value.toFixed(4)).join(','));
+        if (cursor) {
+            params.set('cursor', cursor);
+        }
+        const response = await fetch(`/api/get_observations?${params.toString()}`, {
             method: 'GET',
             headers: {
                 'Content-Type': 'application/json',
@@ -731,19 +972,66 @@ async function fetchAllObservations() {
         });
         const data = await response.json();
         console.log('Fetched Observations:', data);
-        if (data.status === 'success') {
-            data.observations.forEach(obs => {
-                console.log('Adding marker for observation:', obs);
-                addObservationMarker(obs);
-            });
-        } else {
+        if (data.status !== 'success') {
             console.error('Failed to fetch observations:', data.message);
+            return;
+        }
+        // Ignore a page that arrives after the view has moved to another area
+        if (bounds !== observationBounds) {
+            return;
         }
+        data.observations.forEach(obs => {
+            console.log('Adding marker for observation:', obs);
+            addObservationMarker(obs);
+        });
+        observationCursor = data.next_cursor || null;
+        loadMoreObservationsBtn.hidden = !observationCursor;
     } catch (error) {
         console.error('Error fetching observations:', error);
     }
 }
 
+// Load More Observations Button
+const loadMoreObservationsBtn = document.getElementById('loadMoreObservationsBtn');
+loadMoreObservationsBtn.addEventListener('click', fetchMoreObservations);
+
+// Fetch the observations of a new area when the view leaves the loaded one
+map.on('moveend', () => {
+    if (getAccessToken() && observationBounds && !observationBounds.contains(map.getBounds())) {
+        fetchAllObservations();
+    }
+});
+
+// Live observation feed (Server-Sent Events)
+let observationFeed = null;
+
+// Function to receive new, edited and deleted observations as they happen
+function subscribeToObservationFeed() {
+    const token = getAccessToken();
+    if (!token || typeof EventSource === 'undefined') {
+        return;
+    }
+    if (observationFeed) {
+        observationFeed.close();
+    }
+    // EventSource cannot send an Authorization header, so the token goes in the query string
+    observationFeed = new EventSource(`/api/observations/stream?jwt=${encodeURIComponent(token)}`);
+    observationFeed.addEventListener('created', event => addObservationMarker(JSON.parse(event.data)));
+    observationFeed.addEventListener('updated', event => addObservationMarker(JSON.parse(event.data)));
+    observationFeed.addEventListener('deleted', event => removeObservationMarker(JSON.parse(event.data).id));
+    observationFeed.addEventListener('reset', () => {
+        // Too many missed events: reload everything and reconnect
+        observationFeed.close();
+        refreshMarkers().then(subscribeToObservationFeed);
+    });
+    observationFeed.onerror = () => {
+        // EventSource reconnects on its own unless the server rejected the connection
+        if (observationFeed.readyState === EventSource.CLOSED) {
+            console.warn('Live observation feed closed.');
+        }
+    };
+}
+
 // Function to submit observation data to the backend
 async function submitObservation(observationData) {
     try {
@@ -769,10 +1057,9 @@ async function submitObservation(observationData) {
     }
 }
 
-// Function to initialize the map and set up UI
-function initializeMap() {
-    console.log('initializeMap called');
-
+// Function to fit the date-time slider to the current dates and time periods
+// and select the period closest to now
+function setupDateTimeSlider() {
     const dateTimeSlider = document.getElementById('DateTimeSlider');
     const totalPeriods = uniqueDates.length * timePeriods.length;
 
@@ -817,6 +1104,14 @@ function initializeMap() {
             dateDisplay.textContent = 'No Data Available';
         }
     }
+}
+
+// Function to initialize the map and set up UI
+function initializeMap() {
+    console.log('initializeMap called');
+
+    const dateTimeSlider = document.getElementById('DateTimeSlider');
+    setupDateTimeSlider();
 
     // Set up layer toggles
     setupLayerToggles();
@@ -911,9 +1206,14 @@ function fetchFavoriteSpots() {
 }
 
 // Initialize the map on window load
-window.addEventListener('load', function() {
+window.addEventListener('load', async function() {
     console.log('Window loaded and script running');
 
+    // Load the available time periods before plotting any data layer
+    if (getAccessToken()) {
+        await fetchTimePeriodCatalog();
+    }
+
     // Initialize the map
     initializeMap();
 
@@ -939,6 +1239,7 @@ window.addEventListener('load', function() {
     if (token) {
         currentUserId = decodeJWT(token);
         fetchAllObservations();
+        subscribeToObservationFeed();
         fetchFavoriteSpots();
     }
 });
@@ -1017,7 +1318,9 @@ document.getElementById('loginForm').addEventListener('submit', async function(e
                 closeModal(loginModal);
                 // Optionally, refresh the page or update the UI to reflect logged-in state
                 currentUserId = decodeJWT(data.access_token); // Set currentUserId
+                fetchTimePeriodCatalog().then(setupDateTimeSlider); // Load the available time periods for data layers
                 fetchAllObservations(); // Fetch observations now that the user is logged in
+                subscribeToObservationFeed(); // Receive new observations as they are added
                 fetchFavoriteSpots();    // Fetch favorite spots
             }, 2000);
         } else {
@@ -1156,6 +1459,7 @@ async function refreshMarkers() {
     console.log('Refreshing markers...');
     // Clear existing markers
     markers.clearLayers();
+    markersById.clear();
     
     // Fetch observations again
     await fetchAllObservations();